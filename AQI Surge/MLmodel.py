@@ -17,6 +17,9 @@ import joblib
 import warnings
 warnings.filterwarnings('ignore')
 
+from baselines import BaselineIndex
+from tree_paths import TreePathExplainer
+
 
 # ==========================
 # 1. CONFIGURATION
@@ -48,67 +51,139 @@ class Config:
 # 2. ENHANCED FEATURES
 # ==========================
 
-def add_engineered_features(df):
-    """Add calculated features for better predictions"""
+# Raw readings the engineered features are computed from
+RAW_FEATURES = ['AQI', 'PM2.5', 'PM10', 'Temperature', 'Humidity', 'Rainfall', 'Season', 'Festival', 'Day_Type']
+
+# Upper bin edges (inclusive) and labels of the binned readings
+AQI_BINS = ([50, 100, 150, 200, 300],
+            ['Good', 'Moderate', 'Unhealthy_Sensitive', 'Unhealthy', 'Very_Unhealthy', 'Hazardous'])
+TEMP_BINS = ([10, 20, 30, 40], ['Cold', 'Cool', 'Moderate', 'Hot', 'Very_Hot'])
+HUMIDITY_BINS = ([30, 60, 80], ['Low', 'Moderate', 'High', 'Very_High'])
+
+# Seasonal risk factors
+SEASON_RISK = {
+    'Summer': 1.2,    # Higher vector-borne diseases
+    'Monsoon': 1.5,   # Highest disease risk
+    'Autumn': 1.1,    # Moderate
+    'Winter': 0.9,    # Lower overall
+    'Spring': 1.0     # Baseline
+}
+
+# Festival impact (crowd-based disease spread)
+FESTIVAL_RISK = {
+    'None': 1.0,
+    'Diwali': 1.8,    # High pollution + crowds
+    'Holi': 1.5,      # Water + crowds
+    'Dussehra': 1.3,  # Moderate crowds
+    'Eid': 1.4,       # Gathering events
+    'Christmas': 1.2,
+    'New_Year': 1.3
+}
+
+# Festival values meaning "no festival" (read_csv turns the dataset's "None" into NaN)
+NO_FESTIVAL = {None, '', 'None', 'nan'}
+
+
+class SurgeFeatureTransformer:
+    """
+    Engineered features from raw readings, shared by training and serving
     
-    # Air Quality Index Categories
-    df['AQI_Category'] = pd.cut(
-        df['AQI'],
-        bins=[0, 50, 100, 150, 200, 300, 500],
-        labels=['Good', 'Moderate', 'Unhealthy_Sensitive', 'Unhealthy', 'Very_Unhealthy', 'Hazardous']
-    )
-    
-    # Temperature Categories
-    df['Temp_Category'] = pd.cut(
-        df['Temperature'],
-        bins=[-10, 10, 20, 30, 40, 50],
-        labels=['Cold', 'Cool', 'Moderate', 'Hot', 'Very_Hot']
-    )
-    
-    # Humidity Categories
-    df['Humidity_Category'] = pd.cut(
-        df['Humidity'],
-        bins=[0, 30, 60, 80, 100],
-        labels=['Low', 'Moderate', 'High', 'Very_High']
-    )
-    
-    # Rainfall indicator
-    df['Is_Rainy'] = (df['Rainfall'] > 0).astype(int)
-    df['Heavy_Rain'] = (df['Rainfall'] > 50).astype(int)
-    
-    # Fog conditions (high humidity + cold = fog)
-    df['Is_Foggy'] = ((df['Humidity'] > 85) & (df['Temperature'] < 15)).astype(int)
-    
-    # Weekend flag (if not already present)
-    if 'Day_Type' in df.columns:
-        df['Is_Weekend'] = df['Day_Type'].isin(['Saturday', 'Sunday']).astype(int)
-        df['Is_Holiday'] = (df['Day_Type'] == 'Holiday').astype(int)
-    
-    # Air pollution severity score (combined PM index)
-    df['Pollution_Score'] = (df['PM2.5'] * 0.6 + df['PM10'] * 0.4) / 100
-    
-    # Seasonal risk factors
-    season_risk = {
-        'Summer': 1.2,    # Higher vector-borne diseases
-        'Monsoon': 1.5,   # Highest disease risk
-        'Autumn': 1.1,    # Moderate
-        'Winter': 0.9,    # Lower overall
-        'Spring': 1.0     # Baseline
-    }
-    df['Season_Risk'] = df['Season'].map(season_risk).fillna(1.0)
-    
-    # Festival impact (crowd-based disease spread)
-    festival_risk = {
-        'None': 1.0,
-        'Diwali': 1.8,    # High pollution + crowds
-        'Holi': 1.5,      # Water + crowds
-        'Dussehra': 1.3,  # Moderate crowds
-        'Eid': 1.4,       # Gathering events
-        'Christmas': 1.2,
-        'New_Year': 1.3
-    }
-    df['Festival_Risk'] = df['Festival'].map(festival_risk).fillna(1.0)
+    Works on whole columns: readings are binned with searchsorted over the bin edges and
+    categorical risks are read from sorted key arrays, so a batch of any size costs the
+    same few NumPy calls. Its config is saved with the model, so a model file always
+    serves with the features it was trained on.
+    """
+    
+    def __init__(self, aqi_bins=AQI_BINS, temp_bins=TEMP_BINS, humidity_bins=HUMIDITY_BINS,
+                 season_risk=SEASON_RISK, festival_risk=FESTIVAL_RISK):
+        self.config = {
+            'aqi_bins': aqi_bins, 'temp_bins': temp_bins, 'humidity_bins': humidity_bins,
+            'season_risk': dict(season_risk), 'festival_risk': dict(festival_risk)
+        }
+        self.bins = {
+            'AQI_Category': self._bin_table(aqi_bins),
+            'Temp_Category': self._bin_table(temp_bins),
+            'Humidity_Category': self._bin_table(humidity_bins)
+        }
+        self.season_risk = self._risk_table(season_risk)
+        self.festival_risk = self._risk_table(festival_risk)
+    
+    @staticmethod
+    def _bin_table(bins):
+        edges, labels = bins
+        return np.asarray(edges, dtype=float), np.asarray(labels, dtype=object)
+    
+    @staticmethod
+    def _risk_table(risks):
+        keys = sorted(risks)
+        return np.asarray(keys, dtype=str), np.asarray([risks[k] for k in keys], dtype=float)
+    
+    @staticmethod
+    def _binned(values, table):
+        """Label per value: first bin whose upper edge it does not exceed; None for NaN"""
+        edges, labels = table
+        binned = labels[np.searchsorted(edges, values, side='left')]
+        binned[np.isnan(values)] = None
+        return binned
     
+    @staticmethod
+    def _risk(values, table, default=1.0):
+        keys, risks = table
+        values = np.asarray(values, dtype=object).astype(str)
+        idx = np.minimum(np.searchsorted(keys, values), len(keys) - 1)
+        return np.where(keys[idx] == values, risks[idx], default)
+    
+    @staticmethod
+    def normalize_festival(values):
+        """Festival column with every 'no festival' spelling as NaN, as in training"""
+        festival = np.asarray(values, dtype=object).copy()
+        festival[[v in NO_FESTIVAL or v != v for v in festival]] = np.nan
+        return festival
+    
+    def transform(self, raw):
+        """
+        Engineered feature columns from raw reading columns
+        
+        raw maps dataset column names (AQI, PM2.5, PM10, Temperature, Humidity, Rainfall,
+        Season, Festival and optionally Day_Type) to equal-length arrays.
+        """
+        aqi = np.asarray(raw['AQI'], dtype=float)
+        temperature = np.asarray(raw['Temperature'], dtype=float)
+        humidity = np.asarray(raw['Humidity'], dtype=float)
+        rainfall = np.asarray(raw['Rainfall'], dtype=float)
+        pm25 = np.asarray(raw['PM2.5'], dtype=float)
+        pm10 = np.asarray(raw['PM10'], dtype=float)
+        festival = self.normalize_festival(raw['Festival'])
+        
+        features = {
+            'AQI_Category': self._binned(aqi, self.bins['AQI_Category']),
+            'Temp_Category': self._binned(temperature, self.bins['Temp_Category']),
+            'Humidity_Category': self._binned(humidity, self.bins['Humidity_Category']),
+            'Is_Rainy': (rainfall > 0).astype(int),
+            'Heavy_Rain': (rainfall > 50).astype(int),
+            # Fog conditions (high humidity + cold = fog)
+            'Is_Foggy': ((humidity > 85) & (temperature < 15)).astype(int),
+            # Air pollution severity score (combined PM index)
+            'Pollution_Score': (pm25 * 0.6 + pm10 * 0.4) / 100,
+            'Season_Risk': self._risk(raw['Season'], self.season_risk),
+            'Festival_Risk': self._risk(festival, self.festival_risk),
+            'Festival': festival
+        }
+        
+        if 'Day_Type' in raw:
+            day_type = np.asarray(raw['Day_Type'], dtype=object)
+            features['Is_Weekend'] = ((day_type == 'Saturday') | (day_type == 'Sunday')).astype(int)
+            features['Is_Holiday'] = (day_type == 'Holiday').astype(int)
+        
+        return features
+
+
+def add_engineered_features(df, transformer=None):
+    """Add calculated features for better predictions"""
+    transformer = transformer or SurgeFeatureTransformer()
+    raw = {column: df[column].to_numpy() for column in RAW_FEATURES if column in df.columns}
+    for name, values in transformer.transform(raw).items():
+        df[name] = values
     return df
 
 
@@ -142,7 +217,7 @@ def calculate_traffic_accidents(aqi, temperature, humidity, rainfall,
 # 3. DATA LOADING & PREP
 # ==========================
 
-def load_and_prepare_data(data_path):
+def load_and_prepare_data(data_path, transformer=None):
     """Load data and engineer features"""
     print("📊 Loading dataset...")
     df = pd.read_csv(data_path)
@@ -152,7 +227,7 @@ def load_and_prepare_data(data_path):
     
     # Add engineered features
     print("🔧 Engineering features...")
-    df = add_engineered_features(df)
+    df = add_engineered_features(df, transformer)
     
     return df
 
@@ -161,11 +236,35 @@ def load_and_prepare_data(data_path):
 # 4. MODEL TRAINING
 # ==========================
 
+# Quantiles of the held-out prediction error kept per disease (0%, 1%, ..., 100%)
+ERROR_QUANTILE_POINTS = 101
+
+
+def prediction_error_quantiles(y_true, y_pred, diseases, points=ERROR_QUANTILE_POINTS):
+    """
+    Quantiles of log((actual + 1) / (predicted + 1)) per disease on held-out rows
+    
+    Errors are kept as ratios so they carry over between cities of different sizes;
+    sampling uniform positions on the grid draws from the model's error distribution.
+    """
+    errors = np.log1p(np.maximum(np.asarray(y_true, dtype=float), 0)) - \
+        np.log1p(np.maximum(np.asarray(y_pred, dtype=float), 0))
+    diseases = np.asarray(diseases)
+    grid = np.linspace(0, 1, points)
+    return {
+        str(disease): np.quantile(errors[diseases == disease], grid).tolist()
+        for disease in np.unique(diseases)
+    }
+
+
 class SurgePredictionModel:
     def __init__(self):
         self.pipeline = None
         self.median_baselines = None
         self.feature_names = None
+        self.feature_transformer = SurgeFeatureTransformer()
+        self.baselines = None
+        self.error_quantiles = None
         
         # Define feature sets
         self.NUM_FEATURES = [
@@ -247,6 +346,9 @@ class SurgePredictionModel:
         print(f"   Training   - MAE: {train_mae:.2f}, R²: {train_r2:.3f}")
         print(f"   Validation - MAE: {test_mae:.2f}, R²: {test_r2:.3f}, RMSE: {test_rmse:.2f}")
         
+        # Held-out error distribution for demand simulation
+        self.error_quantiles = prediction_error_quantiles(y_test, y_pred_test, X_test['Disease'])
+        
         # Calculate median baselines per disease
         print("\n📊 Calculating disease baselines...")
         self.median_baselines = df.groupby("Disease")[self.TARGET].median().to_dict()
@@ -254,6 +356,12 @@ class SurgePredictionModel:
         for disease, median in self.median_baselines.items():
             print(f"   {disease}: {median:.1f} cases (median)")
         
+        # Rolling baselines per city x disease x season for the surge flag
+        if {'Date', 'City', 'Season'} <= set(df.columns):
+            self.baselines = BaselineIndex.from_frame(df)
+            print(f"   Baseline index: {self.baselines.describe()['observations']} daily counts "
+                  f"over {len(self.baselines.cities)} cities x {len(self.baselines.seasons)} seasons")
+        
         self.feature_names = available_features
         
         return {
@@ -269,7 +377,11 @@ class SurgePredictionModel:
         joblib.dump({
             'pipeline': self.pipeline,
             'median_baselines': self.median_baselines,
-            'feature_names': self.feature_names
+            'feature_names': self.feature_names,
+            # Plain config rather than the object, so files trained via __main__ still load
+            'feature_transformer': self.feature_transformer.config,
+            'baseline_index': self.baselines.state() if self.baselines is not None else None,
+            'error_quantiles': self.error_quantiles
         }, model_path)
         print(f"\n💾 Model saved to: {model_path}")
     
@@ -279,7 +391,27 @@ class SurgePredictionModel:
         self.pipeline = saved_data['pipeline']
         self.median_baselines = saved_data['median_baselines']
         self.feature_names = saved_data['feature_names']
+        # Files saved before the transformer was stored used the default features
+        self.feature_transformer = SurgeFeatureTransformer(**saved_data.get('feature_transformer', {}))
+        # Older files have no baseline index and use the per-disease medians
+        baseline_state = saved_data.get('baseline_index')
+        self.baselines = BaselineIndex.from_state(baseline_state) if baseline_state else None
+        # Older files have no error quantiles; demand simulation falls back to Poisson noise
+        self.error_quantiles = saved_data.get('error_quantiles')
         print(f"✅ Model loaded from: {model_path}")
+    
+    def baseline(self, city, disease, season):
+        """
+        (median, upper quantile) baseline for a city, disease and season
+        
+        Read from the rolling baseline index when the model has one; the upper quantile
+        is None when only the per-disease median is known.
+        """
+        if self.baselines is not None:
+            found = self.baselines.lookup(city, disease, season)
+            if found is not None:
+                return found[0], found[1]
+        return self.median_baselines.get(disease, 1.0), None
 
 
 # ==========================
@@ -429,13 +561,170 @@ DISEASE_ADVISORIES = {
 }
 
 
+# Resource factors every disease has (with their defaults); the rest are disease specific
+STANDARD_RESOURCE_FACTORS = {
+    'beds': ('bed_ratio', 0.2),
+    'oxygen_units': ('oxygen_per_case', 0.1),
+    'ventilators': ('ventilators_per_case', 0.01),
+    'ors_kits': ('ors_kits_per_case', 0),
+    'nebulizers': ('neb_kits_per_case', 0),
+    'masks': ('masks_per_case', 1),
+    'ppe_kits': ('ppe_kits_per_case', 0.1),
+    'staff': ('staff_per_10_cases', 0.5)
+}
+STANDARD_FACTOR_KEYS = {factor for factor, _ in STANDARD_RESOURCE_FACTORS.values()}
+
+
+def disease_resources(disease, cases):
+    """
+    Resources needed for a number of cases of one disease
+    
+    Returns (standard needs as unrounded floats, in STANDARD_RESOURCE_FACTORS order;
+    disease-specific needs as ints keyed by factor name).
+    """
+    factors = RESOURCE_FACTORS.get(disease, {})
+    needs = {}
+    for name, (factor, default) in STANDARD_RESOURCE_FACTORS.items():
+        per_case = factors.get(factor, default)
+        needs[name] = (cases / 10) * per_case if factor == 'staff_per_10_cases' else cases * per_case
+    specific = {
+        key: int(round(cases * value))
+        for key, value in factors.items() if key not in STANDARD_FACTOR_KEYS
+    }
+    return needs, specific
+
+
 # ==========================
 # 6. PREDICTION ENGINE
 # ==========================
 
+# Defaults for the optional scenario fields of predict_surge_and_resources
+SCENARIO_DEFAULTS = {
+    "festival": "None",
+    "day_type": "Weekday",
+    "city_population": 1000000,
+    "diseases": None,
+    "surge_multiplier": Config.SURGE_MULTIPLIER
+}
+
+
+# Predictions of the NumPy path must match the pipeline's to within this
+LAYOUT_TOLERANCE = 1e-6
+
+
+def _is_missing(value):
+    """None and NaN are one 'missing' category, as in OneHotEncoder"""
+    return value is None or (isinstance(value, float) and value != value)
+
+
+class FeatureLayout:
+    """
+    The fitted preprocessor as a fixed NumPy layout
+    
+    Columns are the scaled NUM_FEATURES followed by the one-hot CAT_FEATURES, in the
+    ColumnTransformer's output order, so the regressor can be fed a preallocated array
+    instead of a DataFrame. Unknown categories leave their columns at zero, as
+    handle_unknown='ignore' does.
+    """
+    
+    def __init__(self, num_features, cat_features, mean, scale, categories):
+        self.num_features = list(num_features)
+        self.cat_features = list(cat_features)
+        self.n_num = len(self.num_features)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        
+        # Category value -> output column, per categorical feature
+        self.lookups = []
+        column = self.n_num
+        for values in categories:
+            lookup = {}
+            for value in values:
+                lookup[None if _is_missing(value) else value] = column
+                column += 1
+            self.lookups.append(lookup)
+        self.width = column
+    
+    @classmethod
+    def from_pipeline(cls, pipeline, num_features, cat_features):
+        """Layout of a fitted scaler + one-hot pipeline; None if it has another shape"""
+        try:
+            preprocessor = pipeline.named_steps['preprocessor']
+            scaler = preprocessor.named_transformers_['num']
+            encoder = preprocessor.named_transformers_['cat']
+            columns = {name: list(cols) for name, _, cols in preprocessor.transformers_}
+        except (AttributeError, KeyError):
+            return None
+        if not isinstance(scaler, StandardScaler) or not isinstance(encoder, OneHotEncoder):
+            return None
+        if columns.get('num') != list(num_features) or columns.get('cat') != list(cat_features):
+            return None
+        if encoder.drop is not None or encoder.handle_unknown != 'ignore' \
+                or getattr(encoder, '_infrequent_enabled', False):
+            return None
+        
+        n_num = len(num_features)
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_num)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_num)
+        return cls(num_features, cat_features, mean, scale, encoder.categories_)
+    
+    def transform(self, columns, counts=None, row_columns=None):
+        """
+        Model input array for feature columns (name -> equal-length array)
+        
+        With counts, columns hold one value per group (scenario) and each group's encoded
+        row is repeated counts[i] times; row_columns then supply the per-row features
+        (e.g. Disease), so shared features are encoded once per group.
+        """
+        row_columns = row_columns or {}
+        group_features = [f for f in self.cat_features if f not in row_columns]
+        n = len(columns[self.num_features[0]])
+        X = np.zeros((n, self.width))
+        for j, feature in enumerate(self.num_features):
+            X[:, j] = columns[feature]
+        X[:, :self.n_num] -= self.mean
+        X[:, :self.n_num] /= self.scale
+        self._one_hot(X, {f: columns[f] for f in group_features})
+        
+        if counts is not None:
+            X = np.repeat(X, counts, axis=0)
+        if row_columns:
+            self._one_hot(X, row_columns)
+        return X
+    
+    def _one_hot(self, X, columns):
+        """Set the one-hot columns of several categorical features with one scatter"""
+        lookups = [self.lookups[self.cat_features.index(f)] for f in columns]
+        # v != v only for NaN, which shares the None ('missing') key
+        cols = np.fromiter(
+            (lookup.get(v if v == v else None, -1)
+             for lookup, values in zip(lookups, columns.values()) for v in values),
+            dtype=np.intp, count=len(columns) * len(X)
+        ).reshape(len(columns), len(X))
+        known = cols >= 0
+        X[np.nonzero(known)[1], cols[known]] = 1.0
+
+
+# Scenario argument -> dataset column, for numeric readings and text labels
+READING_KEYS = {
+    'aqi': 'AQI', 'pm25': 'PM2.5', 'pm10': 'PM10',
+    'temperature': 'Temperature', 'humidity': 'Humidity', 'rainfall': 'Rainfall'
+}
+LABEL_KEYS = {'city': 'City', 'season': 'Season', 'festival': 'Festival', 'day_type': 'Day_Type'}
+
+
 class SurgePredictionEngine:
     def __init__(self, model: SurgePredictionModel):
         self.model = model
+        
+        # NumPy fast path; None falls back to the pipeline on a DataFrame
+        self.layout = FeatureLayout.from_pipeline(
+            model.pipeline, model.NUM_FEATURES, model.CAT_FEATURES
+        )
+        self.regressor = model.pipeline.steps[-1][1] if self.layout is not None else None
+        
+        # Per-disease attributions (None when the regressor is not a tree ensemble)
+        self.explainer = TreePathExplainer.from_model(model.pipeline)
     
     def predict_surge_and_resources(
         self,
@@ -451,85 +740,137 @@ class SurgePredictionEngine:
         day_type: str = "Weekday",
         city_population: int = 1000000,
         diseases: list = None,
-        surge_multiplier: float = Config.SURGE_MULTIPLIER
+        surge_multiplier: float = Config.SURGE_MULTIPLIER,
+        as_records: bool = False
     ):
         """
         Predict disease surges and resource requirements
         """
+        return self.predict_scenarios([{
+            'city': city, 'aqi': aqi, 'pm25': pm25, 'pm10': pm10,
+            'temperature': temperature, 'humidity': humidity, 'rainfall': rainfall,
+            'season': season, 'festival': festival, 'day_type': day_type,
+            'city_population': city_population, 'diseases': diseases,
+            'surge_multiplier': surge_multiplier
+        }], as_records=as_records)[0]
+    
+    def predict_scenarios(self, scenarios, as_records=False):
+        """
+        Predict several scenarios with a single model call
         
-        # Create base input features
-        base_features = {
-            'AQI': aqi,
-            'PM2.5': pm25,
-            'PM10': pm10,
-            'Temperature': temperature,
-            'Humidity': humidity,
-            'Rainfall': rainfall,
-            'Season': season,
-            'Festival': festival,
-            'Day_Type': day_type,
-        }
+        Each scenario is a dict of predict_surge_and_resources arguments. Every
+        scenario x disease row is stacked into one array and predicted together.
+        Returns one (results_df, summary) per scenario, in order; with as_records the
+        results are a list of plain dicts (same order and fields) instead of a DataFrame.
+        """
+        scenarios, diseases, features, counts = self._feature_columns(scenarios)
         
-        # Add engineered features
-        pollution_score = (pm25 * 0.6 + pm10 * 0.4) / 100
-        is_rainy = int(rainfall > 0)
-        heavy_rain = int(rainfall > 50)
-        is_foggy = int((humidity > 85) and (temperature < 15))
-        is_weekend = int(day_type in ['Saturday', 'Sunday'])
-        is_holiday = int(day_type == 'Holiday')
-        
-        # Map categorical risk factors
-        season_risk_map = {'Summer': 1.2, 'Monsoon': 1.5, 'Autumn': 1.1, 'Winter': 0.9, 'Spring': 1.0}
-        festival_risk_map = {
-            'None': 1.0, 'Diwali': 1.8, 'Holi': 1.5, 'Dussehra': 1.3,
-            'Eid': 1.4, 'Christmas': 1.2, 'New_Year': 1.3
-        }
+        # One prediction pass for every city x disease
+        predictions = self._predict(features, counts, diseases) if counts.sum() else []
         
-        season_risk = season_risk_map.get(season, 1.0)
-        festival_risk = festival_risk_map.get(festival, 1.0)
-        
-        # Categorize AQI
-        if aqi <= 50:
-            aqi_cat = 'Good'
-        elif aqi <= 100:
-            aqi_cat = 'Moderate'
-        elif aqi <= 150:
-            aqi_cat = 'Unhealthy_Sensitive'
-        elif aqi <= 200:
-            aqi_cat = 'Unhealthy'
-        elif aqi <= 300:
-            aqi_cat = 'Very_Unhealthy'
-        else:
-            aqi_cat = 'Hazardous'
-        
-        # Categorize Temperature
-        if temperature <= 10:
-            temp_cat = 'Cold'
-        elif temperature <= 20:
-            temp_cat = 'Cool'
-        elif temperature <= 30:
-            temp_cat = 'Moderate'
-        elif temperature <= 40:
-            temp_cat = 'Hot'
-        else:
-            temp_cat = 'Very_Hot'
-        
-        # Categorize Humidity
-        if humidity <= 30:
-            hum_cat = 'Low'
-        elif humidity <= 60:
-            hum_cat = 'Moderate'
-        elif humidity <= 80:
-            hum_cat = 'High'
+        results = []
+        offset = 0
+        for i, scenario in enumerate(scenarios):
+            cases = predictions[offset:offset + len(diseases[i])]
+            offset += len(diseases[i])
+            flags = {
+                'is_weekend': int(features['Is_Weekend'][i]),
+                'is_holiday': int(features['Is_Holiday'][i]),
+                'is_foggy': int(features['Is_Foggy'][i])
+            }
+            results.append(self._assemble(scenario, flags, diseases[i], cases, as_records))
+        return results
+    
+    def _feature_columns(self, scenarios):
+        """
+        Model input features of every scenario, for all scenarios in one transformer call
+        
+        Returns (scenarios with defaults, diseases per scenario, per-scenario feature
+        columns, rows per scenario).
+        """
+        scenarios = [{**SCENARIO_DEFAULTS, **scenario} for scenario in scenarios]
+        default_diseases = list(self.model.median_baselines.keys())
+        diseases = [
+            list(s['diseases']) if s['diseases'] is not None else default_diseases
+            for s in scenarios
+        ]
+        
+        readings = np.array([[s[key] for key in READING_KEYS] for s in scenarios], dtype=float).reshape(-1, len(READING_KEYS))
+        labels = np.array([[s[key] for key in LABEL_KEYS] for s in scenarios], dtype=object).reshape(-1, len(LABEL_KEYS))
+        raw = {name: readings[:, j] for j, name in enumerate(READING_KEYS.values())}
+        raw.update((name, labels[:, j]) for j, name in enumerate(LABEL_KEYS.values()))
+        features = {**raw, **self.model.feature_transformer.transform(raw)}
+        
+        counts = np.array([len(d) for d in diseases], dtype=np.intp)
+        return scenarios, diseases, features, counts
+    
+    @staticmethod
+    def _disease_column(diseases):
+        return np.array([d for ds in diseases for d in ds], dtype=object)
+    
+    @staticmethod
+    def _row_frame(features, counts, diseases):
+        """One DataFrame row per scenario x disease, as the pipeline expects"""
+        columns = {name: np.repeat(values, counts) for name, values in features.items()}
+        columns['Disease'] = SurgePredictionEngine._disease_column(diseases)
+        return pd.DataFrame(columns)
+    
+    def _predict(self, features, counts, diseases):
+        """Model predictions for every scenario x disease, on the NumPy layout when available"""
+        if self.layout is not None:
+            X = self.layout.transform(features, counts, {'Disease': self._disease_column(diseases)})
+            return self.regressor.predict(X)
+        return self.model.pipeline.predict(self._row_frame(features, counts, diseases))
+    
+    def explain_scenario(self, scenario):
+        """
+        Feature attributions of each predicted disease of one scenario, by disease name
+        
+        Memoized by the scenario's model inputs and disease; empty if the model cannot
+        be explained. Traffic_Accident comes from a formula and is not included.
+        """
+        if self.explainer is None:
+            return {}
+        scenarios, diseases, features, counts = self._feature_columns([scenario])
+        if not counts.sum():
+            return {}
+        names = diseases[0]
+        inputs = tuple(scenarios[0][key] for key in (*READING_KEYS, *LABEL_KEYS))
+        keys = [inputs + (disease,) for disease in names]
+        if self.layout is not None:
+            X = self.layout.transform(features, counts, {'Disease': self._disease_column(diseases)})
+            explanations = self.explainer.explain(X, keys, preprocessed=True)
         else:
-            hum_cat = 'Very_High'
+            explanations = self.explainer.explain(self._row_frame(features, counts, diseases), keys)
+        return dict(zip(names, explanations))
+    
+    def check_layout(self, scenarios, tolerance=LAYOUT_TOLERANCE):
+        """
+        Compare the NumPy path with the pipeline on these scenarios
+        
+        Returns the largest absolute difference; if it exceeds tolerance the engine
+        falls back to the pipeline for good.
+        """
+        if self.layout is None:
+            return None
+        _, diseases, features, counts = self._feature_columns(scenarios)
+        if not counts.sum():
+            return 0.0
         
-        # Default diseases if not specified
-        if diseases is None:
-            diseases = list(self.model.median_baselines.keys())
+        expected = self.model.pipeline.predict(self._row_frame(features, counts, diseases))
+        actual = self._predict(features, counts, diseases)
+        difference = float(np.max(np.abs(expected - actual)))
+        if difference > tolerance:
+            self.layout = None
+            self.regressor = None
+        return difference
+    
+    def _assemble(self, scenario, flags, diseases, cases, as_records=False):
+        """Surge flags, resources, summary and advisories for one scenario's predictions"""
+        surge_multiplier = scenario['surge_multiplier']
         
         # Add traffic accidents
-        diseases_to_predict = list(diseases) + ['Traffic_Accident']
+        diseases_to_predict = diseases + ['Traffic_Accident']
         
         records = []
         advisory_set = set()
@@ -546,58 +887,32 @@ class SurgePredictionEngine:
             'Total_Staff_Required': 0
         }
         
-        for disease in diseases_to_predict:
+        for i, disease in enumerate(diseases_to_predict):
             if disease == 'Traffic_Accident':
                 # Calculate traffic accidents
                 predicted_cases = calculate_traffic_accidents(
-                    aqi, temperature, humidity, rainfall,
-                    is_weekend, is_holiday, is_foggy, city_population
+                    scenario['aqi'], scenario['temperature'], scenario['humidity'], scenario['rainfall'],
+                    flags['is_weekend'], flags['is_holiday'], flags['is_foggy'], scenario['city_population']
                 )
                 baseline = predicted_cases * 0.6  # Lower baseline for comparison
+                upper = None
                 surge_threshold = predicted_cases * 0.8
                 is_surge = predicted_cases >= surge_threshold
             else:
-                # Create input dataframe
-                input_data = {
-                    'City': city,
-                    'Disease': disease,
-                    **base_features,
-                    'Pollution_Score': pollution_score,
-                    'Season_Risk': season_risk,
-                    'Festival_Risk': festival_risk,
-                    'Is_Rainy': is_rainy,
-                    'Heavy_Rain': heavy_rain,
-                    'Is_Foggy': is_foggy,
-                    'Is_Weekend': is_weekend,
-                    'Is_Holiday': is_holiday,
-                    'AQI_Category': aqi_cat,
-                    'Temp_Category': temp_cat,
-                    'Humidity_Category': hum_cat
-                }
-                
-                row_df = pd.DataFrame([input_data])
-                
-                # Predict
-                predicted_cases = float(self.model.pipeline.predict(row_df)[0])
+                predicted_cases = float(cases[i])
                 predicted_cases = max(0, predicted_cases)  # No negative cases
                 
-                # Baseline and surge
-                baseline = self.model.median_baselines.get(disease, 1.0)
+                # Baseline and surge: above the margin over this city and season's median,
+                # and above its usual day-to-day spread (upper quantile)
+                baseline, upper = self.model.baseline(scenario['city'], disease, scenario['season'])
                 surge_threshold = surge_multiplier * baseline
+                if upper is not None:
+                    surge_threshold = max(surge_threshold, upper)
                 is_surge = predicted_cases >= surge_threshold
             
-            # Get resource factors
-            factors = RESOURCE_FACTORS.get(disease, {})
-            
             # Calculate resources
-            beds = predicted_cases * factors.get('bed_ratio', 0.2)
-            oxygen = predicted_cases * factors.get('oxygen_per_case', 0.1)
-            ventilators = predicted_cases * factors.get('ventilators_per_case', 0.01)
-            ors = predicted_cases * factors.get('ors_kits_per_case', 0)
-            neb = predicted_cases * factors.get('neb_kits_per_case', 0)
-            masks = predicted_cases * factors.get('masks_per_case', 1)
-            ppe = predicted_cases * factors.get('ppe_kits_per_case', 0.1)
-            staff = (predicted_cases / 10) * factors.get('staff_per_10_cases', 0.5)
+            needs, disease_specific = disease_resources(disease, predicted_cases)
+            beds, oxygen, ventilators, ors, neb, masks, ppe, staff = needs.values()
             
             # Update totals
             resource_totals['Total_Beds'] += beds
@@ -609,14 +924,6 @@ class SurgePredictionEngine:
             resource_totals['Total_PPE_Kits'] += ppe
             resource_totals['Total_Staff_Required'] += staff
             
-            # Add disease-specific resources
-            disease_specific = {}
-            for key, value in factors.items():
-                if key not in ['bed_ratio', 'oxygen_per_case', 'ventilators_per_case', 
-                               'ors_kits_per_case', 'neb_kits_per_case', 'masks_per_case',
-                               'ppe_kits_per_case', 'staff_per_10_cases']:
-                    disease_specific[key] = int(round(predicted_cases * value))
-            
             # Advisories
             if is_surge:
                 for adv in DISEASE_ADVISORIES.get(disease, []):
@@ -627,6 +934,7 @@ class SurgePredictionEngine:
                 'Disease': disease,
                 'Predicted_Cases': round(predicted_cases, 1),
                 'Baseline_Median': round(baseline, 1),
+                'Baseline_Upper': round(upper, 1) if upper is not None else None,
                 'Surge_Threshold': round(surge_threshold, 1),
                 'Is_Surge': '🚨 SURGE' if is_surge else '✅ Normal',
                 'Surge_Flag': is_surge,
@@ -645,22 +953,63 @@ class SurgePredictionEngine:
             
             records.append(record)
         
-        # Create results dataframe
-        results_df = pd.DataFrame(records).sort_values(by='Predicted_Cases', ascending=False)
+        # Create results dataframe (or plain records in the same order)
+        if as_records:
+            results = sorted(records, key=lambda r: r['Predicted_Cases'], reverse=True)
+        else:
+            results = pd.DataFrame(records).sort_values(by='Predicted_Cases', ascending=False)
         
         # Round totals
         for key in resource_totals:
             resource_totals[key] = int(round(resource_totals[key]))
         
         # Overall summary
+        surges = sum(1 for r in records if r['Surge_Flag'])
         summary = {
             **resource_totals,
             'Advisories': sorted(list(advisory_set)),
-            'Total_Surges_Detected': int(results_df['Surge_Flag'].sum()),
-            'Risk_Level': 'HIGH' if results_df['Surge_Flag'].sum() >= 3 else 'MODERATE' if results_df['Surge_Flag'].sum() >= 1 else 'LOW'
+            'Total_Surges_Detected': surges,
+            'Risk_Level': 'HIGH' if surges >= 3 else 'MODERATE' if surges >= 1 else 'LOW'
         }
         
-        return results_df, summary
+        return results, summary
+
+
+def surge_index(results):
+    """How far a scenario's diseases run above their surge thresholds (traffic excluded)"""
+    if isinstance(results, pd.DataFrame):
+        results = results.to_dict('records')
+    return float(sum(
+        max(r['Predicted_Cases'] / max(r['Surge_Threshold'], 1e-9) - 1, 0)
+        for r in results if r['Disease'] != 'Traffic_Accident'
+    ))
+
+
+def aggregate_region(city_results):
+    """
+    Regional resource totals and surge ranking
+    
+    city_results: list of (city, results, summary), results as a DataFrame or records.
+    Cities are ranked by surges detected, then by surge index.
+    """
+    totals = {}
+    ranking = []
+    for city, results, summary in city_results:
+        for key, value in summary.items():
+            if key.startswith('Total_'):
+                totals[key] = totals.get(key, 0) + value
+        ranking.append({
+            'City': city,
+            'Total_Surges_Detected': summary['Total_Surges_Detected'],
+            'Surge_Index': round(surge_index(results), 3),
+            'Risk_Level': summary['Risk_Level']
+        })
+    
+    ranking.sort(key=lambda r: (r['Total_Surges_Detected'], r['Surge_Index']), reverse=True)
+    for rank, entry in enumerate(ranking, 1):
+        entry['Rank'] = rank
+    
+    return totals, ranking
 
 
 # ==========================
@@ -672,11 +1021,11 @@ def main():
     print("🏥 PATIENT SURGE PREDICTION & RESOURCE PLANNING SYSTEM")
     print("=" * 70)
     
-    # Load and prepare data
-    df = load_and_prepare_data(Config.DATA_PATH)
-    
-    # Initialize and train model
+    # Initialize model, then load data through its feature transformer
     model = SurgePredictionModel()
+    df = load_and_prepare_data(Config.DATA_PATH, model.feature_transformer)
+    
+    # Train model
     metrics = model.train(df)
     
     # Save model
@@ -4,26 +4,97 @@ Flask API for Patient Surge Prediction System
 Provides REST endpoints for disease surge predictions and resource planning
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from datetime import datetime
 import pandas as pd
+import numpy as np
+import json
 import os
 import traceback
 
+try:
+    import orjson
+except ImportError:  # pinned in requirements.txt; bare installs fall back to json
+    orjson = None
+
 from MLmodel import (
     SurgePredictionModel,
     SurgePredictionEngine,
-    Config
+    Config,
+    aggregate_region
 )
+from model_registry import ModelRegistry
+from surge_detector import SurgeDetector
+from demand_simulation import DEFAULT_QUANTILES, DEFAULT_SAMPLES, ERROR_DAY_CORRELATION, MAX_SAMPLES, parse_usage, simulate_demand
+from inventory_planner import PLAN_HORIZON_DAYS, PLAN_STATUSES, InventoryPlanner, forecast_demand
+from roster_optimizer import RosterOptimizer, forecast_staff
+from sensitivity import parse_axes, sweep
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend integration
 
-# Global model instance
+# Global model instance (mirrors the registry's active version)
 model = None
 engine = None
+registry = None
+
+# Seconds between checks for a retrained model file (0 disables hot reload)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", "10"))
+
+# Load the model when the module is imported, as gunicorn workers do (0: caller loads)
+MODEL_LOAD_ON_IMPORT = os.environ.get("MODEL_LOAD_ON_IMPORT", "1") != "0"
+
+# Largest region request, and scenarios predicted per streamed block
+MAX_REGION_CITIES = 50
+STREAM_BLOCK_SIZE = 10
+
+# Largest batch request, buffered (one JSON body) or streamed as NDJSON
+MAX_BATCH_SCENARIOS = 10
+MAX_STREAM_SCENARIOS = 500
+
+# Most day scenarios per demand simulation
+MAX_SIMULATION_DAYS = 30
+
+# Most hospitals per inventory update, and plan rows returned by default
+MAX_INVENTORY_HOSPITALS = 1000
+DEFAULT_PLAN_LIMIT = 500
+
+# Largest staff pool per roster
+MAX_ROSTER_STAFF = 2000
+
+# Largest observation feed per request, and alerts returned by default
+MAX_OBSERVATIONS = 10000
+DEFAULT_ALERT_LIMIT = 50
+
+# Fields of every observed daily count
+OBSERVATION_FIELDS = ['date', 'city', 'disease', 'case_count']
+
+# Readings every scenario needs
+SCENARIO_FIELDS = [
+    'city', 'aqi', 'pm25', 'pm10', 'temperature',
+    'humidity', 'rainfall', 'season', 'festival', 'day_type'
+]
+
+# Canary scenarios every new model version must pass before it goes live
+CANARY_SCENARIOS = [
+    {
+        "city": "Delhi", "aqi": 420, "pm25": 320, "pm10": 450, "temperature": 22,
+        "humidity": 40, "rainfall": 0.0, "season": "Autumn", "festival": "Diwali",
+        "day_type": "Holiday", "city_population": 2000000
+    },
+    {
+        "city": "Mumbai", "aqi": 85, "pm25": 55, "pm10": 90, "temperature": 28,
+        "humidity": 88, "rainfall": 65, "season": "Monsoon", "festival": "None",
+        "day_type": "Saturday", "city_population": 2500000
+    },
+    {
+        "city": "Delhi", "aqi": 380, "pm25": 280, "pm10": 420, "temperature": 8,
+        "humidity": 92, "rainfall": 0, "season": "Winter", "festival": "None",
+        "day_type": "Weekday", "city_population": 2000000
+    }
+]
 
 # ==========================
 # MODEL INITIALIZATION
@@ -31,14 +102,23 @@ engine = None
 
 def initialize_model():
     """Load the trained model on startup"""
-    global model, engine
+    global registry
     
     try:
-        model = SurgePredictionModel()
+        if registry is not None:
+            registry.stop_watching()
+        registry = ModelRegistry(
+            [Config.MODEL_SAVE_PATH],
+            loader=load_engine,
+            validator=validate_engine,
+            listeners=[activate_model_version]
+        )
+        if MODEL_WATCH_INTERVAL > 0:
+            # Watch even before a model exists, so a model trained later still goes live
+            registry.start_watching(MODEL_WATCH_INTERVAL)
         
         if os.path.exists(Config.MODEL_SAVE_PATH):
-            model.load_model()
-            engine = SurgePredictionEngine(model)
+            registry.load()
             print("✅ Model loaded successfully!")
             return True
         else:
@@ -49,6 +129,78 @@ def initialize_model():
         return False
 
 
+def load_engine():
+    """Load the model file into a fresh prediction engine"""
+    candidate = SurgePredictionModel()
+    candidate.load_model()
+    return SurgePredictionEngine(candidate)
+
+
+def validate_engine(candidate):
+    """Warm a candidate engine on the canary scenarios; raises if it is unusable"""
+    diseases = list(candidate.model.median_baselines.keys())
+    if not diseases:
+        raise ValueError("Model has no disease baselines")
+    predicted = []
+    
+    # The NumPy fast path must reproduce the pipeline, or the engine falls back to it
+    layout_difference = candidate.check_layout(CANARY_SCENARIOS)
+    if layout_difference is not None and candidate.layout is None:
+        print(f"⚠️  Fast feature layout differs from the pipeline by {layout_difference:.2e}; using the pipeline")
+    
+    for scenario in CANARY_SCENARIOS:
+        records, _ = candidate.predict_surge_and_resources(**scenario, as_records=True)
+        missing = set(diseases) - {r['Disease'] for r in records}
+        if missing:
+            raise ValueError(f"Canary prediction missing diseases: {', '.join(sorted(missing))}")
+        predicted.extend(r['Predicted_Cases'] for r in records)
+    
+    predicted = pd.Series(predicted, dtype=float)
+    if predicted.isna().any() or (predicted < 0).any():
+        raise ValueError("Canary predictions are missing or negative")
+    
+    return {
+        "scenarios": len(CANARY_SCENARIOS),
+        "diseases": len(diseases),
+        "mean_predicted_cases": round(float(predicted.mean()), 2),
+        "fast_path": candidate.layout is not None
+    }
+
+
+def activate_model_version(version):
+    """Registry listener: mirror the active version into the module globals"""
+    global model, engine
+    engine = version.payload
+    model = engine.model
+
+
+def current_engine():
+    """Engine of the active model version; grab it once per request"""
+    if registry is None or registry.active is None:
+        return None
+    return registry.active.payload
+
+
+def detector_baseline(city, disease, day):
+    """Seed for a new detector series: the active model's baseline for that date's season"""
+    engine = current_engine()
+    if engine is None or disease not in engine.model.median_baselines:
+        return None
+    baselines = engine.model.baselines
+    season = baselines.season_for(day) if baselines is not None else None
+    return engine.model.baseline(city, disease, season)
+
+
+# Observed-count surge detector (kept across model reloads)
+detector = SurgeDetector(baseline_fn=detector_baseline)
+
+# Stock and reorder plans of the hospitals reporting inventory
+planner = InventoryPlanner()
+
+# Shift roster of the staff pool, re-solved as staff demand forecasts change
+roster = RosterOptimizer()
+
+
 # ==========================
 # HELPER FUNCTIONS
 # ==========================
@@ -61,11 +213,14 @@ def validate_input(data, required_fields):
     return True, None
 
 
-def format_prediction_response(results_df, summary, input_params):
-    """Format the prediction results into a clean JSON response"""
+def format_prediction_response(results, summary, input_params):
+    """Format the prediction results (DataFrame or records) into a clean JSON response"""
     
     # Convert DataFrame to list of dicts
-    disease_predictions = results_df.to_dict('records')
+    if isinstance(results, pd.DataFrame):
+        disease_predictions = results.to_dict('records')
+    else:
+        disease_predictions = results
     
     # Format disease predictions
     formatted_diseases = []
@@ -74,6 +229,7 @@ def format_prediction_response(results_df, summary, input_params):
             "disease": pred.get("Disease"),
             "predicted_cases": pred.get("Predicted_Cases"),
             "baseline_median": pred.get("Baseline_Median"),
+            "baseline_upper": pred.get("Baseline_Upper"),
             "surge_threshold": pred.get("Surge_Threshold"),
             "is_surge": pred.get("Surge_Flag"),
             "surge_status": pred.get("Is_Surge"),
@@ -92,11 +248,13 @@ def format_prediction_response(results_df, summary, input_params):
         # Add disease-specific resources
         specific_resources = {}
         for key, value in pred.items():
-            if key not in ["Disease", "Predicted_Cases", "Baseline_Median", 
+            if key not in ["Disease", "Predicted_Cases", "Baseline_Median", "Baseline_Upper",
                           "Surge_Threshold", "Is_Surge", "Surge_Flag",
                           "Beds_Needed", "Oxygen_Units", "Ventilators",
                           "ORS_Kits", "Nebulizers", "Masks", "PPE_Kits", "Staff_Required"]:
-                specific_resources[key.lower()] = value
+                # DataFrame rows carry other diseases' columns as NaN
+                if not pd.isna(value):
+                    specific_resources[key.lower()] = value
         
         if specific_resources:
             disease_dict["disease_specific_resources"] = specific_resources
@@ -104,16 +262,7 @@ def format_prediction_response(results_df, summary, input_params):
         formatted_diseases.append(disease_dict)
     
     # Format overall summary
-    resource_summary = {
-        "total_beds": summary.get("Total_Beds"),
-        "total_oxygen_units": summary.get("Total_Oxygen_Units"),
-        "total_ventilators": summary.get("Total_Ventilators"),
-        "total_ors_kits": summary.get("Total_ORS_Kits"),
-        "total_nebulizers": summary.get("Total_Nebulizer_Kits"),
-        "total_masks": summary.get("Total_Masks"),
-        "total_ppe_kits": summary.get("Total_PPE_Kits"),
-        "total_staff": summary.get("Total_Staff_Required")
-    }
+    resource_summary = format_resource_totals(summary)
     
     # Response structure
     response = {
@@ -134,6 +283,135 @@ def format_prediction_response(results_df, summary, input_params):
     return response
 
 
+def format_resource_totals(summary):
+    """Resource totals of a summary in response field names"""
+    return {
+        "total_beds": summary.get("Total_Beds"),
+        "total_oxygen_units": summary.get("Total_Oxygen_Units"),
+        "total_ventilators": summary.get("Total_Ventilators"),
+        "total_ors_kits": summary.get("Total_ORS_Kits"),
+        "total_nebulizers": summary.get("Total_Nebulizer_Kits"),
+        "total_masks": summary.get("Total_Masks"),
+        "total_ppe_kits": summary.get("Total_PPE_Kits"),
+        "total_staff": summary.get("Total_Staff_Required")
+    }
+
+
+def parse_scenario(data):
+    """Typed predict_surge_and_resources arguments from request readings"""
+    return {
+        'city': data['city'],
+        'aqi': float(data['aqi']),
+        'pm25': float(data['pm25']),
+        'pm10': float(data['pm10']),
+        'temperature': float(data['temperature']),
+        'humidity': float(data['humidity']),
+        'rainfall': float(data['rainfall']),
+        'season': data['season'],
+        'festival': data.get('festival', 'None'),
+        'day_type': data.get('day_type', 'Weekday'),
+        'city_population': int(data.get('city_population', 1000000)),
+        'diseases': data.get('diseases'),
+        'surge_multiplier': float(data.get('surge_multiplier', Config.SURGE_MULTIPLIER))
+    }
+
+
+def ndjson_line(payload):
+    """One NDJSON line as bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(
+            payload,
+            default=str,
+            option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    # numpy values via tolist() so the fallback emits what OPT_SERIALIZE_NUMPY does
+    default = lambda value: value.tolist() if hasattr(value, "tolist") else str(value)
+    return (json.dumps(payload, default=default) + "\n").encode("utf-8")
+
+
+def wants_stream(data):
+    """Streaming is opted into with ?stream=1, "stream": true or an NDJSON Accept header"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    if isinstance(data, dict) and data.get('stream') is True:
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def scenario_echo(params):
+    """Input parameters echoed back with a prediction"""
+    return {
+        'city': params['city'],
+        'aqi': params['aqi'],
+        'season': params['season'],
+        'day_type': params['day_type']
+    }
+
+
+def predict_parsed(engine, parsed):
+    """
+    Yield (scenario_index, response) for validated scenarios, in order
+    
+    Valid scenarios are predicted STREAM_BLOCK_SIZE at a time with one model call per
+    block, straight from plain records (no DataFrame round trip).
+    """
+    for start in range(0, len(parsed), STREAM_BLOCK_SIZE):
+        block = parsed[start:start + STREAM_BLOCK_SIZE]
+        valid = [params for _, params, _ in block if params is not None]
+        predictions = iter(engine.predict_scenarios(valid, as_records=True)) if valid else iter(())
+        for idx, params, error_msg in block:
+            if params is None:
+                yield idx, {"success": False, "error": error_msg}
+                continue
+            records, summary = next(predictions)
+            yield idx, format_prediction_response(records, summary, scenario_echo(params))
+
+
+def stream_batch(engine, parsed):
+    """NDJSON lines for a streamed batch request"""
+    succeeded = 0
+    try:
+        for idx, payload in predict_parsed(engine, parsed):
+            succeeded += payload["success"]
+            yield ndjson_line({
+                "type": "scenario" if payload["success"] else "error",
+                "scenario_index": idx,
+                **payload
+            })
+        yield ndjson_line({
+            "type": "done",
+            "success": True,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "total_scenarios": len(parsed),
+            "succeeded": succeeded
+        })
+    except Exception as e:
+        print(f"Error in batch prediction: {str(e)}")
+        print(traceback.format_exc())
+        yield ndjson_line({
+            "type": "error",
+            "success": False,
+            "error": f"Batch prediction failed: {str(e)}"
+        })
+
+
+def query_list(name):
+    """Comma-separated query parameter as a list, or None when absent"""
+    value = request.args.get(name)
+    return [v.strip() for v in value.split(',') if v.strip()] if value else None
+
+
+def parse_observation(data):
+    """(city, disease, day, count) of one observed daily count"""
+    is_valid, error_msg = validate_input(data, OBSERVATION_FIELDS)
+    if not is_valid:
+        raise ValueError(error_msg)
+    count = float(data['case_count'])
+    if not np.isfinite(count) or count < 0:
+        raise ValueError("case_count must be a non-negative number")
+    return str(data['city']), str(data['disease']), np.datetime64(str(data['date']), 'D'), count
+
+
 # ==========================
 # API ENDPOINTS
 # ==========================
@@ -149,8 +427,23 @@ def home():
             "/health": "GET - Health check",
             "/api/predict": "POST - Predict disease surges and resources",
             "/api/predict/batch": "POST - Batch predictions for multiple scenarios",
+            "/api/predict/region": "POST - Every city of a region at once (streamed NDJSON)",
+            "/api/predict/simulate": "POST - Monte Carlo P50/P90/P95 resource demand over several days",
+            "/api/predict/sweep": "POST - Response curves and surge crossovers over an AQI / rainfall / temperature grid",
+            "/api/inventory/hospitals": "POST - Update hospital stock, open orders and lead times",
+            "/api/inventory/forecast": "POST - Set a city's multi-day demand from surge forecasts",
+            "/api/inventory/plan": "GET - Days to stockout and reorder quantities per hospital x item",
+            "/api/roster/staff": "POST - Set the staff pool and roster constraints",
+            "/api/roster/demand": "POST - Set staff demand from surge forecasts and re-solve the roster",
+            "/api/roster": "GET - Shift assignments and coverage per day",
+            "/api/observations": "POST - Feed observed daily case counts to the surge detector",
+            "/api/observations/alerts": "GET - Recent surge alerts from observed counts",
+            "/api/observations/series": "GET - Detector state of one city and disease",
             "/api/diseases": "GET - List available diseases",
-            "/api/model/info": "GET - Model information and metrics"
+            "/api/model/info": "GET - Model information and metrics",
+            "/api/model/versions": "GET - Active and retained model versions",
+            "/api/model/reload": "POST - Load and validate the model file now",
+            "/api/model/rollback": "POST - Re-activate a retained model version"
         },
         "documentation": "https://github.com/your-repo/surge-prediction"
     })
@@ -162,6 +455,7 @@ def health_check():
     return jsonify({
         "status": "healthy" if engine is not None else "unhealthy",
         "model_loaded": engine is not None,
+        "model_version": registry.active.version if engine is not None else None,
         "timestamp": datetime.utcnow().isoformat() + "Z"
     })
 
@@ -185,10 +479,13 @@ def predict():
         "day_type": "Holiday",
         "city_population": 2000000,
         "diseases": ["Influenza", "Dengue"],  // Optional
-        "surge_multiplier": 1.3  // Optional
+        "surge_multiplier": 1.3,  // Optional
+        "explain": true  // Optional, per-feature contributions to each disease's prediction
     }
     """
     
+    # The whole request runs on the model version active when it started
+    engine = current_engine()
     if engine is None:
         return jsonify({
             "success": False,
@@ -220,27 +517,13 @@ def predict():
             }), 400
         
         # Extract parameters
-        params = {
-            'city': data['city'],
-            'aqi': float(data['aqi']),
-            'pm25': float(data['pm25']),
-            'pm10': float(data['pm10']),
-            'temperature': float(data['temperature']),
-            'humidity': float(data['humidity']),
-            'rainfall': float(data['rainfall']),
-            'season': data['season'],
-            'festival': data.get('festival', 'None'),
-            'day_type': data.get('day_type', 'Weekday'),
-            'city_population': int(data.get('city_population', 1000000)),
-            'diseases': data.get('diseases'),
-            'surge_multiplier': float(data.get('surge_multiplier', Config.SURGE_MULTIPLIER))
-        }
+        params = parse_scenario(data)
         
         # Make prediction
-        results_df, summary = engine.predict_surge_and_resources(**params)
+        records, summary = engine.predict_surge_and_resources(**params, as_records=True)
         
         # Format response
-        response = format_prediction_response(results_df, summary, {
+        response = format_prediction_response(records, summary, {
             'city': params['city'],
             'aqi': params['aqi'],
             'pm25': params['pm25'],
@@ -254,6 +537,11 @@ def predict():
             'city_population': params['city_population']
         })
         
+        if data.get('explain', False):
+            explanations = engine.explain_scenario(params)
+            for disease in response["predictions"]["diseases"]:
+                disease["explanation"] = explanations.get(disease["disease"])
+        
         return jsonify(response), 200
     
     except ValueError as e:
@@ -289,10 +577,17 @@ def predict_batch():
                 "aqi": 85,
                 ...
             }
-        ]
+        ],
+        "stream": true  // Optional, same as ?stream=1 or Accept: application/x-ndjson
     }
+    
+    Buffered requests take up to MAX_BATCH_SCENARIOS scenarios and return one JSON body.
+    Streamed requests take up to MAX_STREAM_SCENARIOS and return NDJSON: one
+    {"type": "scenario"} or {"type": "error"} line per scenario as each block is
+    predicted, then a final {"type": "done"} line.
     """
     
+    engine = current_engine()
     if engine is None:
         return jsonify({
             "success": False,
@@ -316,62 +611,33 @@ def predict_batch():
                 "error": "Scenarios must be an array"
             }), 400
         
-        if len(scenarios) > 10:
+        stream = wants_stream(data)
+        limit = MAX_STREAM_SCENARIOS if stream else MAX_BATCH_SCENARIOS
+        if len(scenarios) > limit:
             return jsonify({
                 "success": False,
-                "error": "Maximum 10 scenarios allowed per batch request"
+                "error": f"Maximum {limit} scenarios allowed per {'streamed ' if stream else ''}batch request"
             }), 400
         
-        # Process each scenario
-        results = []
-        required_fields = [
-            'city', 'aqi', 'pm25', 'pm10', 'temperature',
-            'humidity', 'rainfall', 'season', 'festival', 'day_type'
-        ]
-        
+        # Validate every scenario up front; invalid ones are reported in place
+        parsed = []
         for idx, scenario in enumerate(scenarios):
-            # Validate
-            is_valid, error_msg = validate_input(scenario, required_fields)
-            if not is_valid:
-                results.append({
-                    "scenario_index": idx,
-                    "success": False,
-                    "error": error_msg
-                })
-                continue
-            
-            # Extract parameters
-            params = {
-                'city': scenario['city'],
-                'aqi': float(scenario['aqi']),
-                'pm25': float(scenario['pm25']),
-                'pm10': float(scenario['pm10']),
-                'temperature': float(scenario['temperature']),
-                'humidity': float(scenario['humidity']),
-                'rainfall': float(scenario['rainfall']),
-                'season': scenario['season'],
-                'festival': scenario.get('festival', 'None'),
-                'day_type': scenario.get('day_type', 'Weekday'),
-                'city_population': int(scenario.get('city_population', 1000000)),
-                'diseases': scenario.get('diseases'),
-                'surge_multiplier': float(scenario.get('surge_multiplier', Config.SURGE_MULTIPLIER))
-            }
-            
-            # Make prediction
-            results_df, summary = engine.predict_surge_and_resources(**params)
-            
-            # Format response
-            response = format_prediction_response(results_df, summary, {
-                'city': params['city'],
-                'aqi': params['aqi'],
-                'season': params['season'],
-                'day_type': params['day_type']
-            })
-            
-            results.append({
-                "scenario_index": idx,
-                **response
-            })
+            is_valid, error_msg = validate_input(scenario, SCENARIO_FIELDS)
+            if is_valid:
+                try:
+                    parsed.append((idx, parse_scenario(scenario), None))
+                    continue
+                except (ValueError, TypeError) as e:
+                    error_msg = f"Invalid data: {str(e)}"
+            parsed.append((idx, None, error_msg))
+        
+        if stream:
+            return Response(stream_batch(engine, parsed), mimetype='application/x-ndjson')
+        
+        results = [
+            {"scenario_index": idx, **payload}
+            for idx, payload in predict_parsed(engine, parsed)
+        ]
         
         return jsonify({
             "success": True,
@@ -389,83 +655,937 @@ def predict_batch():
         }), 500
 
 
-@app.route('/api/diseases', methods=['GET'])
-def get_diseases():
-    """Get list of diseases the model can predict"""
+@app.route('/api/predict/region', methods=['POST'])
+def predict_region():
+    """
+    Surge outlook for every city of a region, streamed as NDJSON
+    
+    Expected JSON payload:
+    {
+        "cities": {
+            "Delhi": {"aqi": 420, "pm25": 320, "pm10": 450, "temperature": 22,
+                      "humidity": 40, "rainfall": 0.0, "city_population": 2000000},
+            "Mumbai": {"aqi": 85, ...}
+        },
+        "season": "Autumn",        // shared readings, overridable per city
+        "festival": "Diwali",
+        "day_type": "Holiday",
+        "diseases": ["Influenza", "Dengue"],  // Optional
+        "surge_multiplier": 1.3  // Optional
+    }
     
-    if engine is None or model is None:
+    Streams one {"type": "city", ...} line per city as each block of cities is predicted
+    (every city x disease of a block in one model call), then a final {"type": "region"}
+    line with regional resource totals and cities ranked by surge severity.
+    """
+    
+    engine = current_engine()
+    if engine is None:
         return jsonify({
             "success": False,
-            "error": "Model not loaded"
+            "error": "Model not loaded. Please train the model first."
+        }), 503
+    
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('cities'), dict) or not data['cities']:
+        return jsonify({
+            "success": False,
+            "error": "No cities provided. Expected 'cities' object of city -> readings."
+        }), 400
+    
+    if len(data['cities']) > MAX_REGION_CITIES:
+        return jsonify({
+            "success": False,
+            "error": f"Maximum {MAX_REGION_CITIES} cities allowed per region request"
+        }), 400
+    
+    # Validate every city before streaming starts
+    shared = {key: value for key, value in data.items() if key != 'cities'}
+    scenarios = []
+    try:
+        for city, readings in data['cities'].items():
+            if not isinstance(readings, dict):
+                raise ValueError(f"Readings for {city} must be an object")
+            scenario = {**shared, **readings, 'city': city}
+            is_valid, error_msg = validate_input(scenario, SCENARIO_FIELDS)
+            if not is_valid:
+                raise ValueError(f"{city}: {error_msg}")
+            scenarios.append(parse_scenario(scenario))
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid data: {str(e)}"
+        }), 400
+    
+    def generate():
+        city_results = []
+        try:
+            for start in range(0, len(scenarios), STREAM_BLOCK_SIZE):
+                block = scenarios[start:start + STREAM_BLOCK_SIZE]
+                for params, (records, summary) in zip(block, engine.predict_scenarios(block, as_records=True)):
+                    city_results.append((params['city'], records, summary))
+                    yield ndjson_line({
+                        "type": "city",
+                        "city": params['city'],
+                        **format_prediction_response(records, summary, {
+                            'city': params['city'],
+                            'aqi': params['aqi'],
+                            'season': params['season'],
+                            'day_type': params['day_type'],
+                            'city_population': params['city_population']
+                        })
+                    })
+            
+            totals, ranking = aggregate_region(city_results)
+            yield ndjson_line({
+                "type": "region",
+                "success": True,
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "total_cities": len(city_results),
+                "total_surges_detected": sum(r['Total_Surges_Detected'] for r in ranking),
+                "resources_required": format_resource_totals(totals),
+                "ranking": [
+                    {
+                        "rank": r['Rank'],
+                        "city": r['City'],
+                        "total_surges_detected": r['Total_Surges_Detected'],
+                        "surge_index": r['Surge_Index'],
+                        "risk_level": r['Risk_Level']
+                    }
+                    for r in ranking
+                ]
+            })
+        except Exception as e:
+            print(f"Error in region prediction: {str(e)}")
+            print(traceback.format_exc())
+            yield ndjson_line({
+                "type": "error",
+                "success": False,
+                "error": f"Region prediction failed: {str(e)}"
+            })
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@app.route('/api/predict/simulate', methods=['POST'])
+def simulate_resources():
+    """
+    Monte Carlo resource demand quantiles for one or more days
+    
+    Expected JSON payload:
+    {
+        "scenarios": [
+            {"date": "2024-11-01", "city": "Delhi", "aqi": 420, ...},  // one per day, in order
+            {"date": "2024-11-02", "city": "Delhi", "aqi": 380, ...}
+        ],
+        "samples": 5000,               // Optional, max MAX_SAMPLES
+        "seed": 42,                    // Optional, for reproducible draws
+        "quantiles": [0.5, 0.9, 0.95], // Optional
+        "usage": {"oxygen_units": {"distribution": "lognormal", "cv": 0.5}},  // Optional
+        "day_correlation": 0.6         // Optional, error correlation of consecutive days
+    }
+    
+    Returns per-day case and resource quantiles and the quantiles of the totals over
+    all days.
+    """
+    
+    engine = current_engine()
+    if engine is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded. Please train the model first."
         }), 503
     
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('scenarios'), list) or not data['scenarios']:
+        return jsonify({
+            "success": False,
+            "error": "No scenarios provided. Expected 'scenarios' array of day readings."
+        }), 400
+    
+    if len(data['scenarios']) > MAX_SIMULATION_DAYS:
+        return jsonify({
+            "success": False,
+            "error": f"Maximum {MAX_SIMULATION_DAYS} scenarios allowed per simulation"
+        }), 400
+    
+    try:
+        scenarios = []
+        for idx, scenario in enumerate(data['scenarios']):
+            is_valid, error_msg = validate_input(scenario, SCENARIO_FIELDS)
+            if not is_valid:
+                return jsonify({
+                    "success": False,
+                    "error": f"Scenario {idx}: {error_msg}"
+                }), 400
+            parsed = parse_scenario(scenario)
+            parsed['date'] = scenario.get('date')
+            scenarios.append(parsed)
+        
+        n_samples = int(data.get('samples', DEFAULT_SAMPLES))
+        seed = data.get('seed')
+        seed = int(seed) if seed is not None else None
+        quantiles = [float(q) for q in data.get('quantiles', DEFAULT_QUANTILES)]
+        day_correlation = float(data.get('day_correlation', ERROR_DAY_CORRELATION))
+        usage = parse_usage(data.get('usage'))
+        
+        if not 1 <= n_samples <= MAX_SAMPLES:
+            raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+        if not quantiles or not all(0 <= q <= 1 for q in quantiles):
+            raise ValueError("quantiles must be numbers between 0 and 1")
+        if not -1 < day_correlation < 1:
+            raise ValueError("day_correlation must be between -1 and 1 (exclusive)")
+    
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid data: {str(e)}"
+        }), 400
+    
     try:
-        diseases = list(model.median_baselines.keys())
+        simulation = simulate_demand(
+            engine, scenarios, n_samples=n_samples, seed=seed, quantiles=quantiles,
+            usage=usage, day_correlation=day_correlation
+        )
         
         return jsonify({
             "success": True,
-            "diseases": diseases,
-            "total_count": len(diseases),
-            "note": "Traffic_Accident predictions are automatically included"
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "simulation": simulation
         }), 200
     
     except Exception as e:
+        print(f"Error in demand simulation: {str(e)}")
+        print(traceback.format_exc())
         return jsonify({
             "success": False,
-            "error": str(e)
+            "error": f"Simulation failed: {str(e)}"
         }), 500
 
 
-@app.route('/api/model/info', methods=['GET'])
-def model_info():
-    """Get model information and metadata"""
+@app.route('/api/predict/sweep', methods=['POST'])
+def sweep_predictions():
+    """
+    What-if sensitivity sweep over one or two readings
+    
+    Expected JSON payload: the /api/predict readings (swept ones may be left out), plus
+    {
+        "sweep": [
+            {"input": "aqi", "start": 150, "stop": 400, "steps": 26},
+            {"input": "rainfall", "start": 0, "stop": 100, "steps": 11}  // Optional second axis
+        ],
+        "scale_particulates": true  // Optional, PM2.5 / PM10 follow a swept AQI
+    }
     
-    if engine is None or model is None:
+    Returns every disease's predicted cases over the grid, its surge threshold and the
+    readings at which it crosses into (or out of) surge along the first axis.
+    """
+    
+    engine = current_engine()
+    if engine is None:
         return jsonify({
             "success": False,
-            "error": "Model not loaded"
+            "error": "Model not loaded. Please train the model first."
         }), 503
     
+    data = request.get_json(silent=True)
+    if not data or not data.get('sweep'):
+        return jsonify({
+            "success": False,
+            "error": "No sweep provided. Expected 'sweep' array of {input, start, stop, steps}."
+        }), 400
+    
     try:
-        info = {
-            "success": True,
-            "model_type": "Gradient Boosting Regressor",
-            "features": {
-                "numeric": model.NUM_FEATURES,
-                "categorical": model.CAT_FEATURES,
-                "total": len(model.NUM_FEATURES) + len(model.CAT_FEATURES)
-            },
-            "diseases": list(model.median_baselines.keys()),
-            "baseline_medians": model.median_baselines,
-            "configuration": {
-                "surge_multiplier": Config.SURGE_MULTIPLIER,
-                "n_estimators": Config.N_ESTIMATORS,
-                "learning_rate": Config.LEARNING_RATE,
-                "max_depth": Config.MAX_DEPTH
-            },
-            "traffic_factors": {
-                "base_rate": Config.TRAFFIC_BASE_RATE,
-                "weekend_multiplier": Config.WEEKEND_MULTIPLIER,
-                "holiday_multiplier": Config.HOLIDAY_MULTIPLIER,
-                "rain_multiplier": Config.RAIN_MULTIPLIER,
-                "fog_multiplier": Config.FOG_MULTIPLIER
-            }
-        }
+        axes = parse_axes(data['sweep'])
+        swept = {name: float(values[0]) for name, values in axes}
+        is_valid, error_msg = validate_input({**swept, **data}, SCENARIO_FIELDS)
+        if not is_valid:
+            return jsonify({
+                "success": False,
+                "error": error_msg
+            }), 400
+        # Swept readings left out default to their axis start; a given AQI is the one the
+        # PM readings belong to, so particulates scale from it
+        params = parse_scenario({**swept, **data})
+        scale_particulates = bool(data.get('scale_particulates', True))
+    
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid data: {str(e)}"
+        }), 400
+    
+    try:
+        result = sweep(engine, params, axes, scale_particulates)
         
-        return jsonify(info), 200
+        return jsonify({
+            "success": True,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "input_parameters": scenario_echo(params),
+            "sweep": result
+        }), 200
     
     except Exception as e:
+        print(f"Error in sensitivity sweep: {str(e)}")
+        print(traceback.format_exc())
         return jsonify({
             "success": False,
-            "error": str(e)
+            "error": f"Sweep failed: {str(e)}"
         }), 500
 
 
-@app.route('/api/example', methods=['GET'])
-def get_example():
-    """Get example request payload"""
+@app.route('/api/inventory/hospitals', methods=['POST'])
+def update_inventory():
+    """
+    Add hospitals to the inventory planner or update their stock
     
-    example_payload = {
+    Expected JSON payload:
+    {
+        "hospitals": [
+            {
+                "hospital_id": "KEM-01",
+                "city": "Mumbai",             // required for a new hospital
+                "demand_weight": 450,         // Optional, share of the city's demand (e.g. beds)
+                "stock": {"masks": 12000, "oxygen_units": 300},
+                "on_order": {"masks": 5000},  // Optional
+                "lead_time_days": {"masks": 2, "oxygen_units": 1},  // Optional, or one number
+                "safety_days": 2,             // Optional
+                "review_days": 7              // Optional, demand an order should cover
+            }
+        ]
+    }
+    
+    Only the fields given are changed. The plan is recomputed on the next read.
+    """
+    
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('hospitals'), list):
+        return jsonify({
+            "success": False,
+            "error": "No hospitals provided. Expected 'hospitals' array."
+        }), 400
+    
+    if len(data['hospitals']) > MAX_INVENTORY_HOSPITALS:
+        return jsonify({
+            "success": False,
+            "error": f"Maximum {MAX_INVENTORY_HOSPITALS} hospitals allowed per request"
+        }), 400
+    
+    try:
+        if not all(isinstance(record, dict) for record in data['hospitals']):
+            raise ValueError("Every hospital must be an object")
+        applied = planner.upsert_hospitals(data['hospitals'])
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid data: {str(e)}"
+        }), 400
+    
+    return jsonify({
+        "success": True,
+        "applied": applied,
+        "summary": planner.describe()
+    }), 200
+
+
+@app.route('/api/inventory/forecast', methods=['POST'])
+def update_inventory_forecast():
+    """
+    Set a city's daily demand from the surge engine's multi-day forecast
+    
+    Expected JSON payload:
+    {
+        "city": "Mumbai",
+        "scenarios": [ {"aqi": 85, "pm25": 55, ...}, ... ],  // one per day, up to PLAN_HORIZON_DAYS
+        "quantile": 0.9   // Optional: plan against this quantile of the model's error
+    }
+    
+    Days past the last scenario repeat the forecast's mean daily demand.
+    """
+    
+    engine = current_engine()
+    if engine is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded. Please train the model first."
+        }), 503
+    
+    data = request.get_json(silent=True)
+    if not data or not data.get('city') or not isinstance(data.get('scenarios'), list) or not data['scenarios']:
+        return jsonify({
+            "success": False,
+            "error": "Expected 'city' and a 'scenarios' array of day readings."
+        }), 400
+    
+    if len(data['scenarios']) > PLAN_HORIZON_DAYS:
+        return jsonify({
+            "success": False,
+            "error": f"Maximum {PLAN_HORIZON_DAYS} scenarios allowed per forecast"
+        }), 400
+    
+    try:
+        city = str(data['city'])
+        scenarios = []
+        for idx, scenario in enumerate(data['scenarios']):
+            scenario = {'city': city, **scenario}
+            is_valid, error_msg = validate_input(scenario, SCENARIO_FIELDS)
+            if not is_valid:
+                raise ValueError(f"Scenario {idx}: {error_msg}")
+            scenarios.append(parse_scenario(scenario))
+        
+        quantile = data.get('quantile')
+        quantile = float(quantile) if quantile is not None else None
+        if quantile is not None and not 0 <= quantile <= 1:
+            raise ValueError("quantile must be between 0 and 1")
+    
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid data: {str(e)}"
+        }), 400
+    
+    try:
+        daily = forecast_demand(engine, scenarios, quantile=quantile, items=planner.items)
+        planner.set_demand(city, daily)
+        
+        return jsonify({
+            "success": True,
+            "city": city,
+            "days": len(daily),
+            "quantile": quantile,
+            "daily_demand": [
+                {item: round(float(value), 1) for item, value in zip(planner.items, day)}
+                for day in daily
+            ],
+            "summary": planner.describe()
+        }), 200
+    
+    except Exception as e:
+        print(f"Error in inventory forecast: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"Forecast failed: {str(e)}"
+        }), 500
+
+
+@app.route('/api/inventory/plan', methods=['GET'])
+def inventory_plan():
+    """
+    Reorder plan rows, most urgent first
+    
+    Query parameters (all optional): city, hospital_id, status and item (comma-separated
+    lists for the last three), limit.
+    """
+    
+    statuses = query_list('status')
+    if statuses is not None:
+        statuses = [s.upper() for s in statuses]
+        unknown = [s for s in statuses if s not in PLAN_STATUSES]
+        if unknown:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown status: {', '.join(unknown)}. Expected one of: {', '.join(PLAN_STATUSES)}"
+            }), 400
+    
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PLAN_LIMIT))
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "limit must be an integer"
+        }), 400
+    
+    rows = planner.rows(
+        hospital_ids=query_list('hospital_id'),
+        city=request.args.get('city'),
+        statuses=statuses,
+        items=query_list('item')
+    )
+    
+    return jsonify({
+        "success": True,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "plan": rows[:max(limit, 0)],
+        "total_count": len(rows),
+        "summary": planner.describe()
+    }), 200
+
+
+@app.route('/api/roster/staff', methods=['POST'])
+def update_roster_staff():
+    """
+    Replace the staff pool and solve the whole roster
+    
+    Expected JSON payload:
+    {
+        "staff": [
+            {
+                "staff_id": "N-104",
+                "name": "Asha Patil",         // Optional
+                "role": "Nurse",              // Doctor or Nurse
+                "skills": ["ICU"],            // Optional, e.g. ICU, Surgeon
+                "max_weekly_hours": 40,       // Optional, default from constraints
+                "unavailable_days": [3, 4],   // Optional, roster day indices
+                "locked_shifts": [{"day": 0, "shift": "Night"}]  // Optional
+            }
+        ],
+        "constraints": {                      // Optional, only the ones to change
+            "max_weekly_hours": 48,
+            "min_rest_hours": 11,
+            "max_consecutive_days": 6,
+            "allow_consecutive_nights": false,
+            "min_coverage": {"ICU": 3}        // staff with the skill on every shift
+        },
+        "days": 30,                           // Optional roster horizon
+        "start_date": "2024-11-01"            // Optional, dates the roster days
+    }
+    """
+    
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('staff'), list):
+        return jsonify({
+            "success": False,
+            "error": "No staff provided. Expected 'staff' array."
+        }), 400
+    
+    if len(data['staff']) > MAX_ROSTER_STAFF:
+        return jsonify({
+            "success": False,
+            "error": f"Maximum {MAX_ROSTER_STAFF} staff allowed per roster"
+        }), 400
+    
+    try:
+        if not all(isinstance(record, dict) for record in data['staff']):
+            raise ValueError("Every staff member must be an object")
+        applied = roster.set_staff(
+            data['staff'],
+            constraints=data.get('constraints'),
+            days=data.get('days'),
+            start_date=data.get('start_date')
+        )
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid data: {str(e)}"
+        }), 400
+    
+    return jsonify({
+        "success": True,
+        "applied": applied,
+        "summary": roster.describe()
+    }), 200
+
+
+@app.route('/api/roster/demand', methods=['POST'])
+def update_roster_demand():
+    """
+    Set the staff demand of some roster days and re-solve from the first of them
+    
+    Expected JSON payload, either forecast scenarios:
+    {
+        "start_day": 0,                       // Optional, roster day of the first scenario
+        "city": "Mumbai",
+        "scenarios": [ {"aqi": 85, "pm25": 55, ...}, ... ],  // one per day
+        "demand_share": 0.1                   // Optional, this pool's share of the city demand
+    }
+    or the demand itself:
+    {
+        "start_day": 12,
+        "days": [{"staff_required": 42, "surgeons_required": 3}]
+    }
+    
+    Changing one day re-solves from that day until the roster settles back into the old one.
+    """
+    
+    data = request.get_json(silent=True)
+    if not data or not (isinstance(data.get('scenarios'), list) or isinstance(data.get('days'), list)):
+        return jsonify({
+            "success": False,
+            "error": "Expected a 'scenarios' array of day readings or a 'days' array of staff demand."
+        }), 400
+    
+    engine = current_engine()
+    if 'scenarios' in data and engine is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded. Please train the model first."
+        }), 503
+    
+    try:
+        start_day = int(data.get('start_day', 0))
+        if 'scenarios' in data:
+            if not data.get('city') or not data['scenarios']:
+                raise ValueError("Forecast demand needs 'city' and at least one scenario")
+            if len(data['scenarios']) > roster.days:
+                raise ValueError(f"Maximum {roster.days} scenarios allowed (the roster horizon)")
+            scenarios = []
+            for idx, scenario in enumerate(data['scenarios']):
+                scenario = {'city': str(data['city']), **scenario}
+                is_valid, error_msg = validate_input(scenario, SCENARIO_FIELDS)
+                if not is_valid:
+                    raise ValueError(f"Scenario {idx}: {error_msg}")
+                scenarios.append(parse_scenario(scenario))
+            share = float(data.get('demand_share', 1.0))
+            if not share >= 0:
+                raise ValueError("demand_share must be a non-negative number")
+            required = forecast_staff(engine, scenarios) * share
+            staff_required, surgeons_required = required[:, 0], required[:, 1]
+        else:
+            if not all(isinstance(day, dict) and 'staff_required' in day for day in data['days']):
+                raise ValueError("Every day needs 'staff_required'")
+            staff_required = [float(day['staff_required']) for day in data['days']]
+            surgeons_required = [float(day.get('surgeons_required', 0)) for day in data['days']]
+        
+        solve = roster.set_demand(start_day, staff_required, surgeons_required)
+    
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid data: {str(e)}"
+        }), 400
+    
+    return jsonify({
+        "success": True,
+        "solve": solve,
+        "coverage": roster.coverage(range(start_day, start_day + len(staff_required))),
+        "summary": roster.describe()
+    }), 200
+
+
+@app.route('/api/roster', methods=['GET'])
+def get_roster():
+    """
+    Shift assignments per staff member and coverage per day
+    
+    Query parameters (all optional): staff_id (comma-separated), day.
+    """
+    
+    day = request.args.get('day')
+    if day is not None:
+        try:
+            day = int(day)
+            if not 0 <= day < roster.days:
+                raise ValueError
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": f"day must be an integer from 0 to {roster.days - 1}"
+            }), 400
+    
+    return jsonify({
+        "success": True,
+        "roster": roster.roster(staff_ids=query_list('staff_id'), day=day),
+        "coverage": roster.coverage([day] if day is not None else None),
+        "summary": roster.describe()
+    }), 200
+
+
+@app.route('/api/observations', methods=['POST'])
+def ingest_observations():
+    """
+    Feed observed daily case counts to the streaming surge detector
+    
+    Expected JSON payload:
+    {
+        "observations": [
+            {"date": "2024-11-02", "city": "Delhi", "disease": "Asthma", "case_count": 140},
+            ...
+        ]
+    }
+    
+    Up to MAX_OBSERVATIONS counts per request, in any order (they are applied by date).
+    Counts dated on or before their series' latest count are skipped as stale. Alerts
+    raised by this feed are returned straight away and kept for /api/observations/alerts.
+    Counts of series that are not in alarm also update the active model's baseline index,
+    for the cities and diseases it already knows (others are listed in baseline_rejected).
+    Those updates are kept in memory only; a model reload or rollback discards them.
+    """
+    
+    try:
+        data = request.get_json()
+        
+        if not data or 'observations' not in data:
+            return jsonify({
+                "success": False,
+                "error": "No observations provided. Expected 'observations' array."
+            }), 400
+        
+        observations = data['observations']
+        
+        if not isinstance(observations, list):
+            return jsonify({
+                "success": False,
+                "error": "Observations must be an array"
+            }), 400
+        
+        if len(observations) > MAX_OBSERVATIONS:
+            return jsonify({
+                "success": False,
+                "error": f"Maximum {MAX_OBSERVATIONS} observations allowed per request"
+            }), 400
+        
+        # Invalid counts are reported by index; the rest are still ingested
+        parsed = []
+        positions = []
+        rejected = []
+        for idx, observation in enumerate(observations):
+            try:
+                if not isinstance(observation, dict):
+                    raise ValueError("Observation must be an object")
+                parsed.append(parse_observation(observation))
+                positions.append(idx)
+            except (ValueError, TypeError) as e:
+                rejected.append({"index": idx, "error": str(e)})
+        
+        cities, diseases, days, counts = zip(*parsed) if parsed else ((), (), (), ())
+        result = detector.ingest(cities, diseases, days, counts)
+        
+        # Keep the baseline index current with counts that look like normal days; unknown
+        # names would grow every baseline array, so only known series are updated
+        engine = current_engine()
+        baselines = engine.model.baselines if engine is not None else None
+        baseline_rejected = []
+        if baselines is not None:
+            # Oldest day first, as the index would have seen them; ties keep request order
+            normal = np.flatnonzero(result.accepted & ~result.alarmed)
+            for i in normal[np.argsort(np.asarray(days)[normal], kind="stable")]:
+                if cities[i] not in baselines.city_ids:
+                    baseline_rejected.append({"index": positions[i], "error": f"Unknown city '{cities[i]}'"})
+                elif diseases[i] not in baselines.disease_ids:
+                    baseline_rejected.append({"index": positions[i], "error": f"Unknown disease '{diseases[i]}'"})
+                else:
+                    baselines.update(cities[i], diseases[i], counts[i], date=days[i])
+            baseline_rejected.sort(key=lambda entry: entry["index"])
+        
+        return jsonify({
+            "success": True,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "received": len(observations),
+            "accepted": int(result.accepted.sum()),
+            "stale": int(len(parsed) - result.accepted.sum()),
+            "rejected": rejected,
+            "baseline_rejected": baseline_rejected,
+            "alerts": result.alerts,
+            "detector": detector.describe()
+        }), 200
+    
+    except Exception as e:
+        print(f"Error ingesting observations: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"Observation ingest failed: {str(e)}"
+        }), 500
+
+
+@app.route('/api/observations/alerts', methods=['GET'])
+def observation_alerts():
+    """Recent surge alerts from observed counts, newest first (?limit=, ?city=, ?disease=)"""
+    
+    try:
+        limit = int(request.args.get('limit', DEFAULT_ALERT_LIMIT))
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "limit must be an integer"
+        }), 400
+    
+    city = request.args.get('city')
+    disease = request.args.get('disease')
+    alerts = [
+        alert for alert in detector.alerts()
+        if (city is None or alert['city'] == city) and (disease is None or alert['disease'] == disease)
+    ]
+    
+    return jsonify({
+        "success": True,
+        "alerts": alerts[:max(limit, 0)],
+        "total_count": len(alerts),
+        "detector": detector.describe()
+    }), 200
+
+
+@app.route('/api/observations/series', methods=['GET'])
+def observation_series():
+    """Detector state of one series (?city=&disease=)"""
+    
+    city = request.args.get('city')
+    disease = request.args.get('disease')
+    if not city or not disease:
+        return jsonify({
+            "success": False,
+            "error": "city and disease query parameters are required"
+        }), 400
+    
+    state = detector.series_state(city, disease)
+    if state is None:
+        return jsonify({
+            "success": False,
+            "error": f"No observations for {disease} in {city}"
+        }), 404
+    
+    return jsonify({
+        "success": True,
+        "series": state
+    }), 200
+
+
+@app.route('/api/diseases', methods=['GET'])
+def get_diseases():
+    """Get list of diseases the model can predict"""
+    
+    engine = current_engine()
+    if engine is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded"
+        }), 503
+    
+    try:
+        diseases = list(engine.model.median_baselines.keys())
+        
+        return jsonify({
+            "success": True,
+            "diseases": diseases,
+            "total_count": len(diseases),
+            "note": "Traffic_Accident predictions are automatically included"
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/model/info', methods=['GET'])
+def model_info():
+    """Get model information and metadata"""
+    
+    engine = current_engine()
+    if engine is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded"
+        }), 503
+    
+    try:
+        model = engine.model
+        info = {
+            "success": True,
+            "model_version": registry.active.version,
+            "model_type": "Gradient Boosting Regressor",
+            "features": {
+                "numeric": model.NUM_FEATURES,
+                "categorical": model.CAT_FEATURES,
+                "total": len(model.NUM_FEATURES) + len(model.CAT_FEATURES)
+            },
+            "diseases": list(model.median_baselines.keys()),
+            "baseline_medians": model.median_baselines,
+            "baseline_index": model.baselines.describe() if model.baselines is not None else None,
+            "configuration": {
+                "surge_multiplier": Config.SURGE_MULTIPLIER,
+                "n_estimators": Config.N_ESTIMATORS,
+                "learning_rate": Config.LEARNING_RATE,
+                "max_depth": Config.MAX_DEPTH
+            },
+            "traffic_factors": {
+                "base_rate": Config.TRAFFIC_BASE_RATE,
+                "weekend_multiplier": Config.WEEKEND_MULTIPLIER,
+                "holiday_multiplier": Config.HOLIDAY_MULTIPLIER,
+                "rain_multiplier": Config.RAIN_MULTIPLIER,
+                "fog_multiplier": Config.FOG_MULTIPLIER
+            }
+        }
+        
+        return jsonify(info), 200
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+
+@app.route('/api/model/versions', methods=['GET'])
+def model_versions():
+    """Active model version and the versions retained for rollback"""
+    
+    if registry is None or registry.active is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded"
+        }), 503
+    
+    return jsonify({
+        "success": True,
+        "active_version": registry.active.version,
+        "versions": registry.versions(),
+        "last_reload_error": registry.last_error
+    }), 200
+
+
+@app.route('/api/model/reload', methods=['POST'])
+def reload_model():
+    """Load, validate and activate the model file currently on disk"""
+    
+    if registry is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded"
+        }), 503
+    
+    try:
+        version = registry.load()
+        return jsonify({
+            "success": True,
+            "active_version": version.version,
+            "canary": version.canary
+        }), 200
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Reload rejected: {str(e)}"
+        }), 422
+
+
+@app.route('/api/model/rollback', methods=['POST'])
+def rollback_model():
+    """
+    Re-activate a retained model version
+    
+    Expected JSON payload (optional):
+    {
+        "version": 2  // defaults to the version before the active one
+    }
+    """
+    
+    if registry is None or registry.active is None:
+        return jsonify({
+            "success": False,
+            "error": "Model not loaded"
+        }), 503
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        version = registry.rollback(data.get('version'))
+        return jsonify({
+            "success": True,
+            "active_version": version.version
+        }), 200
+    except LookupError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 404
+
+
+@app.route('/api/example', methods=['GET'])
+def get_example():
+    """Get example request payload"""
+    
+    example_payload = {
         "city": "Delhi",
         "aqi": 420,
         "pm25": 320,
@@ -526,6 +1646,11 @@ def internal_error(error):
     }), 500
 
 
+# gunicorn imports app:app without running __main__, so each worker loads (and starts
+# watching the model file) here
+model_loaded = initialize_model() if MODEL_LOAD_ON_IMPORT else False
+
+
 # ==========================
 # MAIN
 # ==========================
@@ -535,9 +1660,10 @@ if __name__ == '__main__':
     print("🏥 PATIENT SURGE PREDICTION API")
     print("=" * 70)
     
-    # Initialize model
-    print("\n📦 Loading model...")
-    model_loaded = initialize_model()
+    # Initialize model (already attempted at import unless MODEL_LOAD_ON_IMPORT=0)
+    if not MODEL_LOAD_ON_IMPORT:
+        print("\n📦 Loading model...")
+        model_loaded = initialize_model()
     
     if not model_loaded:
         print("\n⚠️  WARNING: Model not loaded. API will return errors.")
@@ -551,8 +1677,23 @@ if __name__ == '__main__':
     print("   • GET  /health            - Health check")
     print("   • POST /api/predict       - Single prediction")
     print("   • POST /api/predict/batch - Batch predictions")
+    print("   • POST /api/predict/region - Region fan-out (NDJSON)")
+    print("   • POST /api/predict/simulate - Monte Carlo demand quantiles")
+    print("   • POST /api/predict/sweep - What-if response curves and surge crossovers")
+    print("   • POST /api/inventory/hospitals - Hospital stock and lead times")
+    print("   • POST /api/inventory/forecast - City demand from surge forecasts")
+    print("   • GET  /api/inventory/plan - Days to stockout and reorders")
+    print("   • POST /api/roster/staff  - Staff pool and roster constraints")
+    print("   • POST /api/roster/demand - Staff demand from surge forecasts")
+    print("   • GET  /api/roster        - Shift assignments and coverage")
+    print("   • POST /api/observations  - Observed counts -> surge alerts")
+    print("   • GET  /api/observations/alerts - Recent surge alerts")
+    print("   • GET  /api/observations/series - Detector state of a series")
     print("   • GET  /api/diseases      - List diseases")
     print("   • GET  /api/model/info    - Model information")
+    print("   • GET  /api/model/versions - Model versions")
+    print("   • POST /api/model/reload  - Hot-reload the model file")
+    print("   • POST /api/model/rollback - Roll back to a previous model")
     print("   • GET  /api/example       - Example request payload")
     print("\n" + "=" * 70)
     
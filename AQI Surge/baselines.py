@@ -0,0 +1,265 @@
+# baselines.py
+"""
+City x disease x season baseline index for the surge prediction model
+Keeps the most recent daily case counts of every series in fixed ring buffers and
+precomputed rolling medians / upper quantiles, so the surge flag reads its baseline with
+a couple of array lookups and new counts update it in place.
+"""
+
+import threading
+import warnings
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Daily counts kept per (city, disease, season) series
+BASELINE_WINDOW = 90
+
+# Upper quantile reported next to the rolling median
+BASELINE_UPPER_QUANTILE = 0.9
+
+# Counts a series needs before its own baseline is used over the pooled one
+BASELINE_MIN_OBSERVATIONS = 7
+
+# Columns of the stats arrays
+MEDIAN, UPPER = 0, 1
+
+
+class BaselineIndex:
+    """
+    Rolling baselines per (city, disease, season) with fallbacks
+
+    counts[c, d, s] is a ring buffer of the series' latest counts (NaN while unfilled).
+    Medians and upper quantiles are kept for every series, for every (disease, season)
+    across cities, and for every disease overall; lookup() returns the most specific
+    level with at least min_observations counts. Writers hold a lock, readers do not.
+    """
+
+    def __init__(
+        self,
+        cities: Sequence[str],
+        diseases: Sequence[str],
+        seasons: Sequence[str],
+        window: int = BASELINE_WINDOW,
+        quantile: float = BASELINE_UPPER_QUANTILE,
+        min_observations: int = BASELINE_MIN_OBSERVATIONS,
+        month_seasons: Optional[Sequence[Optional[str]]] = None,
+    ):
+        self.cities = list(cities)
+        self.diseases = list(diseases)
+        self.seasons = list(seasons)
+        self.city_ids = {c: i for i, c in enumerate(self.cities)}
+        self.disease_ids = {d: i for i, d in enumerate(self.diseases)}
+        self.season_ids = {s: i for i, s in enumerate(self.seasons)}
+        self.window = int(window)
+        self.quantile = float(quantile)
+        self.min_observations = int(min_observations)
+        # Season of each calendar month (index 0 = January), for counts sent without one
+        self.month_seasons = list(month_seasons) if month_seasons is not None else [None] * 12
+        self._lock = threading.Lock()
+
+        shape = (len(self.cities), len(self.diseases), len(self.seasons))
+        self.counts = np.full(shape + (self.window,), np.nan)
+        self.cursor = np.zeros(shape, dtype=np.intp)
+        self.series = np.full(shape + (2,), np.nan)
+        self.pooled = np.full(shape[1:] + (2,), np.nan)
+        self.overall = np.full((shape[1], 2), np.nan)
+        self.series_n = np.zeros(shape, dtype=np.intp)
+        self.pooled_n = np.zeros(shape[1:], dtype=np.intp)
+        self.overall_n = np.zeros(shape[1], dtype=np.intp)
+
+    # -- building ---------------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, df, window: int = BASELINE_WINDOW, **kwargs) -> "BaselineIndex":
+        """Index of a training frame with Date, City, Disease, Season and Case_Count"""
+        df = df.sort_values('Date', kind='stable')
+        dates = np.asarray(df['Date'], dtype='datetime64[D]')
+        months = dates.astype('datetime64[M]').astype(int) % 12
+
+        # Most common season of each month
+        month_seasons = []
+        seasons_col = df['Season'].to_numpy()
+        for month in range(12):
+            values, counts = np.unique(seasons_col[months == month].astype(str), return_counts=True)
+            month_seasons.append(str(values[np.argmax(counts)]) if len(values) else None)
+
+        index = cls(
+            sorted(df['City'].unique()), sorted(df['Disease'].unique()), sorted(df['Season'].unique()),
+            window=window, month_seasons=month_seasons, **kwargs
+        )
+
+        c = np.array([index.city_ids[v] for v in df['City']], dtype=np.intp)
+        d = np.array([index.disease_ids[v] for v in df['Disease']], dtype=np.intp)
+        s = np.array([index.season_ids[v] for v in df['Season']], dtype=np.intp)
+        values = df['Case_Count'].to_numpy(dtype=float)
+
+        # Position of every row within its series, in date order; keep the last `window`
+        flat = np.ravel_multi_index((c, d, s), index.cursor.shape)
+        order = np.argsort(flat, kind='stable')
+        totals = np.bincount(flat, minlength=index.cursor.size)
+        starts = np.cumsum(totals) - totals
+        position = np.empty(len(order), dtype=np.intp)
+        position[order] = np.arange(len(order)) - starts[flat[order]]
+        keep = position >= totals[flat] - index.window
+
+        index.counts[c[keep], d[keep], s[keep], position[keep] % index.window] = values[keep]
+        totals = totals.reshape(index.cursor.shape)
+        index.cursor[:] = totals % index.window
+        index.series_n[:] = np.minimum(totals, index.window)
+        index._refresh()
+        return index
+
+    def state(self) -> Dict[str, Any]:
+        """Plain data to save with a model file"""
+        return {
+            'cities': self.cities, 'diseases': self.diseases, 'seasons': self.seasons,
+            'window': self.window, 'quantile': self.quantile,
+            'min_observations': self.min_observations, 'month_seasons': self.month_seasons,
+            'counts': self.counts, 'cursor': self.cursor
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "BaselineIndex":
+        index = cls(
+            state['cities'], state['diseases'], state['seasons'],
+            window=state['window'], quantile=state['quantile'],
+            min_observations=state['min_observations'], month_seasons=state['month_seasons']
+        )
+        index.counts = np.array(state['counts'], dtype=float)
+        index.cursor = np.array(state['cursor'], dtype=np.intp)
+        index.series_n = (~np.isnan(index.counts)).sum(axis=-1)
+        index._refresh()
+        return index
+
+    # -- statistics -------------------------------------------------------
+
+    def _stats(self, values: np.ndarray, axis: int = -1) -> np.ndarray:
+        """Median and upper quantile over axis, ignoring unfilled slots"""
+        with warnings.catch_warnings():
+            # Empty series are expected and stay NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.stack([
+                np.nanmedian(values, axis=axis),
+                np.nanquantile(values, self.quantile, axis=axis)
+            ], axis=-1)
+
+    def _stats_1d(self, values: np.ndarray) -> np.ndarray:
+        """_stats of one flat series: a single sort of the filled slots"""
+        filled = np.sort(values[~np.isnan(values)])
+        if not len(filled):
+            return np.array([np.nan, np.nan])
+        last = len(filled) - 1
+        pos = self.quantile * last
+        lo = int(pos)
+        upper = filled[lo] + (filled[min(lo + 1, last)] - filled[lo]) * (pos - lo)
+        median = (filled[last // 2] + filled[len(filled) // 2]) / 2
+        return np.array([median, upper])
+
+    def _refresh(self, disease: Optional[int] = None, season: Optional[int] = None, city: Optional[int] = None):
+        """Recompute the stats affected by one series, or all of them"""
+        if disease is None:
+            self.series[:] = self._stats(self.counts)
+            by_disease_season = np.moveaxis(self.counts, 0, 2)
+            shape = by_disease_season.shape
+            self.pooled[:] = self._stats(by_disease_season.reshape(shape[0], shape[1], -1))
+            self.overall[:] = self._stats(by_disease_season.reshape(shape[0], -1))
+            self.pooled_n[:] = self.series_n.sum(axis=0)
+            self.overall_n[:] = self.series_n.sum(axis=(0, 2))
+            return
+
+        self.series[city, disease, season] = self._stats_1d(self.counts[city, disease, season])
+        self.pooled[disease, season] = self._stats_1d(self.counts[:, disease, season].ravel())
+        self.overall[disease] = self._stats_1d(self.counts[:, disease].ravel())
+        self.pooled_n[disease, season] = self.series_n[:, disease, season].sum()
+        self.overall_n[disease] = self.series_n[:, disease].sum()
+
+    # -- reads and writes -------------------------------------------------
+
+    def lookup(self, city: str, disease: str, season: str) -> Optional[Tuple[float, float, str]]:
+        """(median, upper quantile, level) of the most specific baseline; None if unknown"""
+        d = self.disease_ids.get(disease)
+        if d is None:
+            return None
+        c = self.city_ids.get(city)
+        s = self.season_ids.get(season)
+        if s is not None:
+            if c is not None and self.series_n[c, d, s] >= self.min_observations:
+                stats = self.series[c, d, s]
+                return float(stats[MEDIAN]), float(stats[UPPER]), 'city_season'
+            if self.pooled_n[d, s] >= self.min_observations:
+                stats = self.pooled[d, s]
+                return float(stats[MEDIAN]), float(stats[UPPER]), 'season'
+        if self.overall_n[d] > 0:
+            stats = self.overall[d]
+            return float(stats[MEDIAN]), float(stats[UPPER]), 'disease'
+        return None
+
+    def season_for(self, date) -> Optional[str]:
+        month = int(np.datetime64(date, 'M').astype(int) % 12)
+        return self.month_seasons[month]
+
+    def _grow(self, axis: int, names: List[str], ids: Dict[str, int], name: str) -> int:
+        """
+        Add a new city / disease / season slot to every array
+
+        lookup() reads without the lock, so the grown arrays are installed before the
+        name is published and no reader can hold an index past their end.
+        """
+        grown = {}
+        for attr in ('counts', 'cursor', 'series', 'series_n'):
+            array = getattr(self, attr)
+            pad = np.full_like(np.take(array, [0], axis=axis), np.nan if array.dtype.kind == 'f' else 0)
+            grown[attr] = np.concatenate([array, pad], axis=axis)
+        if axis > 0:
+            for attr in ('pooled', 'pooled_n') + (('overall', 'overall_n') if axis == 1 else ()):
+                array = getattr(self, attr)
+                pad = np.full_like(np.take(array, [0], axis=axis - 1), np.nan if array.dtype.kind == 'f' else 0)
+                grown[attr] = np.concatenate([array, pad], axis=axis - 1)
+        for attr, array in grown.items():
+            setattr(self, attr, array)
+
+        ids[name] = len(names)
+        names.append(name)
+        return ids[name]
+
+    def update(self, city: str, disease: str, count: float, date=None, season: Optional[str] = None) -> Tuple[float, float, str]:
+        """
+        Add one daily count to its series and refresh the affected baselines
+
+        The season defaults to the usual season of the date's month. Unseen cities,
+        diseases and seasons get new slots. Returns the series' new lookup().
+        """
+        if season is None:
+            season = self.season_for(date) if date is not None else None
+            if season is None:
+                raise ValueError("A season or a date is required")
+        with self._lock:
+            c = self.city_ids.get(city)
+            if c is None:
+                c = self._grow(0, self.cities, self.city_ids, city)
+            d = self.disease_ids.get(disease)
+            if d is None:
+                d = self._grow(1, self.diseases, self.disease_ids, disease)
+            s = self.season_ids.get(season)
+            if s is None:
+                s = self._grow(2, self.seasons, self.season_ids, season)
+
+            slot = self.cursor[c, d, s]
+            if np.isnan(self.counts[c, d, s, slot]):
+                self.series_n[c, d, s] += 1
+            self.counts[c, d, s, slot] = float(count)
+            self.cursor[c, d, s] = (slot + 1) % self.window
+            self._refresh(d, s, c)
+        return self.lookup(city, disease, season)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "cities": len(self.cities),
+            "diseases": len(self.diseases),
+            "seasons": len(self.seasons),
+            "window": self.window,
+            "upper_quantile": self.quantile,
+            "min_observations": self.min_observations,
+            "observations": int(self.series_n.sum())
+        }
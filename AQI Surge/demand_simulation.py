@@ -0,0 +1,218 @@
+# demand_simulation.py
+"""
+Monte Carlo resource demand for the surge prediction engine
+Samples case counts from the model's held-out error distribution and per-case resource
+usage from configurable distributions, all as NumPy arrays over samples x days x
+diseases, and reports demand quantiles (P50 / P90 / P95) for procurement.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy.special import ndtr
+
+from MLmodel import (
+    STANDARD_RESOURCE_FACTORS,
+    calculate_traffic_accidents,
+    disease_resources
+)
+
+# Samples drawn when a request does not say, and the most a request may ask for
+DEFAULT_SAMPLES = 5000
+MAX_SAMPLES = 10000
+
+# Demand quantiles reported by default
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95)
+
+# Correlation of a disease's prediction error between consecutive days
+ERROR_DAY_CORRELATION = 0.6
+
+# Per-case usage distribution of each standard resource: (distribution, coefficient of variation).
+# "gamma" and "lognormal" keep the RESOURCE_FACTORS value as their mean; "fixed" uses it as is.
+RESOURCE_USAGE = {
+    'beds': ('gamma', 0.15),
+    'oxygen_units': ('gamma', 0.35),
+    'ventilators': ('gamma', 0.5),
+    'ors_kits': ('gamma', 0.2),
+    'nebulizers': ('gamma', 0.3),
+    'masks': ('gamma', 0.25),
+    'ppe_kits': ('gamma', 0.25),
+    'staff': ('gamma', 0.15)
+}
+USAGE_DISTRIBUTIONS = ('fixed', 'gamma', 'lognormal')
+
+
+def quantile_key(q: float) -> str:
+    """0.9 -> "p90", 0.975 -> "p97.5" """
+    return f"p{q * 100:g}"
+
+
+def parse_usage(overrides: Optional[Dict[str, Any]]) -> Dict[str, tuple]:
+    """RESOURCE_USAGE with {"oxygen_units": {"distribution": "lognormal", "cv": 0.5}} overrides"""
+    usage = dict(RESOURCE_USAGE)
+    for name, spec in (overrides or {}).items():
+        if name not in usage:
+            raise ValueError(f"Unknown resource '{name}'. Expected one of: {', '.join(usage)}")
+        distribution = spec.get('distribution', usage[name][0])
+        cv = float(spec.get('cv', usage[name][1]))
+        if distribution not in USAGE_DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}'. Expected one of: {', '.join(USAGE_DISTRIBUTIONS)}")
+        if not cv >= 0:
+            raise ValueError("cv must be a non-negative number")
+        usage[name] = (distribution, cv)
+    return usage
+
+
+def sample_demand(rng: np.random.Generator, distribution: str, cv: float, mean: np.ndarray, var: np.ndarray) -> np.ndarray:
+    """
+    Demand of one resource per sample x day: sum over diseases of cases x per-case usage
+    
+    Usage draws are independent between diseases, so given the cases the sum has mean
+    cases @ per_case and variance (cases * per_case * cv)^2 summed over diseases. It is
+    drawn from the gamma / lognormal with those two moments (exact for "fixed", and for
+    gamma when the per-disease usage means are equal) instead of one draw per disease.
+    """
+    if distribution == 'fixed' or cv == 0:
+        return mean
+    demand = np.zeros_like(mean)
+    positive = mean > 0
+    mean, var = mean[positive], var[positive]
+    if distribution == 'gamma':
+        demand[positive] = rng.gamma(mean ** 2 / var, var / mean)
+    else:
+        sigma2 = np.log1p(var / mean ** 2)
+        demand[positive] = mean * np.exp(rng.standard_normal(len(mean)) * np.sqrt(sigma2) - sigma2 / 2)
+    return demand
+
+
+def correlated_uniforms(rng: np.random.Generator, n_samples: int, n_days: int, n_diseases: int, rho: float) -> np.ndarray:
+    """(samples, days, diseases) uniforms from a Gaussian AR(1) copula across days"""
+    z = rng.standard_normal((n_samples, n_days, n_diseases))
+    scale = np.sqrt(1 - rho ** 2)
+    for t in range(1, n_days):
+        z[:, t] = rho * z[:, t - 1] + scale * z[:, t]
+    return ndtr(z)
+
+
+def point_estimates(engine, scenarios: Sequence[Dict[str, Any]]):
+    """
+    Predicted cases of every day scenario on a days x diseases grid, in one model call
+    
+    Returns (scenarios with defaults, disease names with Traffic_Accident last,
+    point estimates, mask of the diseases each day asked for).
+    """
+    scenarios, diseases, features, counts = engine._feature_columns(scenarios)
+    names = list(dict.fromkeys([d for ds in diseases for d in ds] + ['Traffic_Accident']))
+    column = {name: j for j, name in enumerate(names)}
+    point = np.zeros((len(scenarios), len(names)))
+    included = np.zeros((len(scenarios), len(names)), dtype=bool)
+
+    predictions = np.maximum(engine._predict(features, counts, diseases), 0) if counts.sum() else []
+    offset = 0
+    for t, scenario in enumerate(scenarios):
+        cols = [column[d] for d in diseases[t]]
+        point[t, cols] = predictions[offset:offset + len(cols)]
+        offset += len(cols)
+        included[t, cols] = True
+        point[t, -1] = calculate_traffic_accidents(
+            scenario['aqi'], scenario['temperature'], scenario['humidity'], scenario['rainfall'],
+            int(features['Is_Weekend'][t]), int(features['Is_Holiday'][t]), int(features['Is_Foggy'][t]),
+            scenario['city_population']
+        )
+        included[t, -1] = True
+    return scenarios, names, point, included
+
+
+def simulate_demand(
+    engine,
+    scenarios: Sequence[Dict[str, Any]],
+    n_samples: int = DEFAULT_SAMPLES,
+    seed: Optional[int] = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    usage: Optional[Dict[str, tuple]] = None,
+    day_correlation: float = ERROR_DAY_CORRELATION,
+) -> Dict[str, Any]:
+    """
+    Demand quantiles for a run of day scenarios (predict_surge_and_resources arguments)
+
+    Cases are the model's point estimate times a ratio drawn from its held-out error
+    quantiles, correlated between consecutive scenarios; Traffic_Accident, and every
+    disease when the model file has no error quantiles, draws Poisson counts instead.
+    Per-case usage of every standard resource then varies per sample, day and disease
+    (see sample_demand). Returns per-day case and resource quantiles and quantiles of the totals
+    over all days, in API field names.
+    """
+    usage = usage or RESOURCE_USAGE
+    quantiles = list(quantiles)
+    rng = np.random.default_rng(seed)
+
+    # Point estimates on a days x diseases grid (diseases a day does not ask for stay out)
+    scenarios, names, point, included = point_estimates(engine, scenarios)
+    n_days, n_diseases = point.shape
+
+    # Cases: error-ratio draws where the model has an error distribution, Poisson elsewhere
+    error_quantiles = engine.model.error_quantiles or {}
+    modelled = np.array([name in error_quantiles for name in names])
+    cases = np.empty((n_samples, n_days, n_diseases))
+    if modelled.any():
+        grid = np.array([error_quantiles[name] for name in np.array(names)[modelled]])
+        u = correlated_uniforms(rng, n_samples, n_days, len(grid), day_correlation)
+        pos = u * (grid.shape[1] - 1)
+        lo = np.minimum(pos.astype(np.intp), grid.shape[1] - 2)
+        # Flat offsets into the grid and its slopes: two gathers per draw
+        flat = lo + np.arange(len(grid)) * grid.shape[1]
+        slopes = np.diff(grid, append=grid[:, -1:], axis=1)
+        errors = grid.ravel()[flat] + slopes.ravel()[flat] * (pos - lo)
+        cases[..., modelled] = np.maximum(np.expm1(np.log1p(point[:, modelled]) + errors), 0)
+    if (~modelled).any():
+        cases[..., ~modelled] = rng.poisson(point[:, ~modelled], (n_samples, n_days, int((~modelled).sum())))
+    cases *= included
+
+    # Mean per-case usage of every standard resource per disease, and its spread
+    per_case = np.array([list(disease_resources(name, 1.0)[0].values()) for name in names])
+    cvs = np.array([usage[name][1] for name in STANDARD_RESOURCE_FACTORS])
+    means = cases @ per_case
+    variances = (cases ** 2) @ (per_case * cvs) ** 2
+
+    demand = np.empty_like(means)
+    for r, name in enumerate(STANDARD_RESOURCE_FACTORS):
+        distribution, cv = usage[name]
+        demand[..., r] = sample_demand(rng, distribution, cv, means[..., r], variances[..., r])
+
+    # Mean and quantiles over samples, each computed once for the whole array
+    keys = ["mean"] + [quantile_key(q) for q in quantiles]
+    case_stats = sample_stats(cases, quantiles)
+    demand_stats = sample_stats(demand, quantiles)
+    total_stats = sample_stats(demand.sum(axis=1), quantiles)
+    resource_names = list(STANDARD_RESOURCE_FACTORS)
+
+    days = []
+    for t, scenario in enumerate(scenarios):
+        days.append({
+            "day_index": t,
+            "city": scenario['city'],
+            "date": scenario.get('date'),
+            "cases": {
+                name: {"point_estimate": round(float(point[t, j]), 1),
+                       **dict(zip(keys, case_stats[:, t, j].tolist()))}
+                for j, name in enumerate(names) if included[t, j]
+            },
+            "resources": {
+                name: dict(zip(keys, demand_stats[:, t, r].tolist()))
+                for r, name in enumerate(resource_names)
+            }
+        })
+
+    return {
+        "samples": n_samples,
+        "seed": seed,
+        "quantiles": keys[1:],
+        "error_model": "held_out_residuals" if modelled.any() else "poisson",
+        "days": days,
+        "total": {name: dict(zip(keys, total_stats[:, r].tolist())) for r, name in enumerate(resource_names)}
+    }
+
+
+def sample_stats(values: np.ndarray, quantiles: List[float]) -> np.ndarray:
+    """Mean then each quantile over the sample axis (0), rounded to one decimal"""
+    return np.round(np.concatenate([values.mean(axis=0)[None], np.quantile(values, quantiles, axis=0)]), 1)
@@ -0,0 +1,332 @@
+# inventory_planner.py
+"""
+Stock depletion and reorder planning driven by surge forecasts
+Keeps stock, open orders and supplier lead times for every hospital x item next to the
+daily demand forecast of every city, and derives days-to-stockout, reorder points and
+order quantities for all of them in one vectorized pass.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from MLmodel import RESOURCE_FACTORS, STANDARD_RESOURCE_FACTORS
+from demand_simulation import point_estimates
+
+# Consumable items that are planned: standard resources plus the disease-specific
+# factors (in API field names). Beds, ventilators, staff and procedures are capacity,
+# not stock, and are left out.
+CONSUMABLE_RESOURCES = ['oxygen_units', 'ors_kits', 'nebulizers', 'masks', 'ppe_kits']
+CAPACITY_FACTORS = {'xray_per_case', 'ct_scan_per_case', 'surgeons_per_10_cases'}
+INVENTORY_ITEMS = CONSUMABLE_RESOURCES + sorted({
+    key for factors in RESOURCE_FACTORS.values() for key in factors
+    if key not in CAPACITY_FACTORS and key not in {f for f, _ in STANDARD_RESOURCE_FACTORS.values()}
+})
+
+# Days planned ahead; forecast days beyond the ones given repeat their mean daily demand
+PLAN_HORIZON_DAYS = 30
+
+# Defaults for hospitals that do not say: supplier lead time, demand covered after the
+# lead time as safety stock, and demand an order should cover once it arrives
+DEFAULT_LEAD_TIME_DAYS = 3.0
+DEFAULT_SAFETY_DAYS = 2.0
+DEFAULT_REVIEW_DAYS = 7.0
+
+# Plan statuses, most urgent first
+PLAN_STATUSES = ('STOCKOUT', 'CRITICAL', 'REORDER', 'OK')
+STOCKOUT, CRITICAL, REORDER, OK = range(4)
+
+
+def item_usage(diseases: Sequence[str], items: Sequence[str] = INVENTORY_ITEMS) -> np.ndarray:
+    """(diseases, items) usage per case from RESOURCE_FACTORS"""
+    standard = {name: factor for name, (factor, _) in STANDARD_RESOURCE_FACTORS.items()}
+    usage = np.zeros((len(diseases), len(items)))
+    for k, disease in enumerate(diseases):
+        factors = RESOURCE_FACTORS.get(disease, {})
+        for i, item in enumerate(items):
+            if item in standard:
+                default = STANDARD_RESOURCE_FACTORS[item][1]
+                usage[k, i] = factors.get(standard[item], default)
+            else:
+                usage[k, i] = factors.get(item, 0.0)
+    return usage
+
+
+def forecast_demand(engine, scenarios: Sequence[Dict[str, Any]], quantile: Optional[float] = None,
+                    items: Sequence[str] = INVENTORY_ITEMS) -> np.ndarray:
+    """
+    (days, items) demand of a run of day scenarios from the engine's case predictions
+
+    With a quantile, each disease's cases are raised to that quantile of the model's
+    held-out error (when the model file has error quantiles), for planning against a
+    pessimistic forecast rather than the point estimate.
+    """
+    _, names, point, included = point_estimates(engine, scenarios)
+    cases = point * included
+    error_quantiles = engine.model.error_quantiles or {}
+    if quantile is not None:
+        for k, name in enumerate(names):
+            grid = error_quantiles.get(name)
+            if grid is not None:
+                ratio = np.interp(quantile, np.linspace(0, 1, len(grid)), grid)
+                cases[:, k] = np.maximum(np.expm1(np.log1p(cases[:, k]) + ratio), 0) * included[:, k]
+    return cases @ item_usage(names, items)
+
+
+class InventoryPlanner:
+    """
+    Reorder plan for every hospital x item
+
+    Each hospital takes a share of its city's forecast demand in proportion to its
+    demand_weight (e.g. beds). plan() compares cumulative demand with stock and open
+    orders for all hospitals and items at once and is cached until an input changes;
+    writers hold a lock and swap the cached plan out.
+    """
+
+    def __init__(self, items: Sequence[str] = INVENTORY_ITEMS, horizon_days: int = PLAN_HORIZON_DAYS):
+        self.items = list(items)
+        self.item_ids = {item: i for i, item in enumerate(self.items)}
+        self.horizon = int(horizon_days)
+        self.hospitals: List[str] = []
+        self.hospital_ids: Dict[str, int] = {}
+        self.cities: List[str] = []
+        self.city_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._plan = None
+
+        n_items = len(self.items)
+        self.stock = np.zeros((0, n_items))
+        self.on_order = np.zeros((0, n_items))
+        self.lead_time = np.zeros((0, n_items))
+        self.safety_days = np.zeros(0)
+        self.review_days = np.zeros(0)
+        self.weight = np.zeros(0)
+        self.city_of = np.zeros(0, dtype=np.intp)
+        self.demand = np.zeros((0, self.horizon, n_items))
+        self.forecast_days = np.zeros(0, dtype=np.intp)
+
+    # -- inputs -----------------------------------------------------------
+
+    def _item_values(self, values, row: np.ndarray, name: str):
+        """Apply {item: value} (or one number for every item) to a row"""
+        if isinstance(values, dict):
+            for item, value in values.items():
+                if item not in self.item_ids:
+                    raise ValueError(f"Unknown item '{item}'")
+                row[self.item_ids[item]] = self._non_negative(value, f"{name}.{item}")
+        else:
+            row[:] = self._non_negative(values, name)
+
+    @staticmethod
+    def _non_negative(value, name: str) -> float:
+        value = float(value)
+        if not np.isfinite(value) or value < 0:
+            raise ValueError(f"{name} must be a non-negative number")
+        return value
+
+    def _city_id(self, city: str) -> int:
+        c = self.city_ids.get(city)
+        if c is None:
+            c = self.city_ids[city] = len(self.cities)
+            self.cities.append(city)
+            self.demand = np.concatenate([self.demand, np.zeros((1,) + self.demand.shape[1:])])
+            self.forecast_days = np.append(self.forecast_days, 0)
+        return c
+
+    def upsert_hospitals(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add hospitals or update their fields; returns the number of records applied
+
+        Records: {"hospital_id", "city", "demand_weight", "stock": {item: qty},
+        "on_order": {item: qty}, "lead_time_days": {item: days} or days,
+        "safety_days", "review_days"}. Only hospital_id is required for an existing
+        hospital; new ones also need a city. All records are validated before any is
+        applied.
+        """
+        records = list(records)
+        with self._lock:
+            # Validate into copies, then swap them in together
+            hospitals, hospital_ids = list(self.hospitals), dict(self.hospital_ids)
+            new = sum(1 for r in {str(r.get('hospital_id')) for r in records} if r not in hospital_ids)
+            stock = np.concatenate([self.stock, np.zeros((new, len(self.items)))])
+            on_order = np.concatenate([self.on_order, np.zeros((new, len(self.items)))])
+            lead_time = np.concatenate([self.lead_time, np.full((new, len(self.items)), DEFAULT_LEAD_TIME_DAYS)])
+            safety_days = np.concatenate([self.safety_days, np.full(new, DEFAULT_SAFETY_DAYS)])
+            review_days = np.concatenate([self.review_days, np.full(new, DEFAULT_REVIEW_DAYS)])
+            weight = np.concatenate([self.weight, np.ones(new)])
+            city_of = np.concatenate([self.city_of, np.full(new, -1, dtype=np.intp)])
+            cities = {}
+
+            for idx, record in enumerate(records):
+                hospital_id = record.get('hospital_id')
+                if hospital_id is None:
+                    raise ValueError(f"Hospital {idx}: hospital_id is required")
+                hospital_id = str(hospital_id)
+                h = hospital_ids.get(hospital_id)
+                if h is None:
+                    h = hospital_ids[hospital_id] = len(hospitals)
+                    hospitals.append(hospital_id)
+                if 'city' in record:
+                    cities[h] = str(record['city'])
+                elif city_of[h] < 0 and h not in cities:
+                    raise ValueError(f"Hospital {hospital_id}: city is required for a new hospital")
+                if 'demand_weight' in record:
+                    weight[h] = self._non_negative(record['demand_weight'], 'demand_weight')
+                if 'safety_days' in record:
+                    safety_days[h] = self._non_negative(record['safety_days'], 'safety_days')
+                if 'review_days' in record:
+                    review_days[h] = self._non_negative(record['review_days'], 'review_days')
+                for field, target in (('stock', stock), ('on_order', on_order), ('lead_time_days', lead_time)):
+                    if field in record:
+                        self._item_values(record[field], target[h], field)
+
+            for h, city in cities.items():
+                city_of[h] = self._city_id(city)
+            self.hospitals, self.hospital_ids = hospitals, hospital_ids
+            self.stock, self.on_order, self.lead_time = stock, on_order, lead_time
+            self.safety_days, self.review_days, self.weight, self.city_of = safety_days, review_days, weight, city_of
+            self._plan = None
+        return len(records)
+
+    def set_demand(self, city: str, daily: np.ndarray):
+        """Daily (days, items) demand forecast of a city, from forecast_demand()"""
+        daily = np.asarray(daily, dtype=float)[:self.horizon]
+        if daily.ndim != 2 or daily.shape[1] != len(self.items) or not len(daily):
+            raise ValueError(f"Demand must be (days, {len(self.items)} items)")
+        with self._lock:
+            c = self._city_id(city)
+            demand = self.demand.copy()
+            demand[c, :len(daily)] = daily
+            demand[c, len(daily):] = daily.mean(axis=0)
+            self.demand = demand
+            self.forecast_days[c] = len(daily)
+            self._plan = None
+
+    # -- planning ---------------------------------------------------------
+
+    def plan(self) -> Dict[str, np.ndarray]:
+        """Arrays of the current plan, (hospitals, items) each; recomputed only after a change"""
+        plan = self._plan
+        if plan is None:
+            with self._lock:
+                if self._plan is None:
+                    self._plan = self._compute()
+                plan = self._plan
+        return plan
+
+    def _compute(self) -> Dict[str, np.ndarray]:
+        n_hospitals, horizon = len(self.hospitals), self.horizon
+
+        # Work in city demand units: each hospital's stock divided by its share of the city
+        totals = np.bincount(self.city_of, weights=self.weight, minlength=len(self.cities))
+        share = np.divide(self.weight, totals[self.city_of], out=np.zeros(n_hospitals), where=totals[self.city_of] > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stock = np.where(share[:, None] > 0, self.stock / share[:, None], np.inf)
+        daily = self.demand                                                       # (C, T, I)
+        cumulative = np.concatenate([np.zeros((len(self.cities), 1, len(self.items))), np.cumsum(daily, axis=1)], axis=1)
+        city = self.city_of[:, None]
+        item = np.arange(len(self.items))[None, :]
+        rate = cumulative[city, -1, item] / horizon                               # (H, I) mean daily demand
+
+        def demand_until(days):
+            """Cumulative demand over the next `days` (fractional), extrapolated past the horizon"""
+            k = np.minimum(np.floor(days).astype(np.intp), horizon)
+            step = np.where(k < horizon, daily[city, np.minimum(k, horizon - 1), item], rate)
+            return (cumulative[city, k, item] + step * (days - k)) * share[:, None]
+
+        # Full days the stock covers, then the fraction of the day it runs out on
+        covered = (cumulative[self.city_of, 1:] <= stock[:, None, :]).sum(axis=1)
+        in_horizon = covered < horizon
+        k = np.minimum(covered, horizon - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_left = np.where(in_horizon, covered + (stock - cumulative[city, k, item]) / daily[city, k, item],
+                                 horizon + (stock - cumulative[city, -1, item]) / rate)
+        days_left[~in_horizon & (rate <= 0)] = np.inf
+        rate = rate * share[:, None]
+
+        lead = self.lead_time
+        safety = self.safety_days[:, None]
+        reorder_point = demand_until(lead + safety)
+        target = demand_until(lead + safety + self.review_days[:, None])
+        position = self.stock + self.on_order
+        needs_order = (position <= reorder_point) & (rate > 0)
+        quantity = np.where(needs_order, np.ceil(np.maximum(target - position, 0)), 0)
+
+        status = np.full(self.stock.shape, OK, dtype=np.int8)
+        status[needs_order] = REORDER
+        status[days_left < lead] = CRITICAL
+        status[(self.stock <= 0) & (rate > 0)] = STOCKOUT
+
+        return {
+            "days_to_stockout": days_left,
+            "order_by_days": days_left - lead,
+            "reorder_point": reorder_point,
+            "order_up_to": target,
+            "reorder_quantity": quantity,
+            "daily_demand": daily[self.city_of, 0] * share[:, None],
+            "status": status
+        }
+
+    # -- reads ------------------------------------------------------------
+
+    def rows(self, hospital_ids: Optional[Sequence[str]] = None, city: Optional[str] = None,
+             statuses: Optional[Sequence[str]] = None, items: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Plan rows (hospital x item), most urgent first, optionally filtered"""
+        plan = self.plan()
+        mask = np.ones(plan['status'].shape, dtype=bool)
+        if hospital_ids is not None:
+            keep = np.zeros(len(self.hospitals), dtype=bool)
+            keep[[self.hospital_ids[h] for h in hospital_ids if h in self.hospital_ids]] = True
+            mask &= keep[:, None]
+        if city is not None:
+            mask &= (self.city_of == self.city_ids.get(city, -1))[:, None]
+        if statuses is not None:
+            mask &= np.isin(plan['status'], [PLAN_STATUSES.index(s) for s in statuses if s in PLAN_STATUSES])
+        if items is not None:
+            keep = np.zeros(len(self.items), dtype=bool)
+            keep[[self.item_ids[i] for i in items if i in self.item_ids]] = True
+            mask &= keep[None, :]
+
+        h, i = np.nonzero(mask)
+        order = np.lexsort((plan['days_to_stockout'][h, i], plan['status'][h, i]))
+        h, i = h[order], i[order]
+
+        def rounded(values):
+            values = np.round(values, 1)
+            if np.isfinite(values).all():
+                return values.tolist()
+            return [v if v not in (np.inf, -np.inf) else None for v in values.tolist()]
+
+        hospital_ids = np.array(self.hospitals, dtype=object)[h]
+        cities = np.array(self.cities, dtype=object)[self.city_of[h]]
+        items = np.array(self.items, dtype=object)[i]
+        statuses = np.array(PLAN_STATUSES, dtype=object)[plan['status'][h, i]]
+        columns = {
+            "hospital_id": hospital_ids.tolist(),
+            "city": cities.tolist(),
+            "item": items.tolist(),
+            "status": statuses.tolist(),
+            "days_to_stockout": rounded(plan['days_to_stockout'][h, i]),
+            "order_by_days": rounded(plan['order_by_days'][h, i]),
+            "reorder_point": rounded(plan['reorder_point'][h, i]),
+            "reorder_quantity": plan['reorder_quantity'][h, i].astype(int).tolist(),
+            "daily_demand": rounded(plan['daily_demand'][h, i]),
+            "stock": rounded(self.stock[h, i]),
+            "on_order": rounded(self.on_order[h, i]),
+            "lead_time_days": rounded(self.lead_time[h, i])
+        }
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    def describe(self) -> Dict[str, Any]:
+        plan = self.plan()
+        counts = np.bincount(plan['status'].ravel(), minlength=len(PLAN_STATUSES))
+        return {
+            "hospitals": len(self.hospitals),
+            "cities": len(self.cities),
+            "cities_with_forecast": int((self.forecast_days > 0).sum()),
+            "items": len(self.items),
+            "horizon_days": self.horizon,
+            "status_counts": {status: int(n) for status, n in zip(PLAN_STATUSES, counts)}
+        }
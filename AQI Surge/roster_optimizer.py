@@ -0,0 +1,413 @@
+# roster_optimizer.py
+"""
+Shift rosters from the surge engine's staff demand forecasts
+Turns daily Staff_Required (and surgeon needs) into Morning / Afternoon / Night
+assignments per staff member under weekly-hours, rest, consecutive-day and skill-mix
+constraints, with a greedy day-by-day heuristic over NumPy masks. A demand change
+re-solves from its first day and stops early once the state later days depend on matches
+the old roster; with spare staff the fewest-hours rotation usually carries a change to
+the end of the horizon.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from MLmodel import RESOURCE_FACTORS, STANDARD_RESOURCE_FACTORS
+from demand_simulation import point_estimates
+
+# Shifts of a day (as on the staffing roster page): name, start hour, length in hours
+SHIFTS = ('Morning', 'Afternoon', 'Night')
+SHIFT_START_HOURS = np.array([8, 14, 20])
+SHIFT_HOURS = np.array([6, 6, 12])
+NIGHT = 2
+
+# Fraction of a day's Staff_Required needed on each shift
+SHIFT_LOAD = np.array([1.0, 0.85, 0.6])
+
+# Role mix of the staff demand, and the role whose slots a skill's demand is carved from
+ROLE_MIX = {'Doctor': 0.3, 'Nurse': 0.7}
+SKILL_ROLES = {'Surgeon': 'Doctor', 'ICU': 'Nurse'}
+
+# Days rostered when a request does not say, and the most it may ask for
+ROSTER_DAYS = 30
+MAX_ROSTER_DAYS = 90
+
+# Rolling window of the weekly hours limit (also the window hours are balanced over)
+WEEK_DAYS = 7
+
+DEFAULT_CONSTRAINTS = {
+    'max_weekly_hours': 48.0,
+    'min_rest_hours': 11.0,
+    'max_consecutive_days': 6,
+    'allow_consecutive_nights': False,
+    'min_coverage': {}          # {skill: staff on every shift}, e.g. {"ICU": 3}
+}
+
+
+def parse_constraints(overrides: Optional[Dict[str, Any]], base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """DEFAULT_CONSTRAINTS (or base) with the given overrides, validated"""
+    constraints = dict(base or DEFAULT_CONSTRAINTS)
+    for name, value in (overrides or {}).items():
+        if name not in DEFAULT_CONSTRAINTS:
+            raise ValueError(f"Unknown constraint '{name}'. Expected one of: {', '.join(DEFAULT_CONSTRAINTS)}")
+        if name == 'allow_consecutive_nights':
+            value = bool(value)
+        elif name == 'min_coverage':
+            if not isinstance(value, dict):
+                raise ValueError("min_coverage must be an object of {skill: staff per shift}")
+            value = {str(skill): int(count) for skill, count in value.items()}
+            if any(count < 0 for count in value.values()):
+                raise ValueError("min_coverage counts must be non-negative")
+        else:
+            value = float(value) if name != 'max_consecutive_days' else int(value)
+            if not value > 0:
+                raise ValueError(f"{name} must be a positive number")
+        constraints[name] = value
+    return constraints
+
+
+def forecast_staff(engine, scenarios: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """(days, 2) staff and surgeons required by a run of day scenarios, from case predictions"""
+    _, names, point, included = point_estimates(engine, scenarios)
+    default_staff = STANDARD_RESOURCE_FACTORS['staff'][1]
+    factors = np.array([
+        [RESOURCE_FACTORS.get(name, {}).get('staff_per_10_cases', default_staff),
+         RESOURCE_FACTORS.get(name, {}).get('surgeons_per_10_cases', 0.0)]
+        for name in names
+    ]) / 10
+    return (point * included) @ factors
+
+
+class RosterOptimizer:
+    """
+    Shift roster of one staff pool over a horizon of days
+
+    assign[s, d] is the shift staff member s works on day d (-1 = off) and group_of[s, d]
+    the requirement group (role or skill) it covers. Days are solved in order: each
+    shift's groups are filled scarcest first with the eligible staff who worked the
+    fewest hours in the last WEEK_DAYS, then fewest other skills, then staff order. Demand that cannot be
+    covered is reported as shortfall. Writers hold a lock.
+    """
+
+    def __init__(self, days: int = ROSTER_DAYS):
+        self.days = int(days)
+        self.start_date = None
+        self.constraints = parse_constraints(None)
+        self.staff_ids: List[str] = []
+        self.staff_index: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.roles: List[str] = []
+        self._lock = threading.Lock()
+        self.last_solve = {"from_day": None, "days_solved": 0}
+        self._setup_groups()
+
+        self.qualified = np.zeros((0, len(self.groups)), dtype=bool)
+        self.max_hours = np.zeros(0)
+        self.available = np.ones((0, self.days), dtype=bool)
+        self.locked = np.full((0, self.days), -1, dtype=np.int8)
+        self.assign = np.full((0, self.days), -1, dtype=np.int8)
+        self.group_of = np.full((0, self.days), -1, dtype=np.int16)
+        self.staff_required = np.zeros(self.days)
+        self.surgeons_required = np.zeros(self.days)
+        self.demand = self._requirements(self.staff_required, self.surgeons_required)
+
+    def _setup_groups(self):
+        """Role groups, then one group per skill with demand of its own"""
+        skills = ['Surgeon'] + [s for s in self.constraints['min_coverage'] if s != 'Surgeon']
+        self.groups = list(ROLE_MIX) + [s for s in skills if s not in ROLE_MIX]
+        self.group_ids = {g: i for i, g in enumerate(self.groups)}
+
+    # -- inputs -----------------------------------------------------------
+
+    def set_staff(self, records: Iterable[Dict[str, Any]], constraints: Optional[Dict[str, Any]] = None,
+                  days: Optional[int] = None, start_date: Optional[str] = None) -> int:
+        """
+        Replace the staff pool (and optionally constraints / horizon) and solve every day
+
+        Records: {"staff_id", "name", "role" (one of ROLE_MIX), "skills": [...],
+        "max_weekly_hours", "unavailable_days": [day, ...],
+        "locked_shifts": [{"day", "shift"}]}. Locked shifts are kept as given, outside
+        the constraints. Demand already set is kept for the days still in the horizon.
+        """
+        records = list(records)
+        constraints = parse_constraints(constraints, self.constraints)
+        days = self.days if days is None else int(days)
+        if not 0 < days <= MAX_ROSTER_DAYS:
+            raise ValueError(f"days must be between 1 and {MAX_ROSTER_DAYS}")
+        start = np.datetime64(str(start_date), 'D') if start_date is not None else self.start_date
+
+        staff_ids, names, roles, skills = [], [], [], []
+        max_hours = np.full(len(records), constraints['max_weekly_hours'])
+        available = np.ones((len(records), days), dtype=bool)
+        locked = np.full((len(records), days), -1, dtype=np.int8)
+        seen = set()
+        for s, record in enumerate(records):
+            staff_id = record.get('staff_id')
+            if staff_id is None:
+                raise ValueError(f"Staff {s}: staff_id is required")
+            staff_id = str(staff_id)
+            if staff_id in seen:
+                raise ValueError(f"Staff {staff_id}: listed twice")
+            seen.add(staff_id)
+            role = record.get('role')
+            if role not in ROLE_MIX:
+                raise ValueError(f"Staff {staff_id}: role must be one of: {', '.join(ROLE_MIX)}")
+            if 'max_weekly_hours' in record:
+                max_hours[s] = float(record['max_weekly_hours'])
+                if not max_hours[s] >= 0:
+                    raise ValueError(f"Staff {staff_id}: max_weekly_hours must be a non-negative number")
+            for day in record.get('unavailable_days', []):
+                available[s, self._day(day, days, staff_id)] = False
+            for shift in record.get('locked_shifts', []):
+                if shift.get('shift') not in SHIFTS:
+                    raise ValueError(f"Staff {staff_id}: shift must be one of: {', '.join(SHIFTS)}")
+                locked[s, self._day(shift.get('day'), days, staff_id)] = SHIFTS.index(shift['shift'])
+            staff_ids.append(staff_id)
+            names.append(str(record.get('name', staff_id)))
+            roles.append(role)
+            skills.append({str(skill) for skill in record.get('skills', [])})
+
+        with self._lock:
+            self.constraints = constraints
+            self._setup_groups()
+            qualified = np.zeros((len(records), len(self.groups)), dtype=bool)
+            for s, (role, own) in enumerate(zip(roles, skills)):
+                qualified[s] = [g == role or (g not in ROLE_MIX and g in own) for g in self.groups]
+
+            kept = min(days, self.days)
+            staff_required, surgeons_required = np.zeros(days), np.zeros(days)
+            staff_required[:kept], surgeons_required[:kept] = self.staff_required[:kept], self.surgeons_required[:kept]
+
+            self.days, self.start_date = days, start
+            self.staff_ids, self.names, self.roles = staff_ids, names, roles
+            self.staff_index = {staff_id: s for s, staff_id in enumerate(staff_ids)}
+            self.qualified, self.max_hours = qualified, max_hours
+            self.available, self.locked = available, locked
+            self.staff_required, self.surgeons_required = staff_required, surgeons_required
+            self.demand = self._requirements(staff_required, surgeons_required)
+            self.assign = np.full((len(records), days), -1, dtype=np.int8)
+            self.group_of = np.full((len(records), days), -1, dtype=np.int16)
+            self._solve(0, days)
+        return len(records)
+
+    @staticmethod
+    def _day(value, days: int, staff_id: str) -> int:
+        day = int(value)
+        if not 0 <= day < days:
+            raise ValueError(f"Staff {staff_id}: day {day} is outside the roster (0-{days - 1})")
+        return day
+
+    def set_demand(self, start_day: int, staff_required: Sequence[float],
+                   surgeons_required: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """
+        Set the staff demand of days start_day.. and re-solve from start_day
+
+        Returns last_solve: the first day re-solved and how many days were. The solve stops
+        early when the pool is busy enough that the roster settles back into the old one;
+        otherwise it runs to the end of the horizon.
+        """
+        staff_required = np.asarray(staff_required, dtype=float)
+        surgeons_required = (np.zeros(len(staff_required)) if surgeons_required is None
+                             else np.asarray(surgeons_required, dtype=float))
+        start_day = int(start_day)
+        end_day = start_day + len(staff_required)
+        if not 0 <= start_day < end_day <= self.days:
+            raise ValueError(f"Demand days must lie within the roster (0-{self.days - 1})")
+        if len(surgeons_required) != len(staff_required):
+            raise ValueError("surgeons_required must have one value per day")
+        if not (np.isfinite(staff_required).all() and np.isfinite(surgeons_required).all()) \
+                or (staff_required < 0).any() or (surgeons_required < 0).any():
+            raise ValueError("Staff demand must be non-negative numbers")
+
+        with self._lock:
+            self.staff_required[start_day:end_day] = staff_required
+            self.surgeons_required[start_day:end_day] = surgeons_required
+            self.demand[start_day:end_day] = self._requirements(staff_required, surgeons_required)
+            self._solve(start_day, end_day)
+            return dict(self.last_solve)
+
+    def _requirements(self, staff_required: np.ndarray, surgeons_required: np.ndarray) -> np.ndarray:
+        """(days, shifts, groups) staff to assign for daily staff / surgeon demand"""
+        # A hair below each integer so float noise never rounds up a whole person
+        ceil = lambda values: np.ceil(values - 1e-9).clip(min=0).astype(np.int32)
+        demand = np.zeros((len(staff_required), len(SHIFTS), len(self.groups)), dtype=np.int32)
+        per_shift = staff_required[:, None] * SHIFT_LOAD
+        for role, share in ROLE_MIX.items():
+            demand[..., self.group_ids[role]] = ceil(per_shift * share)
+
+        skills = {'Surgeon': ceil(surgeons_required[:, None] * SHIFT_LOAD)}
+        for skill, count in self.constraints['min_coverage'].items():
+            skills[skill] = np.maximum(skills.get(skill, 0), count)
+        for skill, needed in skills.items():
+            g, role = self.group_ids[skill], self.group_ids[SKILL_ROLES.get(skill, 'Nurse')]
+            demand[..., g] = needed
+            demand[..., role] = np.maximum(demand[..., role] - needed, 0)
+        return demand
+
+    # -- solving ----------------------------------------------------------
+
+    def _solve(self, start_day: int, end_day: int):
+        """
+        Re-solve from start_day; past end_day, stop once the carried state matches the old roster
+
+        A day's eligibility and ranking depend only on the hours worked on the previous
+        max(WEEK_DAYS, max_consecutive_days) days and on the previous day's shift, so once
+        those come out as before (and demand past them is unchanged), every later day would
+        too. Shifts of equal length swapped on earlier days, or a different group covered,
+        do not count as a change.
+        """
+        memory = max(WEEK_DAYS, self.constraints['max_consecutive_days'])
+        old = self.assign.copy()
+        solved = 0
+        for d in range(start_day, self.days):
+            self._solve_day(d)
+            solved += 1
+            if d >= end_day - 1 and np.array_equal(self._carried_state(self.assign, d, memory),
+                                                   self._carried_state(old, d, memory)):
+                break
+        self.last_solve = {"from_day": start_day, "days_solved": solved}
+
+    @staticmethod
+    def _carried_state(assign: np.ndarray, d: int, memory: int) -> np.ndarray:
+        """What days after d see of an assignment: hours worked on the last memory days, last day's shift"""
+        window = assign[:, max(d - memory + 1, 0):d + 1]
+        hours = np.where(window >= 0, SHIFT_HOURS[window], 0)
+        return np.column_stack([hours, assign[:, d]])
+
+    def _solve_day(self, d: int):
+        c = self.constraints
+        n_staff = len(self.staff_ids)
+        assign = np.full(n_staff, -1, dtype=np.int8)
+        group_of = np.full(n_staff, -1, dtype=np.int16)
+
+        # State carried in from the previous days
+        past = self.assign[:, max(d - WEEK_DAYS + 1, 0):d]
+        window_hours = np.where(past >= 0, SHIFT_HOURS[past], 0).sum(axis=1)
+        prev = self.assign[:, d - 1] if d else np.full(n_staff, -1, dtype=np.int8)
+        # Hour (relative to today 00:00) the previous day's shift ended
+        prev_end = np.where(prev >= 0, SHIFT_START_HOURS[prev] + SHIFT_HOURS[prev] - 24, -np.inf)
+        run = c['max_consecutive_days']
+        free = self.available[:, d].copy()
+        if d >= run:
+            free &= ~(self.assign[:, d - run:d] >= 0).all(axis=1)
+        locked = self.locked[:, d]
+        free &= locked < 0
+        other_skills = self.qualified.sum(axis=1)
+
+        for k in range(len(SHIFTS)):
+            need = self.demand[d, k].copy()
+
+            # Locked shifts cover a group they qualify for that still needs staff, skills first
+            for s in np.flatnonzero(locked == k):
+                open_groups = np.flatnonzero(self.qualified[s] & (need > 0))
+                g = open_groups[-1] if len(open_groups) else self.group_ids[self.roles[s]]
+                assign[s], group_of[s] = k, g
+                need[g] -= 1
+
+            eligible = free & (assign < 0)
+            eligible &= SHIFT_START_HOURS[k] - prev_end >= c['min_rest_hours']
+            eligible &= window_hours + SHIFT_HOURS[k] <= self.max_hours
+            if k == NIGHT and not c['allow_consecutive_nights']:
+                eligible &= prev != NIGHT
+
+            candidates_per_group = (self.qualified & eligible[:, None]).sum(axis=0)
+            for g in np.argsort(candidates_per_group - need, kind='stable'):
+                if need[g] <= 0:
+                    continue
+                candidates = np.flatnonzero(eligible & self.qualified[:, g])
+                if len(candidates) > need[g]:
+                    rank = np.lexsort((candidates, other_skills[candidates], window_hours[candidates]))
+                    candidates = candidates[rank[:need[g]]]
+                assign[candidates], group_of[candidates] = k, g
+                eligible[candidates] = False
+
+        self.assign[:, d] = assign
+        self.group_of[:, d] = group_of
+
+    # -- reads ------------------------------------------------------------
+
+    def _date(self, d: int) -> Optional[str]:
+        return str(self.start_date + d) if self.start_date is not None else None
+
+    def _assigned(self) -> np.ndarray:
+        """(days, shifts, groups) staff assigned"""
+        n_shifts, n_groups = len(SHIFTS), len(self.groups)
+        working = self.assign >= 0
+        d = np.nonzero(working)[1]
+        flat = (d * n_shifts + self.assign[working]) * n_groups + self.group_of[working]
+        return np.bincount(flat, minlength=self.days * n_shifts * n_groups).reshape(self.demand.shape)
+
+    def coverage(self, days: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        """Required / assigned / shortfall per day, shift and group"""
+        assigned = self._assigned()
+        shortfall = np.maximum(self.demand - assigned, 0)
+
+        result = []
+        for day in (range(self.days) if days is None else days):
+            shifts = {}
+            for k, shift in enumerate(SHIFTS):
+                shifts[shift] = {
+                    "required": dict(zip(self.groups, self.demand[day, k].tolist())),
+                    "assigned": dict(zip(self.groups, assigned[day, k].tolist())),
+                    "shortfall": dict(zip(self.groups, shortfall[day, k].tolist()))
+                }
+            result.append({
+                "day": day,
+                "date": self._date(day),
+                "staff_required": round(float(self.staff_required[day]), 1),
+                "surgeons_required": round(float(self.surgeons_required[day]), 1),
+                "shortfall": int(shortfall[day].sum()),
+                "shifts": shifts
+            })
+        return result
+
+    def roster(self, staff_ids: Optional[Sequence[str]] = None, day: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Shifts of every staff member (or the ones asked for), optionally for one day"""
+        rows = range(len(self.staff_ids)) if staff_ids is None else \
+            [self.staff_index[s] for s in staff_ids if s in self.staff_index]
+        hours = np.where(self.assign >= 0, SHIFT_HOURS[self.assign], 0)
+        weekly = np.cumsum(np.concatenate([np.zeros((len(hours), 1)), hours], axis=1), axis=1)
+        weekly = weekly[:, WEEK_DAYS:] - weekly[:, :-WEEK_DAYS] if self.days >= WEEK_DAYS else weekly[:, -1:]
+        days = range(self.days) if day is None else [day]
+
+        result = []
+        for s in rows:
+            shifts = []
+            for d in days:
+                k = self.assign[s, d]
+                if k < 0:
+                    continue
+                shifts.append({
+                    "day": d,
+                    "date": self._date(d),
+                    "shift": SHIFTS[k],
+                    "start": f"{SHIFT_START_HOURS[k]:02d}:00",
+                    "end": f"{(SHIFT_START_HOURS[k] + SHIFT_HOURS[k]) % 24:02d}:00",
+                    "covers": self.groups[self.group_of[s, d]],
+                    "locked": bool(self.locked[s, d] >= 0)
+                })
+            result.append({
+                "staff_id": self.staff_ids[s],
+                "name": self.names[s],
+                "role": self.roles[s],
+                "total_hours": int(hours[s].sum()),
+                "max_weekly_hours": int(weekly[s].max()) if weekly.size else 0,
+                "shifts": shifts
+            })
+        return result
+
+    def describe(self) -> Dict[str, Any]:
+        working = self.assign >= 0
+        return {
+            "staff": len(self.staff_ids),
+            "days": self.days,
+            "start_date": self._date(0),
+            "groups": self.groups,
+            "shifts_assigned": int(working.sum()),
+            "shifts_required": int(self.demand.sum()),
+            "shortfall": int(np.maximum(self.demand - self._assigned(), 0).sum()),
+            "constraints": self.constraints,
+            "last_solve": self.last_solve
+        }
@@ -0,0 +1,134 @@
+# sensitivity.py
+"""
+What-if sensitivity sweeps for the surge prediction engine
+Varies one or two readings (AQI, rainfall, temperature) over a grid around a base scenario,
+predicts every grid point x disease in one model call, and reports each disease's response
+curve and the readings at which it crosses its surge threshold.
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from demand_simulation import point_estimates
+
+# Readings a sweep may vary
+SWEEP_INPUTS = ('aqi', 'rainfall', 'temperature')
+
+# Axes per sweep, and grid steps per axis (default and most allowed)
+MAX_SWEEP_AXES = 2
+DEFAULT_SWEEP_STEPS = 20
+MAX_SWEEP_STEPS = 100
+
+# Diseases without a baseline surge threshold (predict_scenarios flags it on its own rule)
+UNTHRESHOLDED = ('Traffic_Accident',)
+
+
+def parse_axes(axes: Any) -> List[Tuple[str, np.ndarray]]:
+    """[{"input": "aqi", "start": 150, "stop": 400, "steps": 26}] -> [(input, grid values)]"""
+    if not isinstance(axes, list) or not 1 <= len(axes) <= MAX_SWEEP_AXES:
+        raise ValueError(f"sweep must be a list of 1 to {MAX_SWEEP_AXES} axes")
+    parsed = []
+    for axis in axes:
+        name = axis.get('input')
+        if name not in SWEEP_INPUTS:
+            raise ValueError(f"Unknown sweep input '{name}'. Expected one of: {', '.join(SWEEP_INPUTS)}")
+        if name in [n for n, _ in parsed]:
+            raise ValueError(f"'{name}' is swept more than once")
+        if 'start' not in axis or 'stop' not in axis:
+            raise ValueError(f"Axis '{name}' needs a start and a stop")
+        start, stop = float(axis['start']), float(axis['stop'])
+        steps = int(axis.get('steps', DEFAULT_SWEEP_STEPS))
+        if not 2 <= steps <= MAX_SWEEP_STEPS:
+            raise ValueError(f"steps must be between 2 and {MAX_SWEEP_STEPS}")
+        if not np.isfinite([start, stop]).all() or start == stop:
+            raise ValueError("start and stop must be different numbers")
+        parsed.append((name, np.linspace(start, stop, steps)))
+    return parsed
+
+
+def crossovers(values: np.ndarray, margin: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Where predicted - threshold changes sign along the last axis of margin
+
+    Returns (index along the other axes, interpolated value, rising) per crossing; a
+    crossing is rising when the disease goes into surge (margin reaches >= 0).
+    """
+    above = margin >= 0
+    changed = above[..., 1:] != above[..., :-1]
+    where = np.nonzero(changed)
+    lo = margin[..., :-1][where]
+    hi = margin[..., 1:][where]
+    step = where[-1]
+    # Linear interpolation of the zero between the two grid points
+    t = np.where(hi != lo, lo / np.where(hi != lo, lo - hi, 1.0), 0.0)
+    crossing = values[step] + t * (values[step + 1] - values[step])
+    return where[:-1], crossing, above[..., 1:][where]
+
+
+def sweep(engine, scenario: Dict[str, Any], axes: Sequence[Tuple[str, np.ndarray]],
+          scale_particulates: bool = True) -> Dict[str, Any]:
+    """
+    Response curves and surge crossovers of every disease over a grid of readings
+
+    scenario holds predict_surge_and_resources arguments; axes are parse_axes output.
+    With scale_particulates, PM2.5 and PM10 move in proportion to a swept AQI. Curves are
+    indexed [first axis][second axis]; crossovers run along the first axis, at every
+    value of the second.
+    """
+    names = [name for name, _ in axes]
+    grids = np.meshgrid(*[values for _, values in axes], indexing='ij')
+    shape = grids[0].shape
+
+    readings = {name: grid.ravel() for name, grid in zip(names, grids)}
+    if scale_particulates and 'aqi' in readings and scenario['aqi'] > 0:
+        ratio = readings['aqi'] / scenario['aqi']
+        readings['pm25'] = scenario['pm25'] * ratio
+        readings['pm10'] = scenario['pm10'] * ratio
+    points = [
+        {**scenario, **{key: float(values[i]) for key, values in readings.items()}}
+        for i in range(int(np.prod(shape)))
+    ]
+
+    # Every grid point x disease in one model call
+    _, diseases, point, _ = point_estimates(engine, points)
+    cases = point.T.reshape((len(diseases),) + shape)
+
+    results = {}
+    for j, disease in enumerate(diseases):
+        curve = np.round(cases[j], 1)
+        entry = {"predicted_cases": curve.tolist()}
+        if disease in UNTHRESHOLDED:
+            entry.update({"surge_threshold": None, "crossovers": []})
+            results[disease] = entry
+            continue
+
+        baseline, upper = engine.model.baseline(scenario['city'], disease, scenario['season'])
+        threshold = scenario['surge_multiplier'] * baseline
+        if upper is not None:
+            threshold = max(threshold, upper)
+
+        # Crossings along the first axis, one set per value of the second
+        margin = np.moveaxis(cases[j] - threshold, 0, -1)
+        index, crossing, rising = crossovers(axes[0][1], margin)
+        found = []
+        for k in range(len(crossing)):
+            item = {names[0]: round(float(crossing[k]), 2)}
+            for axis, i in zip(axes[1:], index):
+                item[axis[0]] = round(float(axis[1][i[k]]), 2)
+            item["direction"] = "into_surge" if rising[k] else "out_of_surge"
+            found.append(item)
+
+        entry.update({
+            "baseline_median": round(baseline, 1),
+            "surge_threshold": round(threshold, 1),
+            "surge_share": round(float((cases[j] >= threshold).mean()), 3),
+            "crossovers": found
+        })
+        results[disease] = entry
+
+    return {
+        "axes": {name: np.round(values, 2).tolist() for name, values in axes},
+        "grid_points": int(np.prod(shape)),
+        "diseases": results
+    }
@@ -0,0 +1,246 @@
+# surge_detector.py
+"""
+Streaming surge detection over observed daily case counts
+Keeps an EWMA mean / variance and a one-sided CUSUM per (city, disease) series in flat
+arrays, so every series costs a fixed few numbers and a day's feed across thousands of
+series is scored with a handful of vectorized steps.
+"""
+
+import threading
+from collections import deque, namedtuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from MLmodel import DISEASE_ADVISORIES, disease_resources
+
+# Weight of the newest count in the running mean and variance (~20 day memory)
+EWMA_ALPHA = 0.1
+
+# CUSUM slack and decision threshold, in standard deviations
+CUSUM_K = 0.5
+CUSUM_H = 4.0
+
+# Counts a series needs before it is scored, unless seeded from a baseline
+WARMUP_OBSERVATIONS = 7
+
+# z-score of the baseline upper quantile (P90 of a normal) used to seed the spread
+SEED_UPPER_Z = 1.2816
+
+# Alerts kept for /api/observations/alerts
+MAX_RECENT_ALERTS = 500
+
+# Initial slots in the series arrays (doubled when full)
+INITIAL_CAPACITY = 1024
+
+IngestResult = namedtuple("IngestResult", ["accepted", "alarmed", "alerts"])
+
+
+class SurgeDetector:
+    """
+    Online EWMA + CUSUM surge detector per (city, disease) series
+
+    Each count is standardized against the series' running mean and spread (never below
+    the Poisson spread sqrt(mean)); the CUSUM accumulates the excess over CUSUM_K and
+    raises an alert when it passes CUSUM_H. A series stays in alarm, without re-alerting
+    and without its running mean absorbing the surge, until the CUSUM drains back to zero.
+    New series are seeded from baseline_fn(city, disease, date) -> (median, upper) when
+    it knows them, so they are scored from their first count.
+    """
+
+    def __init__(
+        self,
+        alpha: float = EWMA_ALPHA,
+        k: float = CUSUM_K,
+        h: float = CUSUM_H,
+        warmup: int = WARMUP_OBSERVATIONS,
+        baseline_fn: Optional[Callable[[str, str, Any], Optional[Tuple[float, Optional[float]]]]] = None,
+        max_alerts: int = MAX_RECENT_ALERTS,
+    ):
+        self.alpha = float(alpha)
+        self.k = float(k)
+        self.h = float(h)
+        self.warmup = int(warmup)
+        self.baseline_fn = baseline_fn
+        self.keys: List[Tuple[str, str]] = []
+        self.ids: Dict[Tuple[str, str], int] = {}
+        self.recent_alerts = deque(maxlen=max_alerts)
+        self.total_observations = 0
+        self.total_alerts = 0
+        self._lock = threading.Lock()
+
+        self.mean = np.full(INITIAL_CAPACITY, np.nan)
+        self.var = np.zeros(INITIAL_CAPACITY)
+        self.cusum = np.zeros(INITIAL_CAPACITY)
+        self.n = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.last_day = np.full(INITIAL_CAPACITY, np.iinfo(np.int64).min, dtype=np.int64)
+        self.alerting = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self.seeded = np.zeros(INITIAL_CAPACITY, dtype=bool)
+
+    # -- series -----------------------------------------------------------
+
+    def _reserve(self, size: int):
+        capacity = len(self.mean)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for attr, fill in (('mean', np.nan), ('var', 0.0), ('cusum', 0.0), ('n', 0),
+                           ('last_day', np.iinfo(np.int64).min), ('alerting', False), ('seeded', False)):
+            array = getattr(self, attr)
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, attr, grown)
+
+    def _series_id(self, city: str, disease: str, day: np.datetime64) -> int:
+        key = (city, disease)
+        i = self.ids.get(key)
+        if i is not None:
+            return i
+        i = len(self.keys)
+        self._reserve(i + 1)
+        self.keys.append(key)
+        self.ids[key] = i
+
+        seed = self.baseline_fn(city, disease, day) if self.baseline_fn is not None else None
+        if seed is not None and seed[0] is not None and np.isfinite(seed[0]):
+            median, upper = seed
+            spread = (upper - median) / SEED_UPPER_Z if upper is not None and upper > median else 0.0
+            self.mean[i] = median
+            self.var[i] = spread ** 2
+            self.seeded[i] = True
+        return i
+
+    # -- ingestion --------------------------------------------------------
+
+    def ingest(self, cities: Sequence[str], diseases: Sequence[str], dates: Sequence[Any],
+               counts: Sequence[float]) -> IngestResult:
+        """
+        Score a batch of (city, disease, date, count) observations
+
+        Events are applied in date order. A count dated on or before its series' latest
+        count is stale and skipped. Returns per-event accepted / alarmed masks (in input
+        order) and the alerts raised, oldest first.
+        """
+        days = np.asarray(dates, dtype='datetime64[D]')
+        x = np.asarray(counts, dtype=float)
+        total = len(x)
+        accepted = np.zeros(total, dtype=bool)
+        alarmed = np.zeros(total, dtype=bool)
+        alerts = []
+        if not total:
+            return IngestResult(accepted, alarmed, alerts)
+
+        order = np.argsort(days, kind='stable')
+        with self._lock:
+            # Series of every event, and its occurrence number within the batch
+            ids = np.empty(total, dtype=np.intp)
+            rounds = np.empty(total, dtype=np.intp)
+            seen = {}
+            for pos in order:
+                i = self._series_id(cities[pos], diseases[pos], days[pos])
+                ids[pos] = i
+                rounds[pos] = seen.get(i, 0)
+                seen[i] = rounds[pos] + 1
+
+            # A series appears at most once per round, so each round is one vectorized step
+            day_numbers = days.astype(np.int64)
+            for r in range(int(rounds.max()) + 1):
+                events = np.flatnonzero(rounds == r)
+                fresh = day_numbers[events] > self.last_day[ids[events]]
+                events = events[fresh]
+                accepted[events] = True
+                alarmed[events], raised = self._step(ids[events], x[events], day_numbers[events])
+                for event, expected, z, cusum in raised:
+                    alerts.append(self._alert(ids[events[event]], days[events[event]], x[events[event]], expected, z, cusum))
+
+            self.total_observations += int(accepted.sum())
+            self.total_alerts += len(alerts)
+            alerts.sort(key=lambda alert: alert['date'])
+            self.recent_alerts.extend(alerts)
+        return IngestResult(accepted, alarmed, alerts)
+
+    def _step(self, ids: np.ndarray, x: np.ndarray, day_numbers: np.ndarray):
+        """One count for each of a set of distinct series; returns (in alarm, raised alerts)"""
+        mean = self.mean[ids]
+        var = self.var[ids]
+        n = self.n[ids]
+        first = np.isnan(mean)
+        mean = np.where(first, x, mean)
+
+        std = np.sqrt(np.maximum(var, np.maximum(mean, 1.0)))
+        z = np.where(first, 0.0, (x - mean) / std)
+        scored = (n >= self.warmup) | self.seeded[ids]
+        cusum = np.where(scored, np.maximum(0.0, self.cusum[ids] + z - self.k), 0.0)
+        signal = cusum > self.h
+        raw_cusum = cusum
+        # Capped at the threshold, so a series recovers within ~h / k normal days of a surge
+        cusum = np.minimum(cusum, self.h)
+        was_alerting = self.alerting[ids]
+        alerting = (was_alerting | signal) & (cusum > 0)
+        raised = np.flatnonzero(signal & ~was_alerting)
+
+        # Running mean and variance follow normal days only
+        diff = x - mean
+        follow = ~alerting & ~first
+        self.mean[ids] = np.where(follow, mean + self.alpha * diff, mean)
+        self.var[ids] = np.where(follow, (1 - self.alpha) * (var + self.alpha * diff ** 2),
+                                 np.where(first, np.maximum(x, 1.0), var))
+        self.cusum[ids] = cusum
+        self.n[ids] = n + 1
+        self.last_day[ids] = day_numbers
+        self.alerting[ids] = alerting
+        return alerting, [(j, float(mean[j]), float(z[j]), float(raw_cusum[j])) for j in raised]
+
+    def _alert(self, i: int, day: np.datetime64, observed: float, expected: float, z: float, cusum: float) -> Dict[str, Any]:
+        """Alert payload with the resources for the observed load and the disease advisories"""
+        city, disease = self.keys[i]
+        needs, specific = disease_resources(disease, observed)
+        return {
+            "city": city,
+            "disease": disease,
+            "date": str(day),
+            "observed_cases": round(float(observed), 1),
+            "expected_cases": round(expected, 1),
+            "excess_cases": round(max(float(observed) - expected, 0.0), 1),
+            "z_score": round(z, 2),
+            "cusum": round(cusum, 2),
+            "resources": {name: int(round(value)) for name, value in needs.items()},
+            "disease_specific_resources": specific,
+            "advisories": DISEASE_ADVISORIES.get(disease, [])
+        }
+
+    # -- reads ------------------------------------------------------------
+
+    def series_state(self, city: str, disease: str) -> Optional[Dict[str, Any]]:
+        i = self.ids.get((city, disease))
+        if i is None:
+            return None
+        return {
+            "city": city,
+            "disease": disease,
+            "observations": int(self.n[i]),
+            "expected_cases": round(float(self.mean[i]), 1),
+            "std": round(float(np.sqrt(max(self.var[i], self.mean[i], 1.0))), 2),
+            "cusum": round(float(self.cusum[i]), 2),
+            "in_alarm": bool(self.alerting[i]),
+            "last_date": str(np.datetime64(int(self.last_day[i]), 'D'))
+        }
+
+    def alerts(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recent alerts, newest first"""
+        recent = list(self.recent_alerts)[::-1]
+        return recent[:limit] if limit is not None else recent
+
+    def describe(self) -> Dict[str, Any]:
+        size = len(self.keys)
+        return {
+            "series": size,
+            "series_in_alarm": int(self.alerting[:size].sum()),
+            "observations": self.total_observations,
+            "alerts_raised": self.total_alerts,
+            "ewma_alpha": self.alpha,
+            "cusum_k": self.k,
+            "cusum_h": self.h,
+            "warmup_observations": self.warmup
+        }
@@ -0,0 +1,9 @@
+# conftest.py
+"""Put the service directory on sys.path so tests import its modules as app.py does"""
+
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
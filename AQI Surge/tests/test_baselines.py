@@ -0,0 +1,107 @@
+# test_baselines.py
+"""
+BaselineIndex against pandas groupby, and incremental updates against a full rebuild
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from baselines import MEDIAN, UPPER, BaselineIndex
+
+CITIES = ["Delhi", "Mumbai", "Kolkata"]
+DISEASES = ["Asthma", "Influenza"]
+
+
+def daily_counts(seed=3, days=240):
+    """One row per date, city and disease (some dropped), seasons by month"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-01", periods=days, freq="D")
+    rows = [
+        (date, city, disease)
+        for date in dates for city in CITIES for disease in DISEASES
+    ]
+    df = pd.DataFrame(rows, columns=["Date", "City", "Disease"])
+    df = df[rng.random(len(df)) > 0.2].reset_index(drop=True)
+    df["Season"] = np.where(df["Date"].dt.month.isin([4, 5, 6]), "Summer", "Winter")
+    df["Case_Count"] = rng.poisson(20, len(df)).astype(float)
+    return df
+
+
+def latest(df, window, keys):
+    """Each (city, disease, season) series' last `window` counts, grouped by keys"""
+    recent = df.sort_values("Date", kind="stable").groupby(["City", "Disease", "Season"]).tail(window)
+    return recent.groupby(keys)["Case_Count"]
+
+
+def assert_stats(index, df, window):
+    series = latest(df, window, ["City", "Disease", "Season"])
+    for (city, disease, season), median in series.median().items():
+        c, d, s = index.city_ids[city], index.disease_ids[disease], index.season_ids[season]
+        assert index.series[c, d, s, MEDIAN] == pytest.approx(median)
+        assert index.series[c, d, s, UPPER] == pytest.approx(series.quantile(0.9)[(city, disease, season)])
+        assert index.series_n[c, d, s] == series.size()[(city, disease, season)]
+
+    pooled = latest(df, window, ["Disease", "Season"])
+    for (disease, season), median in pooled.median().items():
+        d, s = index.disease_ids[disease], index.season_ids[season]
+        assert index.pooled[d, s, MEDIAN] == pytest.approx(median)
+        assert index.pooled[d, s, UPPER] == pytest.approx(pooled.quantile(0.9)[(disease, season)])
+
+    overall = latest(df, window, ["Disease"])
+    for disease, median in overall.median().items():
+        d = index.disease_ids[disease]
+        assert index.overall[d, MEDIAN] == pytest.approx(median)
+        assert index.overall[d, UPPER] == pytest.approx(overall.quantile(0.9)[disease])
+
+
+@pytest.mark.parametrize("window", [5, 90])
+def test_from_frame_matches_groupby(window):
+    df = daily_counts()
+    assert_stats(BaselineIndex.from_frame(df, window=window), df, window)
+
+
+@pytest.mark.parametrize("window", [5, 90])
+def test_updates_match_full_rebuild(window):
+    df = daily_counts()
+    # Late enough that both seasons have slots, so slot order matches the rebuild
+    cutoff = df["Date"].iloc[2 * len(df) // 3]
+    index = BaselineIndex.from_frame(df[df["Date"] < cutoff], window=window)
+    for row in df[df["Date"] >= cutoff].itertuples():
+        index.update(row.City, row.Disease, row.Case_Count, date=row.Date, season=row.Season)
+
+    rebuilt = BaselineIndex.from_frame(df, window=window)
+    for attr in ("counts", "cursor", "series_n", "pooled_n", "overall_n"):
+        np.testing.assert_array_equal(getattr(index, attr), getattr(rebuilt, attr), err_msg=attr)
+    # Quantiles of one series are interpolated separately from the vectorized rebuild
+    for attr in ("series", "pooled", "overall"):
+        np.testing.assert_allclose(getattr(index, attr), getattr(rebuilt, attr), rtol=1e-12, err_msg=attr)
+    assert_stats(index, df, window)
+
+
+def test_state_round_trip():
+    index = BaselineIndex.from_frame(daily_counts())
+    restored = BaselineIndex.from_state(index.state())
+    for city in CITIES:
+        for disease in DISEASES:
+            for season in ("Summer", "Winter"):
+                assert restored.lookup(city, disease, season) == index.lookup(city, disease, season)
+
+
+def test_lookup_falls_back_to_pooled_levels():
+    df = daily_counts()
+    index = BaselineIndex.from_frame(df, min_observations=7)
+    assert index.lookup("Delhi", "Asthma", "Winter")[2] == "city_season"
+    # Unknown city: pooled over the known cities for that disease and season
+    assert index.lookup("Pune", "Asthma", "Winter")[2] == "season"
+    # Unknown season: the disease overall
+    assert index.lookup("Delhi", "Asthma", "Spring")[2] == "disease"
+    assert index.lookup("Delhi", "Cholera", "Winter") is None
+
+
+def test_update_grows_new_slots():
+    index = BaselineIndex.from_frame(daily_counts(), min_observations=1)
+    median, upper, level = index.update("Pune", "Cholera", 12, season="Monsoon")
+    assert (median, upper, level) == (12.0, 12.0, "city_season")
+    assert index.counts.shape[:3] == (len(index.cities), len(index.diseases), len(index.seasons))
+    assert index.lookup("Delhi", "Asthma", "Winter")[2] == "city_season"
@@ -0,0 +1,127 @@
+# test_feature_layout.py
+"""
+FeatureLayout (the NumPy fast path) against the fitted pipeline it replaces
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from MLmodel import LAYOUT_TOLERANCE, FeatureLayout, SurgePredictionEngine, SurgePredictionModel
+
+CITIES = ["Delhi", "Mumbai", "Kolkata"]
+DISEASES = ["Asthma", "Influenza", "Dengue"]
+SEASONS = ["Winter", "Summer", "Monsoon", "Autumn"]
+FESTIVALS = ["None", "Diwali", "Holi"]
+DAY_TYPES = ["Weekday", "Saturday", "Sunday", "Holiday"]
+
+
+def random_raw(rng, n, cities=CITIES, seasons=SEASONS, festivals=FESTIVALS,
+               day_types=DAY_TYPES, low=0.0, high=500.0):
+    """Raw reading and label columns of n random days"""
+    return {
+        'AQI': rng.uniform(low, high, n),
+        'PM2.5': rng.uniform(low, high, n),
+        'PM10': rng.uniform(low, high, n),
+        'Temperature': rng.uniform(-5, 45, n),
+        'Humidity': rng.uniform(10, 100, n),
+        'Rainfall': rng.choice([0.0, 5.0, 80.0], n),
+        'City': rng.choice(np.array(cities, dtype=object), n),
+        'Season': rng.choice(np.array(seasons, dtype=object), n),
+        'Festival': rng.choice(np.array(festivals, dtype=object), n),
+        'Day_Type': rng.choice(np.array(day_types, dtype=object), n),
+    }
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """Engine over a small pipeline fitted on synthetic days"""
+    rng = np.random.default_rng(7)
+    model = SurgePredictionModel()
+    raw = random_raw(rng, 600)
+    frame = pd.DataFrame({**raw, **model.feature_transformer.transform(raw)})
+    frame['Disease'] = rng.choice(np.array(DISEASES, dtype=object), len(frame))
+    y = frame['AQI'] / 10 + frame['Season_Risk'] * 5 + rng.normal(0, 2, len(frame))
+
+    model.build_pipeline()
+    model.pipeline.set_params(model__n_estimators=25)
+    model.pipeline.fit(frame[model.NUM_FEATURES + model.CAT_FEATURES], y)
+    model.median_baselines = {disease: 10.0 for disease in DISEASES}
+    return SurgePredictionEngine(model)
+
+
+def random_scenarios(rng, n):
+    """
+    Scenarios mixing known and unknown categories, null festivals and readings
+    outside 0-500
+    """
+    raw = random_raw(
+        rng, n,
+        cities=CITIES + ["Pune"],
+        seasons=SEASONS + ["Spring"],
+        festivals=FESTIVALS + [None, "Christmas"],
+        day_types=DAY_TYPES + ["Normal Day"],
+        low=-50.0, high=900.0
+    )
+    return [
+        {
+            'city': raw['City'][i], 'aqi': raw['AQI'][i], 'pm25': raw['PM2.5'][i],
+            'pm10': raw['PM10'][i], 'temperature': raw['Temperature'][i],
+            'humidity': raw['Humidity'][i], 'rainfall': raw['Rainfall'][i],
+            'season': raw['Season'][i], 'festival': raw['Festival'][i],
+            'day_type': raw['Day_Type'][i],
+            'diseases': list(rng.choice(DISEASES + ["Cholera"], rng.integers(1, 5)))
+        }
+        for i in range(n)
+    ]
+
+
+def test_layout_is_compiled(engine):
+    assert isinstance(engine.layout, FeatureLayout)
+
+
+def test_transform_matches_preprocessor(engine):
+    rng = np.random.default_rng(11)
+    scenarios = random_scenarios(rng, 200)
+    _, diseases, features, counts = engine._feature_columns(scenarios)
+    frame = engine._row_frame(features, counts, diseases)
+
+    expected = engine.model.pipeline.named_steps['preprocessor'].transform(frame)
+    actual = engine.layout.transform(features, counts, {'Disease': engine._disease_column(diseases)})
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+
+
+def test_predictions_match_pipeline(engine):
+    rng = np.random.default_rng(12)
+    scenarios = random_scenarios(rng, 200)
+    _, diseases, features, counts = engine._feature_columns(scenarios)
+
+    expected = engine.model.pipeline.predict(engine._row_frame(features, counts, diseases))
+    actual = engine._predict(features, counts, diseases)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=LAYOUT_TOLERANCE)
+
+
+def test_unknown_categories_leave_columns_at_zero(engine):
+    layout = engine.layout
+    scenario = random_scenarios(np.random.default_rng(13), 1)[0]
+    scenario.update(city="Pune", season="Spring", festival="Christmas", diseases=["Cholera"])
+    _, diseases, features, counts = engine._feature_columns([scenario])
+    X = layout.transform(features, counts, {'Disease': engine._disease_column(diseases)})
+
+    for feature, value in (('City', 'Pune'), ('Disease', 'Cholera'), ('Season', 'Spring')):
+        lookup = layout.lookups[layout.cat_features.index(feature)]
+        assert value not in lookup
+        assert not X[0, sorted(lookup.values())].any()
+
+
+def test_check_layout_keeps_a_matching_layout(engine):
+    scenarios = random_scenarios(np.random.default_rng(14), 50)
+    assert engine.check_layout(scenarios) <= LAYOUT_TOLERANCE
+    assert engine.layout is not None
+
+
+def test_check_layout_falls_back_on_mismatch(engine):
+    broken = SurgePredictionEngine(engine.model)
+    broken.layout.mean = broken.layout.mean + 1.0
+    assert broken.check_layout(random_scenarios(np.random.default_rng(15), 20)) > LAYOUT_TOLERANCE
+    assert broken.layout is None and broken.regressor is None
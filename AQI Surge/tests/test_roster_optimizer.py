@@ -0,0 +1,69 @@
+# test_roster_optimizer.py
+"""
+Incremental roster re-solves against solving the same demand from scratch
+"""
+
+import numpy as np
+import pytest
+
+from roster_optimizer import RosterOptimizer
+
+DAYS = 30
+CONSTRAINTS = {"min_coverage": {"ICU": 1}}
+
+
+def staff_pool(n):
+    """30% doctors (every third a surgeon), the rest nurses (every fourth ICU-trained)"""
+    records = []
+    for i in range(n):
+        role = "Doctor" if i % 10 < 3 else "Nurse"
+        if role == "Doctor":
+            skills = ["Surgeon"] if i % 3 == 0 else []
+        else:
+            skills = ["ICU"] if i % 4 == 0 else []
+        records.append({"staff_id": f"S{i:03d}", "role": role, "skills": skills})
+    records[0]["unavailable_days"] = [3, 4]
+    records[1]["locked_shifts"] = [{"day": 10, "shift": "Night"}]
+    return records
+
+
+def solved_from_scratch(records, staff_required, surgeons_required):
+    roster = RosterOptimizer(days=DAYS)
+    roster.set_staff(records, constraints=CONSTRAINTS)
+    roster.set_demand(0, staff_required, surgeons_required)
+    return roster
+
+
+@pytest.mark.parametrize("pool, level", [(60, 25), (100, 50), (100, 15)])
+def test_incremental_matches_full_solve(pool, level):
+    rng = np.random.default_rng(pool + level)
+    records = staff_pool(pool)
+    staff_required = rng.uniform(0.8 * level, 1.2 * level, DAYS)
+    surgeons_required = np.full(DAYS, 2.0)
+    roster = solved_from_scratch(records, staff_required, surgeons_required)
+
+    early_stops = 0
+    for _ in range(10):
+        start = int(rng.integers(0, DAYS - 3))
+        length = int(rng.integers(1, 4))
+        staff_required[start:start + length] *= rng.uniform(0.7, 1.3, length)
+        solve = roster.set_demand(start, staff_required[start:start + length],
+                                  surgeons_required[start:start + length])
+        early_stops += solve["days_solved"] < DAYS - start
+
+        expected = solved_from_scratch(records, staff_required, surgeons_required)
+        np.testing.assert_array_equal(roster.assign, expected.assign)
+        np.testing.assert_array_equal(roster.group_of, expected.group_of)
+
+    if level > 15:
+        # A busy pool settles back into the old roster well before the horizon ends
+        assert early_stops > 0
+
+
+def test_solve_starts_at_changed_day():
+    records = staff_pool(60)
+    roster = solved_from_scratch(records, np.full(DAYS, 25.0), np.full(DAYS, 2.0))
+    before = roster.assign.copy()
+    solve = roster.set_demand(12, [30.0])
+    assert solve["from_day"] == 12
+    np.testing.assert_array_equal(roster.assign[:, :12], before[:, :12])
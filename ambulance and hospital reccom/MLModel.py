@@ -4,17 +4,21 @@ import pandas as pd
 import numpy as np
 import pickle
 import joblib
+import time
 from datetime import datetime
 
 from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.base import clone
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import warnings
 warnings.filterwarnings('ignore')
 
+from forest_quantiles import WaitingTimeEstimator, WAIT_MEAN, WAIT_P90
+
 # ============================================
 # ENHANCED CONFIGURATIONS
 # ============================================
@@ -23,6 +27,17 @@ DATA_PATH = "mumbai_hospital_ambulance_dataset_2000.csv"
 MODEL_PATH = "waiting_time_model.pkl"
 METADATA_PATH = "model_metadata.pkl"
 
+# Smaller companion models for latency-bound requests: (tier, trees, max depth), fastest first
+MODEL_TIER_SPECS = [
+    ("fast", 20, 8),
+    ("balanced", 50, 12),
+]
+MODEL_TIER_PATH = "waiting_time_model_{tier}.pkl"
+
+# Rows per timed prediction (about one hospital table, the cost of an uncached request)
+TIER_LATENCY_ROWS = 2000
+TIER_LATENCY_REPEATS = 7
+
 # Enhanced Symptom Mappings
 SYMPTOM_TO_SEVERITY = {
     "fever": "mild",
@@ -252,6 +267,9 @@ def train_enhanced_model(df: pd.DataFrame):
     print(f"[INFO] Saving model to {MODEL_PATH}...")
     joblib.dump(best_model, MODEL_PATH)
     
+    # Companion models are written before the metadata that lists them
+    model_tiers = train_model_tiers(best_model, X_train, y_train, X_test, y_test)
+    
     metadata = {
         'model_name': best_model_name,
         'mae': best_score,
@@ -263,7 +281,8 @@ def train_enhanced_model(df: pd.DataFrame):
         'symptom_to_speciality': SYMPTOM_TO_SPECIALITY,
         'severity_to_ambulance': SEVERITY_TO_AMBULANCE,
         'train_samples': len(X_train),
-        'test_samples': len(X_test)
+        'test_samples': len(X_test),
+        'model_tiers': model_tiers
     }
     
     with open(METADATA_PATH, 'wb') as f:
@@ -275,6 +294,72 @@ def train_enhanced_model(df: pd.DataFrame):
     return best_model, metadata
 
 
+# ============================================
+# LATENCY TIERS
+# ============================================
+
+def evaluate_tier(pipeline, X_test: pd.DataFrame, y_test: pd.Series) -> dict:
+    """Holdout accuracy, P90 coverage and prediction latency of one model, as the service runs it"""
+    estimator = WaitingTimeEstimator(pipeline)
+    stats = estimator.predict(X_test)
+    
+    rows = X_test.sample(TIER_LATENCY_ROWS, replace=True, random_state=42)
+    estimator.predict(rows)
+    timings = []
+    for _ in range(TIER_LATENCY_REPEATS):
+        start = time.perf_counter()
+        estimator.predict(rows)
+        timings.append(time.perf_counter() - start)
+    
+    return {
+        'mae': float(mean_absolute_error(y_test, stats[WAIT_MEAN])),
+        'rmse': float(np.sqrt(mean_squared_error(y_test, stats[WAIT_MEAN]))),
+        'r2': float(r2_score(y_test, stats[WAIT_MEAN])),
+        'p90_coverage': float(np.mean(y_test.to_numpy() <= stats[WAIT_P90])),
+        'latency_ms': round(float(np.median(timings)) * 1000, 2)
+    }
+
+
+def train_model_tiers(best_model, X_train, y_train, X_test, y_test) -> dict:
+    """
+    Fit the smaller companion forests and evaluate every tier on the holdout set
+    
+    Companions reuse the best model's preprocessing and are fit on the training labels
+    (not the best model's outputs), so the per-tree spread behind P90 stays calibrated.
+    Returns tier -> file and metrics, fastest first; "full" is the best model itself.
+    """
+    tiers = {}
+    for tier, n_estimators, max_depth in MODEL_TIER_SPECS:
+        print(f"\n[INFO] Training {tier} tier ({n_estimators} trees, depth {max_depth})...")
+        pipeline = Pipeline(steps=[
+            ("preprocess", clone(best_model.named_steps["preprocess"])),
+            ("model", RandomForestRegressor(
+                n_estimators=n_estimators,
+                max_depth=max_depth,
+                min_samples_split=5,
+                min_samples_leaf=2,
+                random_state=42,
+                n_jobs=-1
+            ))
+        ])
+        pipeline.fit(X_train, y_train)
+        
+        path = MODEL_TIER_PATH.format(tier=tier)
+        joblib.dump(pipeline, path)
+        tiers[tier] = {'path': path, 'n_estimators': n_estimators, 'max_depth': max_depth,
+                       **evaluate_tier(pipeline, X_test, y_test)}
+    
+    regressor = best_model.named_steps["model"]
+    tiers['full'] = {'path': MODEL_PATH, 'n_estimators': regressor.n_estimators,
+                     'max_depth': regressor.max_depth, **evaluate_tier(best_model, X_test, y_test)}
+    
+    print("\n[INFO] Model tiers (holdout):")
+    for tier, info in tiers.items():
+        print(f"  {tier:<9} MAE {info['mae']:.2f} min | P90 coverage {info['p90_coverage']:.0%} | "
+              f"{info['latency_ms']:.1f} ms per {TIER_LATENCY_ROWS} rows")
+    return tiers
+
+
 # ============================================
 # MAIN EXECUTION
 # ============================================
@@ -298,4 +383,5 @@ if __name__ == "__main__":
     print(f"Trained: {metadata['trained_date']}")
     print(f"Train samples: {metadata['train_samples']}")
     print(f"Test samples: {metadata['test_samples']}")
+    print(f"Tiers: {', '.join(metadata['model_tiers'])}")
     print("=" * 60)
\ No newline at end of file
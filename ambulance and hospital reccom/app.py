@@ -2,16 +2,39 @@
 # flaks code for hospital reccomend nd nearby ambulance booking
 # api url - https://hospital-recomm.onrender.com
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import joblib
 import pickle
 import math
-from typing import List, Dict, Any
+import hashlib
+import json
+import threading
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 import os
 
+try:
+    import orjson
+except ImportError:  # pinned in requirements.txt; bare installs fall back to json
+    orjson = None
+
+from availability import AvailabilityStore
+from model_registry import ModelRegistry
+from travel_time import TravelTimeEngine
+from tiles import TileIndex, build_tile_index, SEVERITIES, TILE_SHORTLIST
+from referrals import ReferralLedger
+from symptom_resolver import SymptomResolver, load_synonyms
+from forest_quantiles import WaitingTimeEstimator, WAIT_MEAN, WAIT_P50, WAIT_P90, WAIT_STATS
+from dispatch import AmbulanceFleet
+from tree_paths import TreePathExplainer
+from ed_simulator import (
+    EDSimulator, make_scenario, sample_wait_stats, BASELINE_SCENARIO,
+    DEFAULT_REPLICATIONS, MAX_REPLICATIONS, DEFAULT_SURGE_WINDOW_MIN
+)
+
 app = Flask(__name__)
 CORS(app)
 
@@ -22,26 +45,114 @@ CORS(app)
 MODEL_PATH = "waiting_time_model.pkl"
 METADATA_PATH = "model_metadata.pkl"
 DATA_PATH = "mumbai_hospital_ambulance_dataset_2000.csv"
+SYNONYMS_PATH = os.environ.get("SYMPTOM_SYNONYMS_PATH", "symptom_synonyms.json")
+
+# Local OSM extract for road travel times (straight-line estimates if missing)
+ROAD_NETWORK_PATH = os.environ.get("ROAD_NETWORK_PATH", "mumbai_roads.osm")
+
+# Seconds between checks for retrained artifacts (0 disables hot reload)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", "10"))
+
+# Load everything when the module is imported, as gunicorn workers do (0: caller loads)
+MODEL_LOAD_ON_IMPORT = os.environ.get("MODEL_LOAD_ON_IMPORT", "1") != "0"
+
+# Precomputed recommendation tiles (opt-in) and when to rebuild them; until then, the
+# specialities with capacity updates are scored on the full path
+TILE_MODE = os.environ.get("RECOMMEND_TILES", "0") == "1"
+TILE_INDEX_PATH = os.environ.get("TILE_INDEX_PATH", "recommendation_tiles.npz")
+TILE_REBUILD_UPDATES = 50
+
+# Largest number of incidents accepted in one dispatch batch
+MAX_DISPATCH_BATCH = 100
+
+# Largest /api/recommend/batch request (answered as streamed NDJSON)
+MAX_RECOMMEND_BATCH = 500
 
-# Global variables
+# Waiting time providers: the trained regressor, or the emergency queue simulation
+WAIT_PROVIDERS = ("model", "simulation")
+
+# A simulated scenario takes seconds to run, so /api/recommend queues uncached ones in the
+# background and answers 202 with a retry hint (about this many seconds per queued scenario)
+SIMULATION_RETRY_AFTER_S = 3
+MAX_PENDING_SIMULATIONS = 32
+
+# Model tiers (smaller companion models listed in the metadata); default tier per
+# emergency level, the fastest for critical cases
+FULL_TIER = "full"
+MODEL_TIER_BY_LEVEL = {
+    "critical": "fast",
+    "moderate": "balanced",
+    "mild": FULL_TIER,
+}
+
+# Critical cases are ranked on the P90 waiting time, so their default tier must cover at
+# least this share of holdout waits at its P90; otherwise the fastest tier that does serves
+MIN_P90_COVERAGE_BY_LEVEL = {
+    "critical": 0.8,
+}
+
+# Canary set: first rows of the hospital table x every known symptom
+CANARY_ROWS = 25
+MAX_PLAUSIBLE_WAIT_MIN = 24 * 60
+
+# Global variables (model/metadata mirror the registry's active version)
 model = None
 metadata = None
+symptom_resolver = None
 hospitals_df = None
+availability = None
+registry = None
+travel_times = None
+speciality_index = {}
+tile_index = None
+tile_source_fingerprint = None
+
+# Time-decayed referrals per hospital, rebuilt with the hospital table
+referrals = None
+
+# Emergency queue simulator seeded from the hospital table (the "simulation" provider)
+queue_simulator = None
+
+# Simulation cache keys waiting for the background worker, in arrival order
+pending_simulations = {}
+simulation_refresh_requested = threading.Event()
+simulation_lock = threading.Lock()
+simulation_worker = None
+
+# Live ambulance fleet (positions arrive through /api/ambulances)
+fleet = AmbulanceFleet()
+
+# Pre-encoded GET responses, rebuilt whenever data/metadata/availability change
+response_cache = {}
+
+# Hospital listing of the latest snapshot read, patched forward on the next read
+hospital_listing = None
+hospital_listing_lock = threading.Lock()
 
 def load_model_and_data():
     """Load trained model, metadata, and hospital data"""
-    global model, metadata, hospitals_df
+    global registry, travel_times
     
     try:
-        print("[INFO] Loading model...")
-        model = joblib.load(MODEL_PATH)
-        
-        print("[INFO] Loading metadata...")
-        with open(METADATA_PATH, 'rb') as f:
-            metadata = pickle.load(f)
+        print("[INFO] Loading road network...")
+        travel_times = TravelTimeEngine.from_file(ROAD_NETWORK_PATH)
         
         print("[INFO] Loading hospital dataset...")
-        hospitals_df = pd.read_csv(DATA_PATH)
+        set_hospital_data(pd.read_csv(DATA_PATH))
+        
+        print("[INFO] Loading model and metadata...")
+        if registry is not None:
+            registry.stop_watching()
+        registry = ModelRegistry(
+            [MODEL_PATH, METADATA_PATH],
+            loader=load_model_bundle,
+            validator=validate_model_bundle,
+            listeners=[activate_model_version]
+        )
+        if MODEL_WATCH_INTERVAL > 0:
+            # Watch even if the first load fails, so artifacts written later still go live
+            registry.start_watching(MODEL_WATCH_INTERVAL)
+        registry.load()
         
         print("[SUCCESS] All resources loaded successfully!")
         return True
@@ -50,6 +161,154 @@ def load_model_and_data():
         return False
 
 
+def model_unavailable() -> Optional[Tuple[Dict[str, Any], int]]:
+    """Error body and 503 while no model version is active, else None"""
+    if registry is None or registry.active is None:
+        return {
+            "status": "error",
+            "message": "Model not loaded. Please train the model first."
+        }, 503
+    return None
+
+
+def set_hospital_data(df: pd.DataFrame):
+    """Install a hospital table: builds the availability store and response cache"""
+    global hospitals_df, availability, travel_times, speciality_index, tile_source_fingerprint
+    global referrals, queue_simulator, tile_index
+    
+    hospitals_df = df
+    # Tiles were ranked on the previous table's capacities
+    tile_index = None
+    queue_simulator = EDSimulator.from_table(df)
+    if travel_times is None:
+        travel_times = TravelTimeEngine()
+    print("[INFO] Building availability store and response cache...")
+    availability = AvailabilityStore(
+        df,
+        engineer_fn=engineer_hospital_features,
+        predict_fn=predict_wait_for_rows,
+        batch_predict_fn=predict_wait_for_keys,
+        deferred_fn=is_simulation_key,
+        derived_columns=CAPACITY_DERIVED_COLUMNS,
+        listeners=[build_response_cache, check_tile_drift, check_stale_simulations]
+    )
+    # Warm the no-surge scenarios so plain simulation requests are answered straight away
+    for severity in SEVERITIES:
+        queue_simulation(("simulation", severity, BASELINE_SCENARIO))
+    
+    # Hospital locations and specialities do not change with availability updates
+    columns = availability.snapshot.columns
+    travel_times.set_targets(
+        columns["hospital_lat"].astype(float),
+        columns["hospital_lng"].astype(float),
+        columns["traffic_level"]
+    )
+    specialities = columns["speciality"]
+    speciality_index = {
+        spec: np.flatnonzero(specialities == spec)
+        for spec in pd.unique(specialities)
+    }
+    tile_source_fingerprint = hospital_data_fingerprint(availability.snapshot.df)
+    referrals = ReferralLedger(columns["hospital_name"], previous=referrals)
+    
+    if registry is not None and registry.active is not None:
+        schedule_tile_rebuild()
+
+
+def load_model_bundle() -> Dict[str, Any]:
+    """Load the waiting time model, its companion tiers and its metadata from disk"""
+    bundle = {"model": joblib.load(MODEL_PATH)}
+    with open(METADATA_PATH, 'rb') as f:
+        bundle["metadata"] = pickle.load(f)
+    bundle["tiers"] = load_model_tiers(bundle["model"], bundle["metadata"])
+    bundle["estimator"] = bundle["tiers"][FULL_TIER]["estimator"]
+    bundle["explainer"] = bundle["tiers"][FULL_TIER]["explainer"]
+    # Free-text symptom lookup over this version's symptom maps
+    bundle["resolver"] = SymptomResolver(
+        bundle["metadata"]['symptom_to_severity'],
+        load_synonyms(SYNONYMS_PATH)
+    )
+    return bundle
+
+
+def load_model_tiers(full_model, meta: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Estimator, explainer and holdout metrics of every model tier, fastest first"""
+    listed = dict(meta.get('model_tiers', {}))
+    listed.setdefault(FULL_TIER, {})
+    tiers = {}
+    for name, info in listed.items():
+        if name == FULL_TIER:
+            tier_model = full_model
+        elif os.path.exists(info['path']):
+            tier_model = joblib.load(info['path'])
+        else:
+            print(f"[ERROR] Model tier '{name}' not found at {info['path']}, skipping")
+            continue
+        tiers[name] = {
+            "estimator": WaitingTimeEstimator(tier_model),
+            # Per-prediction attributions (None when the model is not a tree ensemble)
+            "explainer": TreePathExplainer.from_model(tier_model),
+            "info": info
+        }
+    return tiers
+
+
+def validate_model_bundle(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    """Warm a candidate model on the canary set; raises if its predictions are unusable"""
+    meta = bundle["metadata"]
+    rows = availability.snapshot.df.head(CANARY_ROWS)
+    
+    batch = pd.concat([
+        rows.assign(symptom=symptom, severity=severity)
+        for symptom, severity in meta['symptom_to_severity'].items()
+    ], ignore_index=True)
+    batch = engineer_request_features(batch)
+    
+    missing = [c for c in meta['feature_cols'] if c not in batch.columns]
+    if missing:
+        raise ValueError(f"Model expects unknown features: {', '.join(missing)}")
+    
+    # Every tier must pass; the full model's predictions are reported
+    tier_means = {}
+    for name, tier in bundle["tiers"].items():
+        tier_stats = tier["estimator"].predict(batch[meta['feature_cols']])
+        if name == FULL_TIER:
+            stats = tier_stats
+        if tier_stats.shape[1] != len(batch) or not np.all(np.isfinite(tier_stats)):
+            raise ValueError(f"Canary predictions of the {name} tier are missing or not finite")
+        if tier_stats.min() < 0 or tier_stats.max() > MAX_PLAUSIBLE_WAIT_MIN:
+            raise ValueError(
+                f"Canary waiting times of the {name} tier out of range: "
+                f"{tier_stats.min():.1f}-{tier_stats.max():.1f} min"
+            )
+        tier_means[name] = round(float(tier_stats[WAIT_MEAN].mean()), 2)
+    
+    predictions = stats[WAIT_MEAN]
+    
+    return {
+        "predictions": int(len(predictions)),
+        "mean_wait_min": round(float(predictions.mean()), 2),
+        "min_wait_min": round(float(predictions.min()), 2),
+        "max_wait_min": round(float(predictions.max()), 2),
+        "mean_p90_wait_min": round(float(stats[WAIT_P90].mean()), 2),
+        "quantiles": bundle["estimator"].has_quantiles,
+        "tier_mean_wait_min": tier_means
+    }
+
+
+def activate_model_version(version):
+    """Registry listener: mirror the active version into the module globals and caches"""
+    global model, metadata, symptom_resolver
+    
+    model = version.payload["model"]
+    metadata = version.payload["metadata"]
+    symptom_resolver = version.payload["resolver"]
+    if availability is not None:
+        availability.prune_predictions(lambda key: key[0] is version or key[0] == "simulation")
+        availability.refresh_listeners()
+        schedule_tile_rebuild()
+
+
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
@@ -69,8 +328,27 @@ def haversine_distance_km(lat1, lon1, lat2, lon2) -> float:
     return R * c
 
 
-def engineer_features_for_prediction(df: pd.DataFrame) -> pd.DataFrame:
-    """Apply same feature engineering as training"""
+def haversine_distance_km_vec(lat1, lon1, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Vectorized haversine distance from one point to arrays of coordinates"""
+    R = 6371.0  # Earth radius in km
+    
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lon2) - np.radians(lon1)
+    
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    
+    return R * c
+
+
+# Features derived from the capacity columns; recomputed on availability updates
+CAPACITY_DERIVED_COLUMNS = ['total_capacity', 'icu_ratio', 'ventilator_ratio']
+
+
+def engineer_hospital_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the per-hospital part of the training feature engineering"""
     df = df.copy()
     
     # Total capacity
@@ -88,10 +366,6 @@ def engineer_features_for_prediction(df: pd.DataFrame) -> pd.DataFrame:
     traffic_map = {'Low': 1, 'Moderate': 2, 'High': 3}
     df['traffic_numeric'] = df['traffic_level'].map(traffic_map)
     
-    # Severity numeric
-    severity_map = {'mild': 1, 'moderate': 2, 'severe': 3}
-    df['severity_numeric'] = df['severity'].map(severity_map)
-    
     # Distance from center
     central_lat, central_lng = 19.0760, 72.8777
     df['distance_from_center'] = np.sqrt(
@@ -102,32 +376,200 @@ def engineer_features_for_prediction(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def normalize_series(s: pd.Series) -> pd.Series:
-    """Normalize a series to 0-1 range"""
-    if s.max() == s.min():
-        return pd.Series([0.5] * len(s), index=s.index)
-    return (s - s.min()) / (s.max() - s.min())
+def engineer_request_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the per-request part of the training feature engineering (in place)"""
+    severity_map = {'mild': 1, 'moderate': 2, 'severe': 3}
+    df['severity_numeric'] = df['severity'].map(severity_map)
+    return df
+
+
+def engineer_features_for_prediction(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply same feature engineering as training"""
+    return engineer_request_features(engineer_hospital_features(df))
+
+
+def predict_wait_for_rows(rows: pd.DataFrame, key) -> np.ndarray:
+    """
+    Predict waiting time for engineered hospital rows; key is (model_version, symptom, severity,
+    model_tier), or ("simulation", severity, scenario) for the queue simulator
+    
+    Returns a (3, n) array: mean, P50 and P90 (see forest_quantiles.WAIT_STATS).
+    """
+    if key[0] == "simulation":
+        return queue_simulator.predict(rows, key[1], key[2])
+    version, symptom, severity, tier = key
+    bundle = version.payload
+    rows = engineer_request_features(rows.assign(symptom=symptom, severity=severity))
+    return bundle["tiers"][tier]["estimator"].predict(rows[bundle["metadata"]['feature_cols']])
+
+
+def predict_wait_for_keys(rows: pd.DataFrame, keys: List[Tuple]) -> np.ndarray:
+    """Predict waiting time for several (model_version, symptom, severity, model_tier) keys in one pass"""
+    if keys[0][0] == "simulation" or len({key[3] for key in keys}) > 1:
+        return np.stack([predict_wait_for_rows(rows, key) for key in keys])
+    bundle = keys[0][0].payload
+    batch = pd.concat([
+        rows.assign(symptom=symptom, severity=severity)
+        for _, symptom, severity, _ in keys
+    ], ignore_index=True)
+    batch = engineer_request_features(batch)
+    stats = bundle["tiers"][keys[0][3]]["estimator"].predict(batch[bundle["metadata"]['feature_cols']])
+    return stats.reshape(len(WAIT_STATS), len(keys), len(rows)).transpose(1, 0, 2)
+
 
+def normalize_array(a: np.ndarray, a_min: float = None, a_max: float = None) -> np.ndarray:
+    """Normalize an array to 0-1 range (optionally over a known min/max)"""
+    a_min = a.min() if a_min is None else a_min
+    a_max = a.max() if a_max is None else a_max
+    if a_max == a_min:
+        return np.full(len(a), 0.5)
+    return (a - a_min) / (a_max - a_min)
 
-def infer_severity(symptom: str) -> str:
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k lowest scores in ascending order, ties kept in input order"""
+    n = len(scores)
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        # Partial selection: O(n) instead of sorting every candidate
+        idx = np.argpartition(scores, k - 1)[:k]
+        # Include every candidate tied with the k-th score so ties resolve by position
+        kth = scores[idx].max()
+        idx = np.flatnonzero(scores <= kth)
+    else:
+        idx = np.arange(n)
+    order = np.lexsort((idx, scores[idx]))
+    return idx[order][:k]
+
+
+def shortlist_still_exact(base: np.ndarray, scores: np.ndarray, top_k: int, n_candidates: int) -> bool:
+    """
+    Whether a tile's short list still holds the true top-k once referral delays are added
+
+    The short list contains the TILE_SHORTLIST best rows by base score, so every row left
+    out scores at least the TILE_SHORTLIST-th base score; delays only add to scores.
+    """
+    k = min(top_k, len(scores))
+    if k == 0 or len(base) >= n_candidates:
+        return True
+    m = min(TILE_SHORTLIST, len(base))
+    cutoff = np.partition(base, m - 1)[m - 1]
+    return np.partition(scores, k - 1)[k - 1] < cutoff
+
+
+def canonical_symptom(symptom: str, resolver: SymptomResolver = None) -> str:
+    """Known symptom for free text (typos, synonyms, phrases), else the text lowercased"""
+    resolver = resolver or symptom_resolver
+    match = resolver.resolve(symptom) if resolver is not None else None
+    return match.symptom if match is not None else symptom.lower()
+
+
+def infer_severity(symptom: str, meta: Dict[str, Any] = None, resolver: SymptomResolver = None) -> str:
     """Infer severity from symptom"""
-    return metadata['symptom_to_severity'].get(symptom.lower(), "moderate")
+    meta = meta or metadata
+    return meta['symptom_to_severity'].get(canonical_symptom(symptom, resolver), "moderate")
 
 
-def infer_speciality(symptom: str) -> str:
+def infer_speciality(symptom: str, meta: Dict[str, Any] = None, resolver: SymptomResolver = None) -> str:
     """Infer required speciality from symptom"""
-    return metadata['symptom_to_speciality'].get(symptom.lower(), "General Medicine")
+    meta = meta or metadata
+    return meta['symptom_to_speciality'].get(canonical_symptom(symptom, resolver), "General Medicine")
+
+
+def wait_key(active, symptom: str, severity: str, wait_provider: str = "model", scenario=None,
+             tier: str = FULL_TIER) -> Tuple:
+    """Availability cache key of a waiting time prediction from either provider"""
+    if wait_provider == "simulation":
+        return ("simulation", severity.lower(), scenario or BASELINE_SCENARIO)
+    return (active, symptom, severity, tier)
+
+
+def select_model_tier(bundle: Dict[str, Any], emergency_level: str = None, model_tier: str = None,
+                      latency_budget_ms=None) -> str:
+    """
+    Model tier for one request: the requested tier, else the most accurate tier (holdout MAE)
+    whose measured latency fits the budget, else the emergency level's default tier
 
+    A default tier below the level's minimum P90 coverage gives way to the fastest tier that
+    meets it. Tiers missing from this model version fall back to the full model.
+    """
+    tiers = bundle["tiers"]
+    if model_tier is not None:
+        if model_tier not in tiers:
+            raise ValueError(f"model_tier must be one of: {', '.join(tiers)}")
+        return model_tier
+    
+    if latency_budget_ms is not None:
+        budget = float(latency_budget_ms)
+        if not budget > 0:
+            raise ValueError("latency_budget_ms must be positive")
+        timed = {name: tier["info"]["latency_ms"] for name, tier in tiers.items()
+                 if "latency_ms" in tier["info"]}
+        within = [name for name, ms in timed.items() if ms <= budget]
+        if within:
+            return min(within, key=lambda name: tiers[name]["info"].get("mae", math.inf))
+        # Nothing fits: the fastest tier comes closest
+        return min(timed, key=timed.get) if timed else FULL_TIER
+    
+    tier = MODEL_TIER_BY_LEVEL.get(emergency_level, FULL_TIER)
+    if tier not in tiers:
+        return FULL_TIER
+    
+    min_coverage = MIN_P90_COVERAGE_BY_LEVEL.get(emergency_level)
+    if min_coverage is not None:
+        # Tiers are listed fastest first; ones without the metric do not qualify
+        covered = [name for name, info in tiers.items()
+                   if info["info"].get("p90_coverage", 0.0) >= min_coverage]
+        if tier not in covered:
+            return next(iter(covered), FULL_TIER)
+    return tier
 
-def get_ambulance_type(severity: str) -> str:
+
+def get_ambulance_type(severity: str, meta: Dict[str, Any] = None) -> str:
     """Get recommended ambulance type based on severity"""
-    return metadata['severity_to_ambulance'].get(severity.lower(), "BLS")
+    meta = meta or metadata
+    return meta['severity_to_ambulance'].get(severity.lower(), "BLS")
 
 
 # ============================================
 # RECOMMENDATION ENGINE
 # ============================================
 
+# Expected extra waiting time per recent (undecayed) referral to a hospital
+REFERRAL_WAIT_MIN = 10.0
+
+# (travel time weight, waiting time weight) per emergency level
+EMERGENCY_WEIGHTS = {
+    "critical": (0.7, 0.3),
+    "moderate": (0.5, 0.5),
+    "mild": (0.3, 0.7),
+}
+
+# Waiting time statistic each emergency level is ranked on (critical: worst case)
+WAIT_STAT_BY_LEVEL = {
+    "critical": WAIT_P90,
+    "moderate": WAIT_MEAN,
+    "mild": WAIT_MEAN,
+}
+
+# Severity ranks, and how much each symptom's severity weighs in a multi-symptom profile
+SEVERITY_RANK = {"mild": 1, "moderate": 2, "severe": 3}
+
+# Score penalty for a hospital of a secondary speciality (scaled by how secondary it is)
+SPECIALITY_MISMATCH_WEIGHT = 0.25
+
+
+def emergency_level_for(severity: str) -> str:
+    """Derive emergency level from severity"""
+    if severity.lower() == "severe":
+        return "critical"
+    elif severity.lower() == "moderate":
+        return "moderate"
+    return "mild"
+
+
 def recommend_hospitals(
     user_lat: float,
     user_lng: float,
@@ -135,225 +577,1037 @@ def recommend_hospitals(
     severity: str = None,
     emergency_level: str = None,
     top_k: int = 5,
+    wait_provider: str = "model",
+    scenario=None,
+    model_tier: str = None,
+    latency_budget_ms=None,
 ) -> List[Dict[str, Any]]:
     """
     Main recommendation logic
+
+    wait_provider "simulation" takes waiting times from the emergency queue simulator
+    under scenario (ed_simulator.Scenario, default: no surge) instead of the model.
+    Model waiting times come from the tier picked by select_model_tier (None for the
+    simulator), which is returned after the speciality.
     """
     
+    # The whole request runs on the model version active when it started
+    active = registry.active
+    meta = active.payload["metadata"]
+    resolver = active.payload["resolver"]
+    
+    # Score on the known symptom the free text resolves to (unknown text passes through)
+    match = resolver.resolve(symptom)
+    if match is not None:
+        symptom = match.symptom
+    
     # Infer severity if not provided
     if severity is None:
-        severity = infer_severity(symptom)
+        severity = infer_severity(symptom, meta, resolver)
     
     # Derive emergency level from severity
     if emergency_level is None:
-        if severity.lower() == "severe":
-            emergency_level = "critical"
-        elif severity.lower() == "moderate":
-            emergency_level = "moderate"
-        else:
-            emergency_level = "mild"
+        emergency_level = emergency_level_for(severity)
     
     # Infer required speciality
-    required_speciality = infer_speciality(symptom)
+    required_speciality = infer_speciality(symptom, meta, resolver)
+    
+    # Read one consistent availability snapshot for the whole request
+    snapshot = availability.snapshot
+    columns = snapshot.columns
     
     # Filter hospitals by speciality
-    candidates = hospitals_df[hospitals_df["speciality"] == required_speciality].copy()
+    positions = speciality_index.get(required_speciality)
     
-    if candidates.empty:
+    if positions is None:
         # Fallback to all hospitals
-        candidates = hospitals_df.copy()
-    
-    # Prepare features for prediction
-    candidates["symptom"] = symptom
-    candidates["severity"] = severity
-    
-    # Apply feature engineering
-    candidates = engineer_features_for_prediction(candidates)
-    
-    # Predict waiting time
-    feature_cols = metadata['feature_cols']
-    predicted_wait = model.predict(candidates[feature_cols])
-    candidates["predicted_waiting_time"] = predicted_wait
-    
-    # Calculate distances
-    distances = []
-    for _, row in candidates.iterrows():
-        d = haversine_distance_km(
-            user_lat, user_lng,
-            row["hospital_lat"], row["hospital_lng"]
+        positions = np.arange(len(snapshot.df))
+    
+    # Common case: re-score a precomputed short list instead of every candidate; tiles are
+    # ranked on the full model's waiting times, so only requests on that tier use them
+    tile, tier = None, None
+    if wait_provider == "model":
+        tier = select_model_tier(active.payload, emergency_level, model_tier, latency_budget_ms)
+        if tier == FULL_TIER:
+            tile = lookup_tile(active, snapshot, user_lat, user_lng, symptom, severity,
+                               required_speciality, emergency_level, top_k)
+    
+    # Predicted waiting time (cached per symptom/severity/tier for the snapshot); critical
+    # cases are ranked on the P90 waiting time rather than the mean
+    key = wait_key(active, symptom, severity, wait_provider, scenario, tier)
+    require_simulated_waits(snapshot, key)
+    wait_stats = availability.predicted_wait(snapshot, key)
+    all_wait = wait_stats[WAIT_STAT_BY_LEVEL.get(emergency_level, WAIT_MEAN)]
+    spec_wait = all_wait[positions]
+    
+    # Severity-aware scoring on time to treatment: travel time vs waiting time
+    alpha_travel, alpha_wait = EMERGENCY_WEIGHTS.get(emergency_level, EMERGENCY_WEIGHTS["mild"])
+    
+    # Waits are normalized over the whole speciality; referral delay is added on that scale
+    wait_lo, wait_hi = spec_wait.min(), spec_wait.max()
+    wait_span = wait_hi - wait_lo if wait_hi > wait_lo else 1.0
+    
+    def score(candidates, travel_min, travel_lo, travel_hi):
+        base = (
+            alpha_travel * normalize_array(travel_min, travel_lo, travel_hi) +
+            alpha_wait * normalize_array(all_wait[candidates], wait_lo, wait_hi)
         )
-        distances.append(d)
-    candidates["distance_km"] = distances
-    
-    # Normalize distance and waiting time
-    candidates["dist_norm"] = normalize_series(candidates["distance_km"])
-    candidates["wait_norm"] = normalize_series(candidates["predicted_waiting_time"])
-    
-    # Severity-aware scoring
-    if emergency_level == "critical":
-        alpha_dist = 0.7
-        alpha_wait = 0.3
-    elif emergency_level == "moderate":
-        alpha_dist = 0.5
-        alpha_wait = 0.5
-    else:  # mild
-        alpha_dist = 0.3
-        alpha_wait = 0.7
-    
-    candidates["score"] = (
-        alpha_dist * candidates["dist_norm"] +
-        alpha_wait * candidates["wait_norm"]
+        # Recent referrals (time-decayed) count as extra expected waiting time
+        delay = REFERRAL_WAIT_MIN * referrals.row_loads(candidates)
+        return base, base + alpha_wait * delay / wait_span, delay
+    
+    if tile is not None:
+        candidates = tile.rows
+        access_min = travel_times.access_minutes(user_lat, user_lng, tile.origin_lat, tile.origin_lng)
+        travel_min = access_min + tile.road_min.astype(float)
+        base, scores, delay = score(candidates, travel_min,
+                                    access_min + tile.travel_lo, access_min + tile.travel_hi)
+        if delay.any() and not shortlist_still_exact(base, scores, top_k, len(positions)):
+            tile = None
+    
+    if tile is None:
+        # Road travel time (one graph search per origin cell, cached)
+        candidates = positions
+        travel_min = travel_times.travel_minutes(user_lat, user_lng, positions)
+        base, scores, delay = score(candidates, travel_min, travel_min.min(), travel_min.max())
+    
+    # Partial top-k selection instead of sorting every candidate
+    top = top_k_indices(scores, top_k)
+    
+    results = format_recommendations(
+        user_lat, user_lng, columns, candidates[top], travel_min[top],
+        wait_stats[:, candidates[top]], delay[top], scores[top], get_ambulance_type(severity, meta)
+    )
+    
+    return results, severity, emergency_level, required_speciality, tier
+
+
+def parse_symptoms(value) -> List[str]:
+    """Symptom list from a list or a comma/semicolon separated string"""
+    if isinstance(value, str):
+        value = value.replace(";", ",").split(",")
+    if not isinstance(value, list):
+        raise ValueError("symptoms must be a list or a comma-separated string")
+    symptoms = [str(s).strip() for s in value if str(s).strip()]
+    if not symptoms:
+        raise ValueError("At least one symptom is required")
+    return symptoms
+
+
+def symptom_profile(symptoms: List[str], meta: Dict[str, Any], resolver: SymptomResolver) -> Dict[str, Any]:
+    """
+    Weighted speciality / severity profile of several free-text symptoms
+
+    Each resolved symptom weighs confidence x severity rank; a speciality's weight is the
+    share of its symptoms. The case severity is the most severe symptom's.
+    """
+    resolved = []
+    known = {}
+    for text in symptoms:
+        match = resolver.resolve(text)
+        resolved.append({
+            "text": text,
+            "symptom": match.symptom if match else None,
+            "confidence": match.confidence if match else 0.0
+        })
+        if match is not None and match.confidence > known.get(match.symptom, 0.0):
+            known[match.symptom] = match.confidence
+    
+    weights = {}
+    lead = {}
+    severity = None
+    for symptom, confidence in known.items():
+        symptom_severity = meta['symptom_to_severity'].get(symptom, "moderate")
+        speciality = meta['symptom_to_speciality'].get(symptom, "General Medicine")
+        weight = confidence * SEVERITY_RANK.get(symptom_severity, 2)
+        weights[speciality] = weights.get(speciality, 0.0) + weight
+        # The speciality's heaviest symptom drives its waiting time prediction
+        if weight > lead.get(speciality, (None, 0.0))[1]:
+            lead[speciality] = (symptom, weight)
+        if severity is None or SEVERITY_RANK.get(symptom_severity, 2) > SEVERITY_RANK[severity]:
+            severity = symptom_severity
+    
+    total = sum(weights.values())
+    return {
+        "resolved": resolved,
+        "severity": severity,
+        "specialities": {spec: w / total for spec, w in weights.items()},
+        "lead_symptoms": {spec: symptom for spec, (symptom, _) in lead.items()},
+    }
+
+
+def recommend_for_symptoms(
+    user_lat: float,
+    user_lng: float,
+    symptoms: List[str],
+    severity: str = None,
+    emergency_level: str = None,
+    top_k: int = 5,
+    wait_provider: str = "model",
+    scenario=None,
+    model_tier: str = None,
+    latency_budget_ms=None,
+) -> Tuple[List[Dict[str, Any]], str, str, Dict[str, Any], Optional[str]]:
+    """
+    Recommendation for several symptoms: one ranked list across every relevant speciality
+
+    Candidates are the hospitals of each speciality in the symptom profile. Their waiting
+    times come from one batched prediction (the lead symptom of each speciality at the case
+    severity), and hospitals of secondary specialities pay a penalty that shrinks with the
+    speciality's weight, so a much closer secondary hospital can still win.
+    """
+    active = registry.active
+    meta = active.payload["metadata"]
+    resolver = active.payload["resolver"]
+    
+    profile = symptom_profile(symptoms, meta, resolver)
+    spec_weights = profile["specialities"]
+    if len(spec_weights) <= 1:
+        # Nothing to combine: one speciality (or no known symptom) takes the regular path
+        lead = next(iter(profile["lead_symptoms"].values()), symptoms[0])
+        results, severity, emergency_level, speciality, tier = recommend_hospitals(
+            user_lat, user_lng, lead, severity or profile["severity"], emergency_level, top_k,
+            wait_provider, scenario, model_tier, latency_budget_ms)
+        profile["specialities"] = {speciality: 1.0}
+        return results, severity, emergency_level, profile, tier
+    
+    severity = severity or profile["severity"]
+    if emergency_level is None:
+        emergency_level = emergency_level_for(severity)
+    tier = None
+    if wait_provider == "model":
+        tier = select_model_tier(active.payload, emergency_level, model_tier, latency_budget_ms)
+    
+    snapshot = availability.snapshot
+    columns = snapshot.columns
+    
+    # Candidates of every speciality in the profile, in table order
+    specs = sorted(spec_weights)
+    spec_rows = [speciality_index.get(spec, np.empty(0, dtype=np.intp)) for spec in specs]
+    candidates = np.concatenate(spec_rows)
+    spec_of = np.repeat(np.arange(len(specs)), [len(rows) for rows in spec_rows])
+    order = np.argsort(candidates, kind="stable")
+    candidates, spec_of = candidates[order], spec_of[order]
+    if len(candidates) == 0:
+        return [], severity, emergency_level, profile, tier
+    
+    # One stacked inference pass for every uncached lead symptom
+    keys = [wait_key(active, profile["lead_symptoms"][spec], severity, wait_provider, scenario, tier)
+            for spec in specs]
+    for key in dict.fromkeys(keys):
+        require_simulated_waits(snapshot, key)
+    waits = availability.predicted_waits(snapshot, keys)
+    wait_stats = np.stack(waits)[spec_of, :, candidates].T
+    wait_min = wait_stats[WAIT_STAT_BY_LEVEL.get(emergency_level, WAIT_MEAN)]
+    
+    travel_min = travel_times.travel_minutes(user_lat, user_lng, candidates)
+    delay = REFERRAL_WAIT_MIN * referrals.row_loads(candidates)
+    
+    alpha_travel, alpha_wait = EMERGENCY_WEIGHTS.get(emergency_level, EMERGENCY_WEIGHTS["mild"])
+    weight = np.array([spec_weights[spec] for spec in specs])[spec_of]
+    wait_lo, wait_hi = wait_min.min(), wait_min.max()
+    wait_span = wait_hi - wait_lo if wait_hi > wait_lo else 1.0
+    scores = (
+        alpha_travel * normalize_array(travel_min) +
+        alpha_wait * (normalize_array(wait_min, wait_lo, wait_hi) + delay / wait_span) +
+        SPECIALITY_MISMATCH_WEIGHT * (1.0 - weight / weight.max())
     )
     
-    # Sort by score
-    candidates = candidates.sort_values(by="score", ascending=True)
+    top = top_k_indices(scores, top_k)
+    results = format_recommendations(
+        user_lat, user_lng, columns, candidates[top], travel_min[top],
+        wait_stats[:, top], delay[top], scores[top], get_ambulance_type(severity, meta)
+    )
+    return results, severity, emergency_level, profile, tier
+
+
+def format_recommendations(
+    user_lat: float,
+    user_lng: float,
+    columns: Dict[str, np.ndarray],
+    rows: np.ndarray,
+    travel_min: np.ndarray,
+    wait_stats: np.ndarray,
+    delay_min: np.ndarray,
+    scores: np.ndarray,
+    ambulance_reco: str,
+) -> List[Dict[str, Any]]:
+    """Result dicts for the selected rows, straight from the snapshot's column arrays"""
+    wait_min = wait_stats[WAIT_MEAN]
+    cols = {
+        col: columns[col][rows]
+        for col in ["hospital_name", "speciality", "hospital_lat", "hospital_lng",
+                    "general_beds", "icu_beds", "ventilators", "traffic_level",
+                    "ambulance_type_needed"]
+    }
+    top_dist = haversine_distance_km_vec(
+        user_lat, user_lng,
+        cols["hospital_lat"].astype(float), cols["hospital_lng"].astype(float)
+    )
     
-    # Prepare results
     results = []
-    for _, row in candidates.head(top_k).iterrows():
-        ambulance_reco = get_ambulance_type(severity)
-        
+    for i in range(len(rows)):
         result = {
-            "hospital_name": row["hospital_name"],
-            "speciality": row["speciality"],
-            "hospital_lat": float(row["hospital_lat"]),
-            "hospital_lng": float(row["hospital_lng"]),
-            "distance_km": round(float(row["distance_km"]), 2),
-            "predicted_waiting_time_min": round(float(row["predicted_waiting_time"]), 1),
-            "available_general_beds": int(row["general_beds"]),
-            "available_icu_beds": int(row["icu_beds"]),
-            "available_ventilators": int(row["ventilators"]),
-            "traffic_level": row["traffic_level"],
-            "ml_score": round(float(row["score"]), 4),
+            "hospital_name": cols["hospital_name"][i],
+            "speciality": cols["speciality"][i],
+            "hospital_lat": float(cols["hospital_lat"][i]),
+            "hospital_lng": float(cols["hospital_lng"][i]),
+            "distance_km": round(float(top_dist[i]), 2),
+            "estimated_travel_time_min": round(float(travel_min[i]), 1),
+            "predicted_waiting_time_min": round(float(wait_min[i]), 1),
+            "waiting_time_p50_min": round(float(wait_stats[WAIT_P50, i]), 1),
+            "waiting_time_p90_min": round(float(wait_stats[WAIT_P90, i]), 1),
+            "referral_delay_min": round(float(delay_min[i]), 1),
+            "total_estimated_time_min": round(float(travel_min[i] + wait_min[i] + delay_min[i]), 1),
+            "available_general_beds": int(cols["general_beds"][i]),
+            "available_icu_beds": int(cols["icu_beds"][i]),
+            "available_ventilators": int(cols["ventilators"][i]),
+            "traffic_level": cols["traffic_level"][i],
+            "ml_score": round(float(scores[i]), 4),
             "recommended_ambulance_type": ambulance_reco,
-            "dataset_ambulance_hint": row["ambulance_type_needed"],
+            "dataset_ambulance_hint": cols["ambulance_type_needed"][i],
         }
         results.append(result)
     
-    return results, severity, emergency_level, required_speciality
+    return results
 
 
 # ============================================
-# API ENDPOINTS
+# QUEUE SIMULATION
 # ============================================
 
-@app.route('/', methods=['GET'])
-def home():
-    """Health check endpoint"""
-    return jsonify({
-        "status": "success",
-        "message": "Smart Emergency Hospital Recommender API",
-        "version": "1.0.0",
-        "model_info": {
-            "model_name": metadata['model_name'] if metadata else None,
-            "trained_date": metadata['trained_date'] if metadata else None,
-            "mae": metadata['mae'] if metadata else None
-        }
-    }), 200
+class SimulationPending(Exception):
+    """A scenario's simulated waits are not cached yet; position is its place in the queue"""
 
+    def __init__(self, position: Optional[int]):
+        super().__init__(position)
+        self.position = position
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Detailed health check"""
-    return jsonify({
-        "status": "healthy",
-        "model_loaded": model is not None,
-        "metadata_loaded": metadata is not None,
-        "data_loaded": hospitals_df is not None,
-        "total_hospitals": len(hospitals_df) if hospitals_df is not None else 0
-    }), 200
 
+def is_simulation_key(key: Tuple) -> bool:
+    """Simulated waits are caught up in the background after capacity updates"""
+    return key[0] == "simulation"
 
-@app.route('/api/recommend', methods=['POST'])
-def recommend():
+
+def check_stale_simulations(snapshot):
+    """Availability listener: refresh the updated rows of cached simulated waits"""
+    if any(is_simulation_key(key) for key in snapshot.predictions):
+        schedule_simulation_work(refresh=True)
+
+
+def require_simulated_waits(snapshot, key: Tuple):
     """
-    Main recommendation endpoint
-    
-    Request Body:
-    {
-        "user_lat": 19.119,
-        "user_lng": 72.846,
-        "symptom": "chest pain",
-        "severity": "severe" (optional),
-        "emergency_level": "critical" (optional),
-        "top_k": 5 (optional, default: 5)
-    }
+    Keep the simulator off the request path: raise SimulationPending for an uncached
+    simulation key after queueing it (model keys and cached scenarios pass)
     """
-    try:
-        data = request.get_json()
-        
-        # Validate required fields
-        if not data:
-            return jsonify({
-                "status": "error",
-                "message": "Request body is required"
-            }), 400
-        
-        required_fields = ['user_lat', 'user_lng', 'symptom']
-        missing_fields = [field for field in required_fields if field not in data]
-        
-        if missing_fields:
-            return jsonify({
-                "status": "error",
-                "message": f"Missing required fields: {', '.join(missing_fields)}"
-            }), 400
-        
-        # Extract parameters
-        user_lat = float(data['user_lat'])
-        user_lng = float(data['user_lng'])
-        symptom = data['symptom']
-        severity = data.get('severity', None)
-        emergency_level = data.get('emergency_level', None)
-        top_k = int(data.get('top_k', 5))
-        
-        # Validate coordinates
-        if not (-90 <= user_lat <= 90) or not (-180 <= user_lng <= 180):
-            return jsonify({
-                "status": "error",
-                "message": "Invalid coordinates"
-            }), 400
-        
-        # Get recommendations
-        recommendations, final_severity, final_emergency, speciality = recommend_hospitals(
-            user_lat=user_lat,
-            user_lng=user_lng,
-            symptom=symptom,
-            severity=severity,
-            emergency_level=emergency_level,
-            top_k=top_k
-        )
-        
-        return jsonify({
-            "status": "success",
-            "query": {
-                "user_lat": user_lat,
-                "user_lng": user_lng,
-                "symptom": symptom,
-                "inferred_severity": final_severity,
-                "emergency_level": final_emergency,
-                "required_speciality": speciality
-            },
-            "recommendations": recommendations,
-            "total_results": len(recommendations)
-        }), 200
-        
-    except ValueError as e:
-        return jsonify({
-            "status": "error",
-            "message": f"Invalid input: {str(e)}"
-        }), 400
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "message": f"Internal server error: {str(e)}"
-        }), 500
+    if is_simulation_key(key) and key not in snapshot.predictions:
+        raise SimulationPending(queue_simulation(key))
 
 
-@app.route('/api/specialities', methods=['GET'])
-def get_specialities():
+def queue_simulation(key: Tuple) -> Optional[int]:
+    """
+    Queue a simulation key for the background worker (coalesces repeated requests)
+
+    Returns the key's 1-based place in the queue, or None when the queue is full.
+    """
+    with simulation_lock:
+        if key not in pending_simulations:
+            if len(pending_simulations) >= MAX_PENDING_SIMULATIONS:
+                return None
+            pending_simulations[key] = None
+        position = list(pending_simulations).index(key) + 1
+    schedule_simulation_work()
+    return position
+
+
+def schedule_simulation_work(refresh: bool = False):
+    """Start the simulation worker if idle; refresh also catches up stale cached scenarios"""
+    global simulation_worker
+    with simulation_lock:
+        if refresh:
+            simulation_refresh_requested.set()
+        if simulation_worker is None:
+            simulation_worker = threading.Thread(target=simulation_queue_worker, daemon=True)
+            simulation_worker.start()
+
+
+def simulation_queue_worker():
+    """Catch up stale scenarios first (they are being served), then simulate queued ones"""
+    global simulation_worker
+    while True:
+        with simulation_lock:
+            refresh = simulation_refresh_requested.is_set()
+            simulation_refresh_requested.clear()
+            if not refresh and not pending_simulations:
+                simulation_worker = None
+                return
+            key = None if refresh else next(iter(pending_simulations))
+        store = availability
+        try:
+            if refresh:
+                for stale in store.stale_keys():
+                    store.refresh_deferred(stale)
+            else:
+                snapshot = store.snapshot
+                if key not in snapshot.predictions:
+                    store.cache_prediction(snapshot, key, store.predict_fn(snapshot.df, key))
+                store.refresh_deferred(key)
+        except Exception as e:
+            print(f"[ERROR] Queue simulation failed: {str(e)}")
+        finally:
+            if key is not None:
+                with simulation_lock:
+                    pending_simulations.pop(key, None)
+
+
+# ============================================
+# RECOMMENDATION TILES
+# ============================================
+
+tile_rebuild_requested = threading.Event()
+tile_builder_lock = threading.Lock()
+tile_builder = None
+
+# (tile index, availability version, specialities updated since the build)
+tile_staleness = None
+
+
+def hospital_data_fingerprint(df: pd.DataFrame) -> str:
+    """Identity of the static hospital columns the tiles depend on"""
+    digest = hashlib.sha1()
+    for col in ["hospital_name", "hospital_lat", "hospital_lng", "speciality", "traffic_level"]:
+        digest.update(pd.util.hash_pandas_object(df[col], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=8)
+def tile_fingerprint(model_fingerprint: Tuple, data_fingerprint: str, road_mode: bool) -> str:
+    """Identity of everything a tile index was built from"""
+    scoring = sorted(WAIT_STAT_BY_LEVEL.items())
+    return hashlib.sha1(
+        repr((model_fingerprint, data_fingerprint, road_mode, scoring)).encode()
+    ).hexdigest()
+
+
+def stale_tile_specialities(index, snapshot) -> set:
+    """
+    Specialities with a capacity update since the tile build (cached per snapshot)
+
+    Their short lists were ranked on the waiting times at build time, so a hospital whose
+    wait has dropped since may be missing from them.
+    """
+    global tile_staleness
+    cached = tile_staleness
+    if cached is not None and cached[0] is index and cached[1] == snapshot.version:
+        return cached[2]
+    changed = snapshot.rows_changed_since(index.availability_version)
+    stale = set(pd.unique(snapshot.columns["speciality"][changed])) if len(changed) else set()
+    tile_staleness = (index, snapshot.version, stale)
+    return stale
+
+
+def lookup_tile(active, snapshot, user_lat, user_lng, symptom, severity, speciality, emergency_level, top_k):
+    """Precomputed short list for this request, or None to score every candidate"""
+    index = tile_index
+    if index is None or top_k > index.shortlist or not index.road_mode:
+        return None
+    if symptom not in index.symptoms or severity not in SEVERITIES:
+        return None
+    if index.fingerprint != tile_fingerprint(active.fingerprint, tile_source_fingerprint,
+                                             travel_times.road_mode):
+        return None
+    # Exact only on the capacities the tiles were built from
+    if snapshot.version < index.availability_version or speciality in stale_tile_specialities(index, snapshot):
+        return None
+    level = emergency_level if emergency_level in EMERGENCY_WEIGHTS else "mild"
+    return index.lookup(user_lat, user_lng, speciality, level)
+
+
+def check_tile_drift(snapshot):
+    """Availability listener: rebuild the tiles after enough capacity updates"""
+    index = tile_index
+    if index is not None and snapshot.version - index.availability_version >= TILE_REBUILD_UPDATES:
+        schedule_tile_rebuild()
+
+
+def schedule_tile_rebuild():
+    """Rebuild the tile index in the background (coalesces repeated requests)"""
+    global tile_builder
+    if not TILE_MODE:
+        return
+    with tile_builder_lock:
+        tile_rebuild_requested.set()
+        if tile_builder is None:
+            tile_builder = threading.Thread(target=tile_build_worker, daemon=True)
+            tile_builder.start()
+
+
+def tile_build_worker():
+    global tile_builder
+    while True:
+        with tile_builder_lock:
+            if not tile_rebuild_requested.is_set():
+                tile_builder = None
+                return
+            tile_rebuild_requested.clear()
+        try:
+            refresh_tile_index()
+        except Exception as e:
+            print(f"[ERROR] Tile rebuild failed: {str(e)}")
+
+
+def refresh_tile_index():
+    """Load a matching tile index from disk, or build (and save) a new one"""
+    global tile_index
+    
+    active = registry.active
+    snapshot = availability.snapshot
+    fingerprint = tile_fingerprint(active.fingerprint, tile_source_fingerprint, travel_times.road_mode)
+    
+    if (tile_index is None or tile_index.fingerprint != fingerprint) and os.path.exists(TILE_INDEX_PATH):
+        try:
+            stored = TileIndex.load(TILE_INDEX_PATH)
+            # Versions count from the loaded table, so only a build on it (version 0) is comparable
+            if stored.fingerprint == fingerprint and stored.availability_version == 0:
+                tile_index = stored
+                print(f"[SUCCESS] Loaded recommendation tiles from {TILE_INDEX_PATH}")
+                return
+        except Exception as e:
+            print(f"[ERROR] Ignoring unreadable tile index: {str(e)}")
+    
+    if not travel_times.road_mode:
+        # Without a road graph travel time varies inside a cell; the full path is already cheap
+        print("[INFO] No road network loaded, skipping recommendation tiles")
+        return
+    
+    print("[INFO] Building recommendation tiles...")
+    meta = active.payload["metadata"]
+    symptoms_by_speciality = {}
+    for symptom, spec in meta['symptom_to_speciality'].items():
+        symptoms_by_speciality.setdefault(spec, []).append(symptom)
+    
+    all_rows = np.arange(len(snapshot.df))
+    built = build_tile_index(
+        travel_times,
+        snapshot.columns["hospital_lat"].astype(float),
+        snapshot.columns["hospital_lng"].astype(float),
+        speciality_rows={spec: speciality_index.get(spec, all_rows) for spec in symptoms_by_speciality},
+        symptoms_by_speciality=symptoms_by_speciality,
+        level_weights=EMERGENCY_WEIGHTS,
+        wait_fn=lambda symptom, severity, level: availability.predicted_wait(
+            snapshot, (active, symptom, severity, FULL_TIER))[WAIT_STAT_BY_LEVEL[level]],
+        fingerprint=fingerprint,
+        availability_version=snapshot.version,
+    )
+    tile_index = built
+    print(f"[SUCCESS] Built {len(built.indptr) - 1} recommendation tiles "
+          f"in {built.info['build_seconds']}s")
+    
+    try:
+        built.save(TILE_INDEX_PATH)
+    except OSError as e:
+        print(f"[ERROR] Could not save tile index: {str(e)}")
+
+
+# ============================================
+# RESPONSE CACHE
+# ============================================
+
+# Field name in the /api/hospitals response -> column in hospitals_df
+HOSPITAL_FIELDS = {
+    "hospital_name": "hospital_name",
+    "speciality": "speciality",
+    "hospital_lat": "hospital_lat",
+    "hospital_lng": "hospital_lng",
+    "general_beds": "general_beds",
+    "icu_beds": "icu_beds",
+    "ventilators": "ventilators",
+    "ambulance_type": "ambulance_type_needed",
+}
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_json(payload: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Serialize a payload once and derive a strong ETag from the bytes"""
+    body = app.json.dumps(payload).encode("utf-8")
+    etag = hashlib.sha1(body).hexdigest()
+    return body, etag
+
+
+def cached_json_response(body: bytes, etag: str) -> Response:
+    """Serve pre-encoded JSON, answering 304 when the client already has this ETag"""
+    response = Response(body, status=200, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+def build_hospital_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Hospital listing rows built from column arrays"""
+    columns = {
+        field: df[col].to_numpy()
+        for field, col in HOSPITAL_FIELDS.items()
+    }
+    columns["hospital_lat"] = columns["hospital_lat"].astype(float)
+    columns["hospital_lng"] = columns["hospital_lng"].astype(float)
+    for field in ["general_beds", "icu_beds", "ventilators"]:
+        columns[field] = columns[field].astype(int)
+    
+    fields = list(columns)
+    return [
+        dict(zip(fields, values))
+        for values in zip(*(columns[f].tolist() for f in fields))
+    ]
+
+
+def build_symptoms_payload() -> Dict[str, Any]:
+    """Known symptoms with severity, speciality and ambulance mapping"""
+    symptoms_info = []
+    for symptom, severity in metadata['symptom_to_severity'].items():
+        speciality = metadata['symptom_to_speciality'].get(symptom, "General Medicine")
+        ambulance = metadata['severity_to_ambulance'].get(severity, "BLS")
+        
+        symptoms_info.append({
+            "symptom": symptom,
+            "severity": severity,
+            "speciality": speciality,
+            "ambulance_type": ambulance
+        })
+    
+    return {
+        "status": "success",
+        "symptoms": symptoms_info,
+        "total": len(symptoms_info)
+    }
+
+
+def build_response_cache(snapshot):
+    """
+    Availability listener: point the GET responses at a new snapshot
+
+    Runs under the availability write lock, so the hospital listing is only built on its
+    first read (current_hospital_listing); the symptoms change with the metadata alone.
+    """
+    global response_cache
+    
+    symptoms = response_cache.get("symptoms")
+    if response_cache.get("metadata") is not metadata:
+        symptoms = encode_json(build_symptoms_payload()) if metadata else None
+    
+    response_cache = {
+        "generation": response_cache.get("generation", 0) + 1,
+        "snapshot": snapshot,
+        "metadata": metadata,
+        "symptoms": symptoms,
+    }
+
+
+def build_hospital_listing(snapshot) -> Dict[str, Any]:
+    """Hospital records of a snapshot per speciality filter (None: unfiltered)"""
+    records = build_hospital_records(snapshot.df)
+    specialities = snapshot.columns["speciality"]
+    positions = {
+        speciality: np.flatnonzero(specialities == speciality)
+        for speciality in sorted(set(specialities.tolist()))
+    }
+    records_by_speciality = {None: records}
+    for speciality, rows in positions.items():
+        records_by_speciality[speciality] = [records[i] for i in rows]
+    
+    return {
+        "snapshot": snapshot,
+        "positions": positions,
+        "hospital_records": records_by_speciality,
+        # Unpaged listings per speciality filter, encoded on first request
+        "hospitals": {},
+    }
+
+
+def patch_hospital_listing(listing: Dict[str, Any], snapshot) -> Dict[str, Any]:
+    """Carry a listing forward to a later snapshot of the same table, rebuilding updated rows only"""
+    rows = snapshot.rows_changed_since(listing["snapshot"].version)
+    if len(rows) == 0:
+        return dict(listing, snapshot=snapshot)
+    
+    records = list(listing["hospital_records"][None])
+    for i, record in zip(rows.tolist(), build_hospital_records(snapshot.df.iloc[rows])):
+        records[i] = record
+    touched = set(snapshot.columns["speciality"][rows].tolist())
+    
+    records_by_speciality = dict(listing["hospital_records"])
+    records_by_speciality[None] = records
+    for speciality in touched:
+        records_by_speciality[speciality] = [records[i] for i in listing["positions"][speciality]]
+    
+    return {
+        "snapshot": snapshot,
+        "positions": listing["positions"],
+        "hospital_records": records_by_speciality,
+        "hospitals": {
+            speciality: encoded for speciality, encoded in listing["hospitals"].copy().items()
+            if speciality is not None and speciality not in touched
+        },
+    }
+
+
+def current_hospital_listing() -> Dict[str, Any]:
+    """
+    Hospital listing of the response cache's snapshot, built on the first read after an
+    update (outside the availability write lock) from the previous listing
+    """
+    global hospital_listing
+    
+    snapshot = response_cache["snapshot"]
+    listing = hospital_listing
+    if listing is not None and listing["snapshot"] is snapshot:
+        return listing
+    
+    with hospital_listing_lock:
+        listing = hospital_listing
+        if listing is None or listing["snapshot"].name_index is not snapshot.name_index:
+            # First read, or a new hospital table
+            listing = build_hospital_listing(snapshot)
+        elif snapshot.version >= listing["snapshot"].version:
+            listing = patch_hospital_listing(listing, snapshot)
+        hospital_listing = listing
+        return listing
+
+
+def hospital_listing_payload(rows: List[Dict[str, Any]], speciality: Optional[str]) -> Dict[str, Any]:
+    """GET /api/hospitals body for some listing rows"""
+    return {
+        "status": "success",
+        "hospitals": rows,
+        "total": len(rows),
+        "filter": {"speciality": speciality} if speciality else None
+    }
+
+
+@lru_cache(maxsize=256)
+def hospital_page(
+    generation: int,
+    speciality: Optional[str],
+    page: Optional[int],
+    page_size: Optional[int],
+    fields: Optional[Tuple[str, ...]],
+) -> Tuple[bytes, str]:
+    """Encode one page / projection of the hospital listing (memoized per cache generation)"""
+    rows = current_hospital_listing()["hospital_records"].get(speciality, [])
+    total = len(rows)
+    payload = hospital_listing_payload(rows, speciality)
+    
+    if page is not None:
+        start = (page - 1) * page_size
+        rows = rows[start:start + page_size]
+        payload["pagination"] = {
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size,
+            "returned": len(rows)
+        }
+    
+    if fields:
+        rows = [{f: row[f] for f in fields} for row in rows]
+        payload["fields"] = list(fields)
+    
+    payload["hospitals"] = rows
+    return encode_json(payload)
+
+
+# ============================================
+# RECOMMENDATION REQUESTS
+# ============================================
+
+def ndjson_line(payload: Dict[str, Any]) -> bytes:
+    """One NDJSON line as bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(
+            payload,
+            default=str,
+            option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    # numpy values via tolist() so the fallback emits what OPT_SERIALIZE_NUMPY does
+    default = lambda value: value.tolist() if hasattr(value, "tolist") else str(value)
+    return (json.dumps(payload, default=default) + "\n").encode("utf-8")
+
+
+def recommendation_payload(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Response body and HTTP status for one /api/recommend request"""
+    try:
+        # Validate required fields
+        unavailable = model_unavailable()
+        if unavailable is not None:
+            return unavailable
+        
+        if not isinstance(data, dict) or not data:
+            return {
+                "status": "error",
+                "message": "Request body is required"
+            }, 400
+        
+        required_fields = ['user_lat', 'user_lng', 'symptom']
+        missing_fields = [field for field in required_fields if field not in data]
+        if 'symptoms' in data and 'symptom' in missing_fields:
+            missing_fields.remove('symptom')
+        
+        if missing_fields:
+            return {
+                "status": "error",
+                "message": f"Missing required fields: {', '.join(missing_fields)}"
+            }, 400
+        
+        # Extract parameters
+        user_lat = float(data['user_lat'])
+        user_lng = float(data['user_lng'])
+        symptoms = parse_symptoms(data['symptoms'] if 'symptoms' in data else data['symptom'])
+        severity = data.get('severity', None)
+        emergency_level = data.get('emergency_level', None)
+        top_k = int(data.get('top_k', 5))
+        if top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        wait_provider = data.get('wait_provider', 'model')
+        if wait_provider not in WAIT_PROVIDERS:
+            raise ValueError(f"wait_provider must be one of: {', '.join(WAIT_PROVIDERS)}")
+        model_tier = data.get('model_tier', None)
+        latency_budget_ms = data.get('latency_budget_ms', None)
+        scenario = None
+        if wait_provider == "simulation":
+            scenario = make_scenario(
+                data.get('surge'),
+                data.get('surge_window_min', DEFAULT_SURGE_WINDOW_MIN),
+                data.get('arrival_min')
+            )
+        
+        # Validate coordinates
+        if not (-90 <= user_lat <= 90) or not (-180 <= user_lng <= 180):
+            return {
+                "status": "error",
+                "message": "Invalid coordinates"
+            }, 400
+        
+        # Get recommendations
+        if len(symptoms) > 1:
+            recommendations, final_severity, final_emergency, profile, tier = recommend_for_symptoms(
+                user_lat=user_lat,
+                user_lng=user_lng,
+                symptoms=symptoms,
+                severity=severity,
+                emergency_level=emergency_level,
+                top_k=top_k,
+                wait_provider=wait_provider,
+                scenario=scenario,
+                model_tier=model_tier,
+                latency_budget_ms=latency_budget_ms
+            )
+        else:
+            recommendations, final_severity, final_emergency, speciality, tier = recommend_hospitals(
+                user_lat=user_lat,
+                user_lng=user_lng,
+                symptom=symptoms[0],
+                severity=severity,
+                emergency_level=emergency_level,
+                top_k=top_k,
+                wait_provider=wait_provider,
+                scenario=scenario,
+                model_tier=model_tier,
+                latency_budget_ms=latency_budget_ms
+            )
+        
+        # Route this incident to the top hospital so the next requests see its load
+        referral = None
+        if recommendations and data.get('record_referral', True):
+            referral = recommendations[0]["hospital_name"]
+            referrals.record(referral)
+        
+        if len(symptoms) > 1:
+            weights = profile["specialities"]
+            query = {
+                "user_lat": user_lat,
+                "user_lng": user_lng,
+                "symptoms": symptoms,
+                "resolved_symptoms": profile["resolved"],
+                "inferred_severity": final_severity,
+                "emergency_level": final_emergency,
+                "required_speciality": max(weights, key=weights.get),
+                "speciality_profile": {spec: round(w, 3) for spec, w in weights.items()},
+                "wait_provider": wait_provider,
+                "model_tier": tier
+            }
+        else:
+            # Same (cached) resolution recommend_hospitals scored with
+            match = registry.active.payload["resolver"].resolve(symptoms[0])
+            query = {
+                "user_lat": user_lat,
+                "user_lng": user_lng,
+                "symptom": symptoms[0],
+                "resolved_symptom": match.symptom if match else None,
+                "symptom_confidence": match.confidence if match else 0.0,
+                "inferred_severity": final_severity,
+                "emergency_level": final_emergency,
+                "required_speciality": speciality,
+                "wait_provider": wait_provider,
+                "model_tier": tier
+            }
+        
+        return {
+            "status": "success",
+            "query": query,
+            "recommendations": recommendations,
+            "total_results": len(recommendations),
+            "referral_recorded": referral
+        }, 200
+        
+    except SimulationPending as e:
+        if e.position is None:
+            return {
+                "status": "error",
+                "message": "Simulation queue is full, please retry later"
+            }, 503
+        return {
+            "status": "pending",
+            "message": "Simulating this scenario, please retry shortly",
+            "queue_position": e.position,
+            "retry_after_s": SIMULATION_RETRY_AFTER_S * e.position
+        }, 202
+    except ValueError as e:
+        return {
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }, 400
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Internal server error: {str(e)}"
+        }, 500
+
+
+# ============================================
+# API ENDPOINTS
+# ============================================
+
+@app.route('/', methods=['GET'])
+def home():
+    """Health check endpoint"""
+    return jsonify({
+        "status": "success",
+        "message": "Smart Emergency Hospital Recommender API",
+        "version": "1.0.0",
+        "model_info": {
+            "model_name": metadata['model_name'] if metadata else None,
+            "trained_date": metadata['trained_date'] if metadata else None,
+            "mae": metadata['mae'] if metadata else None,
+            "model_tiers": {
+                name: {key: info[key] for key in ("mae", "p90_coverage", "latency_ms")}
+                for name, info in metadata.get('model_tiers', {}).items()
+            } if metadata else None
+        }
+    }), 200
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Detailed health check"""
+    return jsonify({
+        "status": "healthy",
+        "model_loaded": model is not None,
+        "metadata_loaded": metadata is not None,
+        "data_loaded": hospitals_df is not None,
+        "total_hospitals": len(hospitals_df) if hospitals_df is not None else 0,
+        "availability_version": availability.snapshot.version if availability is not None else None,
+        "model_version": registry.active.version if registry is not None and registry.active else None,
+        "road_network_loaded": travel_times is not None and travel_times.network is not None
+    }), 200
+
+
+@app.route('/api/recommend', methods=['POST'])
+def recommend():
+    """
+    Main recommendation endpoint
+    
+    Request Body:
+    {
+        "user_lat": 19.119,
+        "user_lng": 72.846,
+        "symptom": "chest pain",
+        "severity": "severe" (optional),
+        "emergency_level": "critical" (optional),
+        "top_k": 5 (optional, default: 5),
+        "record_referral": true (optional; counts the top hospital as a referral),
+        "wait_provider": "model" (optional; "simulation" uses the emergency queue simulator),
+        "surge": {"severe": 40} (optional, simulation only; extra arrivals per severity),
+        "surge_window_min": 60 (optional, simulation only),
+        "model_tier": "fast" (optional; default by emergency level, see MODEL_TIER_BY_LEVEL),
+        "latency_budget_ms": 20 (optional; most accurate tier measured within the budget)
+    }
+    
+    Several symptoms: "symptoms": ["fever", "vomiting", "dizziness"] instead of "symptom"
+    (a comma-separated "symptom" string works too).
+    
+    A simulation scenario that is not cached yet is queued in the background and answered
+    with 202 {"status": "pending", "retry_after_s": ...} (also sent as Retry-After).
+    """
+    data = request.get_json(silent=True)
+    payload, status = recommendation_payload(data)
+    if status == 202:
+        return jsonify(payload), status, {"Retry-After": str(payload["retry_after_s"])}
+    return jsonify(payload), status
+
+
+@app.route('/api/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """
+    Recommendations for many queries, streamed as NDJSON
+    
+    Request Body:
+    {
+        "queries": [
+            {"user_lat": 19.119, "user_lng": 72.846, "symptom": "chest pain"},
+            {"user_lat": 19.05, "user_lng": 72.9, "symptoms": ["fever", "cough"], "top_k": 3}
+        ]
+    }
+    
+    Each query takes the /api/recommend fields. One line per query, in order, carries its
+    query_index plus the /api/recommend response (or its error), written as soon as that
+    query is scored; a final {"status": "done"} line closes the stream.
+    """
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return jsonify(unavailable[0]), unavailable[1]
+    
+    data = request.get_json(silent=True)
+    queries = data.get('queries') if isinstance(data, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return jsonify({
+            "status": "error",
+            "message": "'queries' must be a non-empty list"
+        }), 400
+    if len(queries) > MAX_RECOMMEND_BATCH:
+        return jsonify({
+            "status": "error",
+            "message": f"Maximum {MAX_RECOMMEND_BATCH} queries per batch"
+        }), 400
+    
+    def generate():
+        succeeded = 0
+        for index, query in enumerate(queries):
+            payload, status = recommendation_payload(query)
+            succeeded += status == 200
+            yield ndjson_line({"query_index": index, **payload})
+        yield ndjson_line({
+            "status": "done",
+            "total_queries": len(queries),
+            "succeeded": succeeded
+        })
+    
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.route('/api/specialities', methods=['GET'])
+def get_specialities():
     """Get list of available specialities"""
     try:
-        specialities = hospitals_df['speciality'].unique().tolist()
+        specialities = availability.snapshot.df['speciality'].unique().tolist()
         return jsonify({
             "status": "success",
             "specialities": sorted(specialities),
@@ -370,23 +1624,8 @@ def get_specialities():
 def get_symptoms():
     """Get list of known symptoms with severity and speciality mapping"""
     try:
-        symptoms_info = []
-        for symptom, severity in metadata['symptom_to_severity'].items():
-            speciality = metadata['symptom_to_speciality'].get(symptom, "General Medicine")
-            ambulance = metadata['severity_to_ambulance'].get(severity, "BLS")
-            
-            symptoms_info.append({
-                "symptom": symptom,
-                "severity": severity,
-                "speciality": speciality,
-                "ambulance_type": ambulance
-            })
-        
-        return jsonify({
-            "status": "success",
-            "symptoms": symptoms_info,
-            "total": len(symptoms_info)
-        }), 200
+        body, etag = response_cache["symptoms"]
+        return cached_json_response(body, etag)
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -394,36 +1633,174 @@ def get_symptoms():
         }), 500
 
 
+@app.route('/api/symptoms/resolve', methods=['GET'])
+def resolve_symptom():
+    """
+    Resolve free text to a known symptom
+    
+    Query Parameters:
+    - text: free-text symptom, e.g. "chest pains" or "breathless"
+    """
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return jsonify(unavailable[0]), unavailable[1]
+    
+    text = request.args.get('text', '').strip()
+    if not text:
+        return jsonify({
+            "status": "error",
+            "message": "Query parameter 'text' is required"
+        }), 400
+    
+    bundle = registry.active.payload
+    match = bundle["resolver"].resolve(text)
+    if match is None:
+        return jsonify({
+            "status": "success",
+            "text": text,
+            "resolved": False,
+            "symptom": None,
+            "confidence": 0.0
+        }), 200
+    
+    return jsonify({
+        "status": "success",
+        "text": text,
+        "resolved": True,
+        "symptom": match.symptom,
+        "confidence": match.confidence,
+        "method": match.method,
+        "severity": bundle["metadata"]['symptom_to_severity'].get(match.symptom, "moderate"),
+        "speciality": bundle["metadata"]['symptom_to_speciality'].get(match.symptom, "General Medicine"),
+        "resolver": bundle["resolver"].stats()
+    }), 200
+
+
 @app.route('/api/hospitals', methods=['GET'])
 def get_hospitals():
-    """Get list of all hospitals with optional filtering"""
+    """
+    Get list of all hospitals with optional filtering
+    
+    Query Parameters:
+        speciality: only hospitals with this speciality (optional)
+        page, page_size: 1-based pagination (optional, page_size default 50, max 500)
+        fields: comma-separated fields to return, e.g. hospital_name,icu_beds (optional)
+    """
     try:
-        speciality = request.args.get('speciality', None)
+        speciality = request.args.get('speciality', None) or None
+        page = request.args.get('page', None)
+        page_size = request.args.get('page_size', None)
+        fields = request.args.get('fields', None)
         
-        df = hospitals_df.copy()
+        generation = response_cache["generation"]
+        if page is None and page_size is None and not fields:
+            listing = current_hospital_listing()
+            cached = listing["hospitals"].get(speciality)
+            if cached is None:
+                # Unknown speciality: empty listing, not kept
+                cached = encode_json(hospital_listing_payload(
+                    listing["hospital_records"].get(speciality, []), speciality))
+                if speciality is None or speciality in listing["positions"]:
+                    listing["hospitals"][speciality] = cached
+            return cached_json_response(*cached)
         
-        if speciality:
-            df = df[df['speciality'] == speciality]
+        if page is not None or page_size is not None:
+            page = int(page) if page is not None else 1
+            page_size = int(page_size) if page_size is not None else 50
+            if page < 1 or not (1 <= page_size <= MAX_PAGE_SIZE):
+                return jsonify({
+                    "status": "error",
+                    "message": f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}"
+                }), 400
         
-        hospitals = []
-        for _, row in df.iterrows():
-            hospitals.append({
-                "hospital_name": row["hospital_name"],
-                "speciality": row["speciality"],
-                "hospital_lat": float(row["hospital_lat"]),
-                "hospital_lng": float(row["hospital_lng"]),
-                "general_beds": int(row["general_beds"]),
-                "icu_beds": int(row["icu_beds"]),
-                "ventilators": int(row["ventilators"]),
-                "ambulance_type": row["ambulance_type_needed"]
-            })
+        if fields:
+            fields = tuple(f.strip() for f in fields.split(',') if f.strip())
+            unknown = [f for f in fields if f not in HOSPITAL_FIELDS]
+            if unknown:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Unknown fields: {', '.join(unknown)}. "
+                               f"Available: {', '.join(HOSPITAL_FIELDS)}"
+                }), 400
+        else:
+            fields = None
         
+        body, etag = hospital_page(generation, speciality, page, page_size, fields)
+        return cached_json_response(body, etag)
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+
+@app.route('/api/hospitals/<path:hospital_name>/capacity', methods=['POST'])
+def update_hospital_capacity(hospital_name):
+    """
+    Update live capacity for one hospital (applies to all of its records)
+    
+    Request Body:
+    {
+        "general_beds": 40,      (optional)
+        "icu_beds": 6,           (optional)
+        "ventilators": 3,        (optional)
+        "mode": "set" | "delta"  (optional, default: "set")
+    }
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "Request body is required"
+        }), 400
+    return apply_capacity_updates([{**data, "hospital_name": hospital_name}])
+
+
+@app.route('/api/hospitals/capacity', methods=['POST'])
+def update_capacity_bulk():
+    """
+    Bulk capacity feed, applied as one atomic update
+    
+    Request Body:
+    {
+        "updates": [
+            {"hospital_name": "Lilavati Hospital", "icu_beds": 4},
+            {"hospital_name": "KEM Hospital", "mode": "delta", "general_beds": -3}
+        ]
+    }
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('updates'), list) or not data['updates']:
+        return jsonify({
+            "status": "error",
+            "message": "Expected a non-empty 'updates' array"
+        }), 400
+    return apply_capacity_updates(data['updates'])
+
+
+def apply_capacity_updates(updates: List[Dict[str, Any]]):
+    """Apply updates to the availability store and build the JSON response"""
+    try:
+        result = availability.apply_updates(updates)
         return jsonify({
             "status": "success",
-            "hospitals": hospitals,
-            "total": len(hospitals),
-            "filter": {"speciality": speciality} if speciality else None
+            **result
         }), 200
+    except KeyError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Hospital '{e.args[0]}' not found"
+        }), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }), 400
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -431,6 +1808,182 @@ def get_hospitals():
         }), 500
 
 
+@app.route('/api/referrals', methods=['GET'])
+def get_referrals():
+    """Current time-decayed referral load per hospital"""
+    return jsonify({
+        "status": "success",
+        "half_life_min": referrals.half_life_s / 60.0,
+        "wait_per_referral_min": REFERRAL_WAIT_MIN,
+        "loads": referrals.loads_by_name()
+    }), 200
+
+
+@app.route('/api/referrals', methods=['POST'])
+def record_referral():
+    """
+    Record referrals made outside /api/recommend
+    
+    Request Body:
+    {
+        "hospital_name": "Lilavati Hospital",
+        "count": 1 (optional)
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    if 'hospital_name' not in data:
+        return jsonify({
+            "status": "error",
+            "message": "Missing required fields: hospital_name"
+        }), 400
+    
+    try:
+        load = referrals.record(data['hospital_name'], float(data.get('count', 1)))
+        return jsonify({
+            "status": "success",
+            "hospital_name": data['hospital_name'],
+            "recent_referrals": round(load, 3)
+        }), 200
+    except KeyError:
+        return jsonify({
+            "status": "error",
+            "message": f"Hospital '{data['hospital_name']}' not found"
+        }), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }), 400
+
+
+@app.route('/api/ambulances', methods=['POST'])
+def update_ambulances():
+    """
+    Live ambulance position / status feed
+    
+    Request Body:
+    {
+        "units": [
+            {"unit_id": "MH-01-AMB-17", "unit_type": "ALS", "lat": 19.07, "lng": 72.88,
+             "status": "available"}
+        ]
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    units = data.get('units')
+    if not isinstance(units, list) or not units:
+        return jsonify({
+            "status": "error",
+            "message": "Request body needs a non-empty 'units' list"
+        }), 400
+    
+    try:
+        result = fleet.upsert(units)
+        return jsonify({
+            "status": "success",
+            **result,
+            "total_units": len(fleet)
+        }), 200
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }), 400
+
+
+@app.route('/api/ambulances', methods=['GET'])
+def list_ambulances():
+    """Fleet summary, plus the units themselves (optionally filtered by ?status=)"""
+    status = request.args.get('status')
+    return jsonify({
+        "status": "success",
+        **fleet.summary(),
+        "units": fleet.units(status)
+    }), 200
+
+
+@app.route('/api/ambulances/<path:unit_id>/release', methods=['POST'])
+def release_ambulance(unit_id):
+    """Mark a unit available again, optionally with its new position"""
+    data = request.get_json(silent=True) or {}
+    try:
+        unit = fleet.release(unit_id, data.get('lat'), data.get('lng'))
+        return jsonify({
+            "status": "success",
+            "unit": unit.describe()
+        }), 200
+    except KeyError:
+        return jsonify({
+            "status": "error",
+            "message": f"Unit '{unit_id}' not found"
+        }), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }), 400
+
+
+@app.route('/api/dispatch', methods=['POST'])
+def dispatch():
+    """
+    Assign the nearest capable free ambulance to one or more incidents
+    
+    Request Body (single incident):
+    {
+        "lat": 19.119,
+        "lng": 72.846,
+        "symptom": "chest pain" (optional, used to infer severity),
+        "severity": "severe" (optional),
+        "unit_type": "ICU" (optional, overrides severity)
+    }
+    
+    or a batch solved together: {"incidents": [{"incident_id": "c1", "lat": ..., "lng": ...}, ...]}
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({
+            "status": "error",
+            "message": "Request body is required"
+        }), 400
+    
+    incidents = data.get('incidents', [data])
+    if not isinstance(incidents, list) or not incidents:
+        return jsonify({
+            "status": "error",
+            "message": "'incidents' must be a non-empty list"
+        }), 400
+    if len(incidents) > MAX_DISPATCH_BATCH:
+        return jsonify({
+            "status": "error",
+            "message": f"Maximum {MAX_DISPATCH_BATCH} incidents per batch"
+        }), 400
+    
+    try:
+        parsed = []
+        for incident in incidents:
+            missing = [field for field in ['lat', 'lng'] if field not in incident]
+            if missing:
+                raise ValueError(f"Missing required fields: {', '.join(missing)}")
+            incident = dict(incident)
+            if 'severity' not in incident and incident.get('symptom') and metadata:
+                incident['severity'] = infer_severity(incident['symptom'])
+            parsed.append(incident)
+        
+        assignments = fleet.assign(parsed)
+        return jsonify({
+            "status": "success",
+            "assignments": assignments,
+            "assigned": sum(1 for a in assignments if a["unit"] is not None),
+            "unassigned": sum(1 for a in assignments if a["unit"] is None)
+        }), 200
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }), 400
+
+
 @app.route('/api/predict-waiting-time', methods=['POST'])
 def predict_waiting_time():
     """
@@ -441,9 +1994,16 @@ def predict_waiting_time():
         "hospital_name": "Lilavati Hospital",
         "symptom": "chest pain",
         "severity": "severe",
-        "traffic_level": "High"
+        "traffic_level": "High",
+        "explain": true (optional; adds per-feature contributions to the predicted mean),
+        "model_tier": "fast" (optional; default: the full model),
+        "latency_budget_ms": 20 (optional; most accurate tier measured within the budget)
     }
     """
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return jsonify(unavailable[0]), unavailable[1]
+    
     try:
         data = request.get_json()
         
@@ -456,22 +2016,27 @@ def predict_waiting_time():
                 "message": f"Missing required fields: {', '.join(missing_fields)}"
             }), 400
         
+        active = registry.active
+        bundle = active.payload
+        
         hospital_name = data['hospital_name']
-        symptom = data['symptom']
-        severity = data.get('severity', infer_severity(symptom))
+        symptom = canonical_symptom(data['symptom'], bundle["resolver"])
+        severity = data.get('severity', infer_severity(symptom, bundle["metadata"], bundle["resolver"]))
         traffic_level = data.get('traffic_level', 'Moderate')
+        tier = select_model_tier(bundle, None, data.get('model_tier'), data.get('latency_budget_ms'))
         
-        # Find hospital
-        hospital_row = hospitals_df[hospitals_df['hospital_name'] == hospital_name]
+        # Find hospital (live capacity)
+        snapshot = availability.snapshot
+        rows = snapshot.name_index.get(hospital_name)
         
-        if hospital_row.empty:
+        if rows is None:
             return jsonify({
                 "status": "error",
                 "message": f"Hospital '{hospital_name}' not found"
             }), 404
         
         # Prepare for prediction
-        hospital_row = hospital_row.copy()
+        hospital_row = snapshot.df.iloc[rows[:1]].copy()
         hospital_row['symptom'] = symptom
         hospital_row['severity'] = severity
         hospital_row['traffic_level'] = traffic_level
@@ -479,19 +2044,37 @@ def predict_waiting_time():
         # Apply feature engineering
         hospital_row = engineer_features_for_prediction(hospital_row)
         
-        # Predict
-        feature_cols = metadata['feature_cols']
-        predicted_wait = model.predict(hospital_row[feature_cols])[0]
+        # Predict (mean plus P50/P90 from the same pass)
+        feature_cols = bundle["metadata"]['feature_cols']
+        stats = bundle["tiers"][tier]["estimator"].predict(hospital_row[feature_cols])[:, 0]
         
-        return jsonify({
+        response = {
             "status": "success",
             "hospital_name": hospital_name,
             "symptom": symptom,
             "severity": severity,
             "traffic_level": traffic_level,
-            "predicted_waiting_time_min": round(float(predicted_wait), 1)
-        }), 200
+            "predicted_waiting_time_min": round(float(stats[WAIT_MEAN]), 1),
+            "waiting_time_p50_min": round(float(stats[WAIT_P50]), 1),
+            "waiting_time_p90_min": round(float(stats[WAIT_P90]), 1),
+            "model_version": active.version,
+            "model_tier": tier
+        }
         
+        if data.get('explain', False):
+            # Memoized per model version and tier by the row's feature values
+            explainer = bundle["tiers"][tier]["explainer"]
+            features = hospital_row[feature_cols]
+            response["explanation"] = explainer.explain(
+                features, [tuple(features.iloc[0].tolist())])[0] if explainer is not None else None
+        
+        return jsonify(response), 200
+        
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }), 400
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -499,6 +2082,222 @@ def predict_waiting_time():
         }), 500
 
 
+@app.route('/api/simulate/waits', methods=['POST'])
+def simulate_waits():
+    """
+    Simulated emergency waiting times under a what-if surge
+    
+    Request Body:
+    {
+        "severity": "severe" (or "symptom": "chest pain" to infer it),
+        "surge": {"severe": 40, "moderate": 20} (optional; extra arrivals per severity),
+        "surge_window_min": 60 (optional; surge arrivals spread over this window),
+        "arrival_min": 60 (optional; when the patient arrives, minutes from now;
+                           default: the end of the surge window),
+        "hospital_name": "Lilavati Hospital" (optional),
+        "speciality": "Cardiology" (optional),
+        "replications": 1000 (optional, max 10000),
+        "seed": 2024 (optional),
+        "limit": 50 (optional; shortest simulated waits first, max 500)
+    }
+    """
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return jsonify(unavailable[0]), unavailable[1]
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        bundle = registry.active.payload
+        
+        severity = data.get('severity')
+        if severity is None:
+            if 'symptom' not in data:
+                return jsonify({
+                    "status": "error",
+                    "message": "Missing required fields: severity or symptom"
+                }), 400
+            severity = infer_severity(data['symptom'], bundle["metadata"], bundle["resolver"])
+        severity = str(severity).lower()
+        if severity not in SEVERITIES:
+            raise ValueError(f"severity must be one of: {', '.join(SEVERITIES)}")
+        
+        scenario = make_scenario(
+            data.get('surge'),
+            data.get('surge_window_min', DEFAULT_SURGE_WINDOW_MIN),
+            data.get('arrival_min')
+        )
+        replications = int(data.get('replications', DEFAULT_REPLICATIONS))
+        limit = int(data.get('limit', 50))
+        if not (1 <= replications <= MAX_REPLICATIONS) or not (1 <= limit <= MAX_PAGE_SIZE):
+            return jsonify({
+                "status": "error",
+                "message": f"replications must be between 1 and {MAX_REPLICATIONS} "
+                           f"and limit between 1 and {MAX_PAGE_SIZE}"
+            }), 400
+        seed = data.get('seed')
+        seed = int(seed) if seed is not None else None
+        
+        # Live capacity of the selected records
+        snapshot = availability.snapshot
+        columns = snapshot.columns
+        rows = np.arange(len(snapshot.df))
+        if data.get('hospital_name'):
+            rows = snapshot.name_index.get(data['hospital_name'])
+            if rows is None:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Hospital '{data['hospital_name']}' not found"
+                }), 404
+        if data.get('speciality'):
+            rows = rows[columns["speciality"][rows] == data['speciality']]
+        
+        capacity = {col: columns[col][rows] for col in ["general_beds", "icu_beds", "ventilators"]}
+        samples = queue_simulator.wait_samples(capacity, severity, scenario, replications, seed)
+        stats = sample_wait_stats(samples)
+        order = np.argsort(stats[WAIT_MEAN], kind="stable")[:limit]
+        
+        hospitals = []
+        for i in order:
+            row = rows[i]
+            hospitals.append({
+                "hospital_name": columns["hospital_name"][row],
+                "speciality": columns["speciality"][row],
+                "available_general_beds": int(columns["general_beds"][row]),
+                "available_icu_beds": int(columns["icu_beds"][row]),
+                "available_ventilators": int(columns["ventilators"][row]),
+                "simulated_waiting_time_min": round(float(stats[WAIT_MEAN, i]), 1),
+                "waiting_time_p50_min": round(float(stats[WAIT_P50, i]), 1),
+                "waiting_time_p90_min": round(float(stats[WAIT_P90, i]), 1),
+                "probability_of_waiting": round(float((samples[i] > 0).mean()), 3),
+                "probability_beyond_horizon": round(float((samples[i] >= queue_simulator.horizon).mean()), 3)
+            })
+        
+        return jsonify({
+            "status": "success",
+            "severity": severity,
+            "scenario": {
+                "surge": dict(scenario.surge),
+                "surge_window_min": scenario.surge_window_min,
+                "arrival_min": scenario.arrival_min
+            },
+            "replications": replications,
+            "seed": queue_simulator.seed if seed is None else seed,
+            "simulator": queue_simulator.describe(),
+            "total_matched": int(len(rows)),
+            "hospitals": hospitals
+        }), 200
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid input: {str(e)}"
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+
+@app.route('/api/model/versions', methods=['GET'])
+def model_versions():
+    """Active model version and the versions retained for rollback"""
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return jsonify(unavailable[0]), unavailable[1]
+    
+    return jsonify({
+        "status": "success",
+        "active_version": registry.active.version,
+        "versions": registry.versions(),
+        "last_reload_error": registry.last_error
+    }), 200
+
+
+@app.route('/api/model/reload', methods=['POST'])
+def reload_model():
+    """Load, validate and activate the artifacts currently on disk"""
+    if registry is None:
+        return jsonify({
+            "status": "error",
+            "message": "Model registry not initialized"
+        }), 503
+    
+    try:
+        version = registry.load()
+        return jsonify({
+            "status": "success",
+            "active_version": version.version,
+            "canary": version.canary
+        }), 200
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Reload rejected: {str(e)}"
+        }), 422
+
+
+@app.route('/api/model/rollback', methods=['POST'])
+def rollback_model():
+    """
+    Re-activate a retained model version
+    
+    Request Body (optional):
+    {
+        "version": 2    (default: the version before the active one)
+    }
+    """
+    unavailable = model_unavailable()
+    if unavailable is not None:
+        return jsonify(unavailable[0]), unavailable[1]
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        version = registry.rollback(data.get('version'))
+        return jsonify({
+            "status": "success",
+            "active_version": version.version
+        }), 200
+    except LookupError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 404
+
+
+@app.route('/api/tiles', methods=['GET'])
+def tiles_status():
+    """Status of the precomputed recommendation tiles"""
+    index = tile_index
+    current = (
+        index is not None and registry is not None and registry.active is not None and
+        index.fingerprint == tile_fingerprint(registry.active.fingerprint, tile_source_fingerprint,
+                                              travel_times.road_mode)
+    )
+    return jsonify({
+        "status": "success",
+        "enabled": TILE_MODE,
+        "ready": current,
+        "rebuilding": tile_builder is not None,
+        "index": index.describe() if index is not None else None
+    }), 200
+
+
+@app.route('/api/tiles/rebuild', methods=['POST'])
+def rebuild_tiles():
+    """Queue a background rebuild of the recommendation tiles"""
+    if not TILE_MODE:
+        return jsonify({
+            "status": "error",
+            "message": "Recommendation tiles are disabled (set RECOMMEND_TILES=1)"
+        }), 409
+    
+    schedule_tile_rebuild()
+    return jsonify({
+        "status": "success",
+        "message": "Tile rebuild queued"
+    }), 202
+
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
@@ -515,6 +2314,11 @@ def internal_error(error):
     }), 500
 
 
+# gunicorn imports app:app without running __main__, so each worker loads (and starts
+# watching the model artifacts) here
+resources_loaded = load_model_and_data() if MODEL_LOAD_ON_IMPORT else False
+
+
 # ============================================
 # MAIN
 # ============================================
@@ -524,8 +2328,8 @@ if __name__ == '__main__':
     print("SMART EMERGENCY HOSPITAL RECOMMENDER API")
     print("=" * 60)
     
-    # Load model and data
-    if not load_model_and_data():
+    # Load model and data (already attempted at import unless MODEL_LOAD_ON_IMPORT=0)
+    if not (resources_loaded if MODEL_LOAD_ON_IMPORT else load_model_and_data()):
         print("[ERROR] Failed to start server. Please train the model first.")
         exit(1)
     
@@ -0,0 +1,274 @@
+# availability.py
+"""
+Live bed / ICU / ventilator availability for the hospital recommender
+Writers build a new immutable snapshot and swap it in; readers never take a lock
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CAPACITY_COLUMNS = ["general_beds", "icu_beds", "ventilators"]
+
+# Cached prediction arrays per snapshot (one per symptom/severity combination)
+MAX_CACHED_PREDICTIONS = 256
+
+
+class AvailabilitySnapshot:
+    """Immutable hospital table at one version, with features and cached predictions"""
+
+    __slots__ = ("version", "df", "name_index", "predictions", "columns", "row_versions")
+
+    def __init__(self, version: int, df: pd.DataFrame,
+                 name_index: Dict[str, np.ndarray], predictions: Dict[Tuple, np.ndarray],
+                 columns: Optional[Dict[str, np.ndarray]] = None,
+                 row_versions: Optional[np.ndarray] = None):
+        self.version = version
+        self.df = df
+        self.name_index = name_index
+        self.predictions = predictions
+        # Plain column arrays for the hot path; pandas column access is comparatively slow
+        self.columns = columns if columns is not None else {
+            col: df[col].to_numpy() for col in df.columns
+        }
+        # Version at which each row's capacity last changed (0: as loaded)
+        self.row_versions = row_versions if row_versions is not None else np.zeros(len(df), dtype=np.int64)
+
+    def rows_changed_since(self, version: int) -> np.ndarray:
+        """Rows whose capacity changed after the given version of this store"""
+        return np.flatnonzero(self.row_versions > version)
+
+
+class AvailabilityStore:
+    """
+    In-memory availability store with atomic snapshot swaps
+
+    engineer_fn adds the capacity-derived feature columns to a frame of hospital rows.
+    predict_fn(rows, key) returns predicted waiting times for those rows under a cache key,
+    either one value per row or a stack of statistics with rows on the last axis; the
+    optional batch_predict_fn(rows, keys) returns one such prediction per key.
+    listeners are called with each new snapshot, in order, while the write lock is held.
+    Keys for which deferred_fn(key) is true are too slow to re-predict under that lock:
+    updates carry them over as they were, and refresh_deferred catches them up later.
+    """
+
+    def __init__(
+        self,
+        hospitals_df: pd.DataFrame,
+        engineer_fn: Callable[[pd.DataFrame], pd.DataFrame],
+        predict_fn: Callable[[pd.DataFrame, Tuple], np.ndarray],
+        derived_columns: List[str],
+        listeners: Optional[List[Callable[[AvailabilitySnapshot], None]]] = None,
+        batch_predict_fn: Optional[Callable[[pd.DataFrame, List[Tuple]], np.ndarray]] = None,
+        deferred_fn: Optional[Callable[[Tuple], bool]] = None,
+    ):
+        self.engineer_fn = engineer_fn
+        self.predict_fn = predict_fn
+        self.batch_predict_fn = batch_predict_fn
+        self.deferred_fn = deferred_fn
+        # Deferred key -> last version its cached prediction is up to date with
+        self._stale_since: Dict[Tuple, int] = {}
+        self.derived_columns = derived_columns
+        self.listeners = listeners or []
+        self._write_lock = threading.Lock()
+
+        df = engineer_fn(hospitals_df.reset_index(drop=True))
+        names = df["hospital_name"].to_numpy()
+        name_index = {
+            name: np.flatnonzero(names == name)
+            for name in pd.unique(names)
+        }
+        self._snapshot = AvailabilitySnapshot(0, df, name_index, {})
+        for listener in self.listeners:
+            listener(self._snapshot)
+
+    @property
+    def snapshot(self) -> AvailabilitySnapshot:
+        """Current snapshot; grab it once per request and use it throughout"""
+        return self._snapshot
+
+    def predicted_wait(self, snapshot: AvailabilitySnapshot, key: Tuple) -> np.ndarray:
+        """Predicted waiting time for every row of a snapshot, computed once per key"""
+        cached = snapshot.predictions.get(key)
+        if cached is not None:
+            return cached
+
+        predictions = np.asarray(self.predict_fn(snapshot.df, key), dtype=float)
+        predictions.flags.writeable = False
+        if len(snapshot.predictions) < MAX_CACHED_PREDICTIONS:
+            snapshot.predictions[key] = predictions
+        return predictions
+
+    def predicted_waits(self, snapshot: AvailabilitySnapshot, keys: List[Tuple]) -> List[np.ndarray]:
+        """predicted_wait for several keys; uncached keys are predicted in one batch"""
+        missing = [key for key in dict.fromkeys(keys) if key not in snapshot.predictions]
+        batched = {}
+        if len(missing) > 1 and self.batch_predict_fn is not None:
+            batch = np.asarray(self.batch_predict_fn(snapshot.df, missing), dtype=float)
+            for key, predictions in zip(missing, batch):
+                predictions = predictions.copy()
+                predictions.flags.writeable = False
+                batched[key] = predictions
+                if len(snapshot.predictions) < MAX_CACHED_PREDICTIONS:
+                    snapshot.predictions[key] = predictions
+        return [batched[key] if key in batched else self.predicted_wait(snapshot, key) for key in keys]
+
+    def cache_prediction(self, snapshot: AvailabilitySnapshot, key: Tuple, predictions: np.ndarray):
+        """
+        Cache a deferred key's predictions, computed off the request path on an older
+        snapshot, in the current one; rows updated since stay stale until refresh_deferred
+        """
+        predictions = np.array(predictions, dtype=float)
+        predictions.flags.writeable = False
+        with self._write_lock:
+            current = self._snapshot
+            if len(current.predictions) < MAX_CACHED_PREDICTIONS:
+                current.predictions[key] = predictions
+                if current.version > snapshot.version:
+                    self._stale_since[key] = snapshot.version
+
+    def stale_keys(self) -> List[Tuple]:
+        """Deferred keys whose cached predictions lag behind capacity updates"""
+        with self._write_lock:
+            return list(self._stale_since)
+
+    def refresh_deferred(self, key: Tuple):
+        """Re-predict the rows a deferred key missed, outside the write lock"""
+        while True:
+            snapshot = self._snapshot
+            since = self._stale_since.get(key)
+            if since is None:
+                return
+            rows = snapshot.rows_changed_since(since)
+            fresh = self.predict_fn(snapshot.df.iloc[rows], key) if len(rows) else None
+
+            with self._write_lock:
+                current = self._snapshot
+                cached = current.predictions.get(key)
+                if cached is None:
+                    self._stale_since.pop(key, None)
+                    return
+                if fresh is not None:
+                    predictions = cached.copy()
+                    predictions[..., rows] = fresh
+                    predictions.flags.writeable = False
+                    current.predictions[key] = predictions
+                # Rows updated while predicting go round again
+                if current.version > snapshot.version:
+                    self._stale_since[key] = snapshot.version
+                else:
+                    del self._stale_since[key]
+
+    # ============================================
+    # UPDATES
+    # ============================================
+
+    def apply_updates(self, updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Apply capacity updates atomically as one new snapshot
+
+        Each update: {"hospital_name": str, "mode": "set" | "delta", <capacity column>: int, ...}
+        Updates apply to every record of the named hospital. Raises KeyError for unknown
+        hospitals and ValueError for invalid fields, before anything is swapped in.
+        """
+        parsed = [self._parse_update(u) for u in updates]
+
+        with self._write_lock:
+            old = self._snapshot
+
+            for name, _, _ in parsed:
+                if name not in old.name_index:
+                    raise KeyError(name)
+
+            columns = {col: old.df[col].to_numpy().copy() for col in CAPACITY_COLUMNS}
+            touched = []
+            for name, mode, values in parsed:
+                rows = old.name_index[name]
+                touched.append(rows)
+                for col, value in values.items():
+                    if mode == "delta":
+                        columns[col][rows] = np.maximum(columns[col][rows] + value, 0)
+                    else:
+                        columns[col][rows] = value
+
+            rows = np.unique(np.concatenate(touched)) if touched else np.empty(0, dtype=np.intp)
+
+            # Recompute derived features for the affected rows only
+            new_df = old.df.assign(**columns)
+            if len(rows):
+                derived = self.engineer_fn(new_df.iloc[rows])
+                for col in self.derived_columns:
+                    values = new_df[col].to_numpy().copy()
+                    values[rows] = derived[col].to_numpy()
+                    new_df[col] = values
+
+            # Re-predict cached waiting times for the affected rows only
+            predictions = {}
+            affected = new_df.iloc[rows]
+            for key, old_pred in old.predictions.copy().items():
+                if self.deferred_fn is not None and self.deferred_fn(key):
+                    # Keeps serving the previous prediction for these rows until refreshed
+                    predictions[key] = old_pred
+                    if len(rows):
+                        self._stale_since.setdefault(key, old.version)
+                    continue
+                pred = old_pred.copy()
+                if len(rows):
+                    pred[..., rows] = self.predict_fn(affected, key)
+                pred.flags.writeable = False
+                predictions[key] = pred
+
+            changed = CAPACITY_COLUMNS + self.derived_columns
+            arrays = dict(old.columns)
+            arrays.update({col: new_df[col].to_numpy() for col in changed})
+            row_versions = old.row_versions.copy()
+            row_versions[rows] = old.version + 1
+            new = AvailabilitySnapshot(old.version + 1, new_df, old.name_index, predictions, arrays,
+                                       row_versions)
+            self._snapshot = new
+            for listener in self.listeners:
+                listener(new)
+
+        return {
+            "version": new.version,
+            "hospitals_updated": len(parsed),
+            "records_updated": int(len(rows)),
+        }
+
+    def prune_predictions(self, keep: Callable[[Tuple], bool]):
+        """Drop cached predictions whose key fails keep(), e.g. after a model swap"""
+        with self._write_lock:
+            old = self._snapshot
+            predictions = {k: v for k, v in old.predictions.copy().items() if keep(k)}
+            self._snapshot = AvailabilitySnapshot(old.version, old.df, old.name_index, predictions, old.columns,
+                                                  old.row_versions)
+
+    def refresh_listeners(self):
+        """Re-run the listeners on the current snapshot (e.g. after metadata changes)"""
+        with self._write_lock:
+            for listener in self.listeners:
+                listener(self._snapshot)
+
+    @staticmethod
+    def _parse_update(update: Dict[str, Any]) -> Tuple[str, str, Dict[str, int]]:
+        """Validate one update entry"""
+        if not isinstance(update, dict) or "hospital_name" not in update:
+            raise ValueError("Each update needs a hospital_name")
+
+        mode = update.get("mode", "set")
+        if mode not in ("set", "delta"):
+            raise ValueError("mode must be 'set' or 'delta'")
+
+        unknown = [k for k in update if k not in CAPACITY_COLUMNS + ["hospital_name", "mode"]]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        values = {col: int(update[col]) for col in CAPACITY_COLUMNS if col in update}
+        if not values:
+            raise ValueError(f"Provide at least one of: {', '.join(CAPACITY_COLUMNS)}")
+        if mode == "set" and any(v < 0 for v in values.values()):
+            raise ValueError("Capacity values cannot be negative")
+
+        return update["hospital_name"], mode, values
@@ -0,0 +1,334 @@
+# dispatch.py
+"""
+Ambulance fleet dispatch for the hospital recommender
+Keeps live unit positions in a grid spatial index, finds the nearest capable free unit
+for an incident and assigns several simultaneous incidents as one min-cost matching.
+"""
+
+import math
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from travel_time import DEFAULT_SPEED_KMH, EARTH_RADIUS_KM, haversine_km
+
+# Capability ladder: a unit can serve any incident at or below its level
+UNIT_CAPABILITY = {"BLS": 1, "ALS": 2, "ICU": 3}
+
+# Minimum unit type per severity (mild cases may get any unit)
+SEVERITY_UNIT_TYPE = {"mild": "BLS", "moderate": "BLS", "severe": "ALS"}
+
+UNIT_STATUSES = ["available", "dispatched", "offline"]
+
+# Spatial index cell size in degrees (~1.1 km)
+FLEET_CELL_DEG = 0.01
+
+# Extra minutes charged per capability level above what the incident needs, so batch
+# matching keeps ALS/ICU units free for the calls that need them
+OVERQUALIFIED_PENALTY_MIN = 2.0
+
+# Search radius cap for one incident (km)
+MAX_DISPATCH_RADIUS_KM = 50.0
+
+# Cost marking an incident/unit pair that must not be matched
+UNASSIGNABLE_COST = 1e9
+
+
+class Unit:
+    """One ambulance and its live state"""
+
+    __slots__ = ("unit_id", "unit_type", "lat", "lng", "status", "incident_id", "updated_at", "cell")
+
+    def __init__(self, unit_id: str, unit_type: str, lat: float, lng: float, status: str):
+        self.unit_id = unit_id
+        self.unit_type = unit_type
+        self.lat = lat
+        self.lng = lng
+        self.status = status
+        self.incident_id = None
+        self.updated_at = datetime.utcnow().isoformat() + "Z"
+        self.cell = None
+
+    @property
+    def capability(self) -> int:
+        return UNIT_CAPABILITY[self.unit_type]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "unit_id": self.unit_id,
+            "unit_type": self.unit_type,
+            "lat": self.lat,
+            "lng": self.lng,
+            "status": self.status,
+            "incident_id": self.incident_id,
+            "updated_at": self.updated_at,
+        }
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Scalar haversine; much cheaper than numpy for one pair inside the search loop"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def required_unit_type(severity: Optional[str] = None, unit_type: Optional[str] = None) -> str:
+    """Unit type an incident needs: explicit type first, else derived from severity"""
+    if unit_type is not None:
+        unit_type = unit_type.upper()
+        if unit_type not in UNIT_CAPABILITY:
+            raise ValueError(f"unit_type must be one of: {', '.join(UNIT_CAPABILITY)}")
+        return unit_type
+    return SEVERITY_UNIT_TYPE.get((severity or "moderate").lower(), "BLS")
+
+
+class AmbulanceFleet:
+    """
+    In-memory fleet with a uniform grid index over the available units
+
+    Every method takes the fleet lock, so a unit can never be handed to two incidents.
+    ETAs are straight-line distance at the average city speed.
+    """
+
+    def __init__(self, cell_size: float = FLEET_CELL_DEG, speed_kmh: float = DEFAULT_SPEED_KMH):
+        self.cell_size = cell_size
+        self.speed_kmh = speed_kmh
+        self._units: Dict[str, Unit] = {}
+        self._grid: Dict[Tuple[int, int], set] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    # ============================================
+    # LIVE POSITIONS
+    # ============================================
+
+    def upsert(self, updates: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Add units or update their position/status
+
+        Each update: {"unit_id": str, "lat": float, "lng": float, "unit_type": "BLS"|"ALS"|"ICU",
+        "status": "available"|"dispatched"|"offline"}. New units need unit_type, lat and lng.
+        Raises ValueError before anything is applied if an entry is invalid.
+        """
+        parsed = [self._parse_update(u) for u in updates]
+
+        created = 0
+        with self._lock:
+            for unit_id, fields in parsed:
+                unit = self._units.get(unit_id)
+                if unit is None and not {"unit_type", "lat", "lng"} <= fields.keys():
+                    raise ValueError(f"unit_type, lat and lng are required for new unit {unit_id}")
+
+            for unit_id, fields in parsed:
+                unit = self._units.get(unit_id)
+                if unit is None:
+                    unit = Unit(unit_id, fields["unit_type"], fields["lat"], fields["lng"],
+                                fields.get("status", "available"))
+                    self._units[unit_id] = unit
+                    created += 1
+                else:
+                    self._unindex(unit)
+                    for key, value in fields.items():
+                        setattr(unit, key, value)
+                    unit.updated_at = datetime.utcnow().isoformat() + "Z"
+                if unit.status != "dispatched":
+                    unit.incident_id = None
+                self._index(unit)
+
+        return {"units_updated": len(parsed) - created, "units_created": created}
+
+    def release(self, unit_id: str, lat: Optional[float] = None, lng: Optional[float] = None) -> Unit:
+        """Mark a unit available again (optionally at a new position); KeyError if unknown"""
+        with self._lock:
+            unit = self._units[unit_id]
+            self._unindex(unit)
+            if lat is not None and lng is not None:
+                unit.lat, unit.lng = float(lat), float(lng)
+            unit.status = "available"
+            unit.incident_id = None
+            unit.updated_at = datetime.utcnow().isoformat() + "Z"
+            self._index(unit)
+            return unit
+
+    def units(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [u.describe() for u in self._units.values() if status is None or u.status == status]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {t: {s: 0 for s in UNIT_STATUSES} for t in UNIT_CAPABILITY}
+            for unit in self._units.values():
+                counts[unit.unit_type][unit.status] += 1
+        return {"total_units": len(self._units), "by_type": counts}
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lng / self.cell_size))
+
+    def _index(self, unit: Unit):
+        """Only available units live in the grid"""
+        if unit.status == "available":
+            unit.cell = self._cell(unit.lat, unit.lng)
+            self._grid.setdefault(unit.cell, set()).add(unit.unit_id)
+
+    def _unindex(self, unit: Unit):
+        if unit.cell is not None:
+            members = self._grid.get(unit.cell)
+            if members is not None:
+                members.discard(unit.unit_id)
+                if not members:
+                    del self._grid[unit.cell]
+            unit.cell = None
+
+    @staticmethod
+    def _parse_update(update: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Validate one position update"""
+        if not isinstance(update, dict) or "unit_id" not in update:
+            raise ValueError("Each update needs a unit_id")
+
+        fields = {}
+        if "lat" in update or "lng" in update:
+            if "lat" not in update or "lng" not in update:
+                raise ValueError("lat and lng must be given together")
+            lat, lng = float(update["lat"]), float(update["lng"])
+            if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+                raise ValueError("Invalid coordinates")
+            fields["lat"], fields["lng"] = lat, lng
+        if "unit_type" in update:
+            fields["unit_type"] = required_unit_type(unit_type=update["unit_type"])
+        if "status" in update:
+            if update["status"] not in UNIT_STATUSES:
+                raise ValueError(f"status must be one of: {', '.join(UNIT_STATUSES)}")
+            fields["status"] = update["status"]
+
+        return str(update["unit_id"]), fields
+
+    # ============================================
+    # DISPATCH
+    # ============================================
+
+    def nearest(self, lat: float, lng: float, min_capability: int, k: int = 1,
+                max_radius_km: float = MAX_DISPATCH_RADIUS_KM) -> List[Tuple[float, Unit]]:
+        """k nearest available units with at least min_capability, as (distance_km, unit)"""
+        with self._lock:
+            return self._nearest(lat, lng, min_capability, k, max_radius_km)
+
+    def _nearest(self, lat, lng, min_capability, k, max_radius_km):
+        ci, cj = self._cell(lat, lng)
+        # Shortest distance spanned by one grid cell around this latitude
+        cell_km = self.cell_size * 111.0 * min(1.0, math.cos(math.radians(lat)))
+        max_ring = int(math.ceil(max_radius_km / cell_km)) + 1
+
+        found = []
+        for ring in range(max_ring + 1):
+            for cell in ring_cells(ci, cj, ring):
+                for unit_id in self._grid.get(cell, ()):
+                    unit = self._units[unit_id]
+                    if unit.capability >= min_capability:
+                        found.append((distance_km(lat, lng, unit.lat, unit.lng), unit))
+
+            # Anything outside this ring is at least `ring` whole cells away
+            if len(found) >= k:
+                found.sort(key=lambda item: (item[0], item[1].unit_id))
+                if found[k - 1][0] <= ring * cell_km:
+                    break
+            if not self._grid:
+                break
+
+        found.sort(key=lambda item: (item[0], item[1].unit_id))
+        return [item for item in found[:k] if item[0] <= max_radius_km]
+
+    def assign(self, incidents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Assign free units to incidents as one batch and mark them dispatched
+
+        Each incident: {"incident_id": str, "lat": float, "lng": float, "severity": str?,
+        "unit_type": str?}. Candidates are each incident's nearest capable units; the batch is
+        solved as a min-cost matching on ETA (Hungarian algorithm). Incidents with no capable
+        unit in range come back with unit = None.
+        """
+        parsed = []
+        for i, incident in enumerate(incidents):
+            lat, lng = float(incident["lat"]), float(incident["lng"])
+            if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+                raise ValueError("Invalid coordinates")
+            unit_type = required_unit_type(incident.get("severity"), incident.get("unit_type"))
+            parsed.append((str(incident.get("incident_id", i + 1)), lat, lng, unit_type))
+
+        with self._lock:
+            # With n incidents, each one's matched unit is (up to the over-qualification
+            # penalty) among its n nearest capable units, so only those enter the matching
+            k = len(parsed)
+            candidates = {}
+            for _, lat, lng, unit_type in parsed:
+                for _, unit in self._nearest(lat, lng, UNIT_CAPABILITY[unit_type], k, MAX_DISPATCH_RADIUS_KM):
+                    candidates[unit.unit_id] = unit
+            pool = list(candidates.values())
+
+            assignments = [None] * len(parsed)
+            if pool:
+                cost = self._cost_matrix(parsed, pool)
+                rows, cols = linear_sum_assignment(cost)
+                for r, c in zip(rows, cols):
+                    if np.isfinite(cost[r, c]) and cost[r, c] < UNASSIGNABLE_COST:
+                        assignments[r] = pool[c]
+
+            results = []
+            now = datetime.utcnow().isoformat() + "Z"
+            for (incident_id, lat, lng, unit_type), unit in zip(parsed, assignments):
+                result = {
+                    "incident_id": incident_id,
+                    "required_unit_type": unit_type,
+                    "unit": None,
+                    "distance_km": None,
+                    "eta_min": None,
+                }
+                if unit is not None:
+                    distance = distance_km(lat, lng, unit.lat, unit.lng)
+                    self._unindex(unit)
+                    unit.status = "dispatched"
+                    unit.incident_id = incident_id
+                    unit.updated_at = now
+                    result.update({
+                        "unit": unit.describe(),
+                        "distance_km": round(distance, 2),
+                        "eta_min": round(distance / self.speed_kmh * 60.0, 1),
+                    })
+                results.append(result)
+
+        return results
+
+    def _cost_matrix(self, parsed, pool: List[Unit]) -> np.ndarray:
+        """ETA minutes (+ over-qualification penalty) for every incident x candidate unit"""
+        inc_lat = np.array([p[1] for p in parsed])[:, None]
+        inc_lng = np.array([p[2] for p in parsed])[:, None]
+        need = np.array([UNIT_CAPABILITY[p[3]] for p in parsed])[:, None]
+
+        unit_lat = np.array([u.lat for u in pool])[None, :]
+        unit_lng = np.array([u.lng for u in pool])[None, :]
+        have = np.array([u.capability for u in pool])[None, :]
+
+        distance = haversine_km(inc_lat, inc_lng, unit_lat, unit_lng)
+        cost = distance / self.speed_kmh * 60.0 + OVERQUALIFIED_PENALTY_MIN * (have - need)
+        # Large finite cost keeps the matching feasible; such pairs are dropped afterwards
+        cost[(have < need) | (distance > MAX_DISPATCH_RADIUS_KM)] = UNASSIGNABLE_COST
+        return cost
+
+
+def ring_cells(ci: int, cj: int, ring: int):
+    """Grid cells at Chebyshev distance `ring` from (ci, cj)"""
+    if ring == 0:
+        yield ci, cj
+        return
+    for dj in range(-ring, ring + 1):
+        yield ci - ring, cj + dj
+        yield ci + ring, cj + dj
+    for di in range(-ring + 1, ring):
+        yield ci + di, cj - ring
+        yield ci + di, cj + ring
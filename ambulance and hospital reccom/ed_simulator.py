@@ -0,0 +1,334 @@
+# ed_simulator.py
+"""
+Discrete-event simulation of hospital emergency queues for the hospital recommender
+Patients arrive by severity and wait for a general bed (moderate before mild), an ICU bed
+or a ventilator (severe). Every pool is a non-preemptive priority queue with one server per
+bed, simulated for many replications at once as NumPy arrays, so it can answer "what if 40
+severe cases arrive in the next hour" where the waiting time regressor cannot.
+"""
+
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+
+from forest_quantiles import WAIT_MEAN, WAIT_P50, WAIT_P90, WAIT_QUANTILES, WAIT_STATS
+
+SEVERITY_LEVELS = ("mild", "moderate", "severe")
+
+# Capacity column of each pool and the severities it serves, highest priority first
+POOL_CLASSES = {
+    "general_beds": ("moderate", "mild"),
+    "icu_beds": ("severe",),
+    "ventilators": ("severe",),
+}
+
+# Mean bed occupancy per patient (minutes) and its coefficient of variation (lognormal)
+SERVICE_MEAN_MIN = {"mild": 45.0, "moderate": 120.0, "severe": 360.0}
+VENTILATOR_SERVICE_MEAN_MIN = 720.0
+SERVICE_CV = 0.75
+
+# Share of severe patients who need a ventilator rather than an ICU bed
+VENTILATED_SHARE = 0.3
+
+# Utilization every pool runs at from its baseline arrivals, and the occupancy it starts at
+BASE_UTILIZATION = 0.85
+
+# Replications per simulation, and the most a request may ask for
+DEFAULT_REPLICATIONS = 1000
+MAX_REPLICATIONS = 10000
+
+# Replications behind the waiting times served to recommend_hospitals
+PROVIDER_REPLICATIONS = 500
+
+# Waits are followed this long after the tagged patient arrives (longer ones are capped)
+SIM_HORIZON_MIN = 240.0
+
+# Surge arrivals are spread over this window from now unless the scenario says otherwise
+DEFAULT_SURGE_WINDOW_MIN = 60.0
+
+# Replications x (servers + arrivals) simulated per work item
+CHUNK_CELLS = 2_000_000
+
+DEFAULT_SEED = 2024
+
+# What-if scenario: extra arrivals per severity within surge_window_min of now, and when the
+# patient whose wait is reported arrives (default: as the surge window closes, so the surge
+# is ahead of them). Hashable, so it can be part of a cache key.
+Scenario = namedtuple("Scenario", ["surge", "surge_window_min", "arrival_min"])
+
+
+def make_scenario(surge: Optional[Dict[str, Any]] = None,
+                  surge_window_min: float = DEFAULT_SURGE_WINDOW_MIN,
+                  arrival_min: Optional[float] = None) -> Scenario:
+    """Validated Scenario; surge is {severity: extra patients}"""
+    counts = []
+    for severity, count in (surge or {}).items():
+        if severity not in SEVERITY_LEVELS:
+            raise ValueError(f"Unknown severity '{severity}'. Expected one of: {', '.join(SEVERITY_LEVELS)}")
+        count = int(count)
+        if count < 0:
+            raise ValueError("Surge counts must be non-negative")
+        if count:
+            counts.append((severity, count))
+    surge_window_min = float(surge_window_min)
+    if not surge_window_min > 0:
+        raise ValueError("surge_window_min must be positive")
+    if arrival_min is None:
+        arrival_min = min(surge_window_min, SIM_HORIZON_MIN) if counts else 0.0
+    arrival_min = float(arrival_min)
+    if not 0 <= arrival_min <= SIM_HORIZON_MIN:
+        raise ValueError(f"arrival_min must be between 0 and {SIM_HORIZON_MIN:g}")
+    return Scenario(tuple(sorted(counts)), surge_window_min, arrival_min)
+
+
+BASELINE_SCENARIO = make_scenario()
+
+
+def lognormal(rng: np.random.Generator, mean: float, cv: float, size) -> np.ndarray:
+    """float32 lognormal draws with the given mean and coefficient of variation"""
+    sigma2 = np.log1p(cv ** 2)
+    z = rng.standard_normal(size, dtype=np.float32)
+    z *= np.float32(np.sqrt(sigma2))
+    z += np.float32(np.log(mean) - sigma2 / 2)
+    return np.exp(z, out=z)
+
+
+def run_queue(free: np.ndarray, arrivals: List[np.ndarray], services: List[np.ndarray],
+              tag_class: int, tag_pos: np.ndarray, arrival: float, horizon: float) -> np.ndarray:
+    """
+    Service-start loop of a non-preemptive priority queue for a batch of replications
+
+    free is (batch, servers) time each server frees up (inf pads missing servers);
+    arrivals[k] / services[k] are (batch, m) sorted arrival and service times of class k
+    (0 = highest priority), inf padded with at least one spare column. The tagged patient
+    is arrivals[tag_class][b, tag_pos[b]]. Each step every replication starts one patient
+    on its earliest free server: the highest class already waiting, or else the next
+    arrival. Returns the tagged patient's wait per replication, capped at horizon.
+    """
+    n = len(free)
+    wait = np.full(n, horizon)
+    ids = np.arange(n)
+    heads = np.zeros((n, len(arrivals)), dtype=np.intp)
+    done = np.zeros(n, dtype=bool)
+
+    while len(ids):
+        r = np.arange(len(ids))
+        server = free.argmin(axis=1)
+        t_free = free[r, server]
+        waiting = np.column_stack([arr[r, heads[:, k]] for k, arr in enumerate(arrivals)])
+        eligible = waiting <= t_free[:, None]
+        k = np.where(eligible.any(axis=1), eligible.argmax(axis=1), waiting.argmin(axis=1))
+        start = np.maximum(t_free, waiting[r, k])
+
+        tagged = (k == tag_class) & (heads[r, tag_class] == tag_pos)
+        finished = ~done & (tagged | (start - arrival >= horizon))
+        wait[ids[finished]] = np.minimum(start[finished] - arrival, horizon)
+        done |= finished
+
+        go = ~done
+        service = np.zeros(len(ids))
+        for c, times in enumerate(services):
+            m = go & (k == c)
+            service[m] = times[r[m], heads[m, c]]
+        free[r[go], server[go]] = start[go] + service[go]
+        heads[r[go], k[go]] += 1
+
+        # Drop finished replications once they are a sizeable share of the batch
+        if done.all() or done.sum() * 4 >= len(ids):
+            keep = ~done
+            ids, free, heads, tag_pos, done = ids[keep], free[keep], heads[keep], tag_pos[keep], done[keep]
+            arrivals = [arr[keep] for arr in arrivals]
+            services = [svc[keep] for svc in services]
+    return wait
+
+
+class EDSimulator:
+    """
+    Emergency department queue simulator seeded from the hospital table
+
+    Each hospital row's pools have one server per general bed, ICU bed and ventilator.
+    Baseline arrivals keep every pool at BASE_UTILIZATION (general-bed arrivals split by
+    the table's severity mix), and each replication starts with that share of beds busy.
+    The reported wait is that of one extra patient arriving at scenario.arrival_min:
+    patients ahead of them are everyone arriving earlier plus higher-priority arrivals
+    during their wait, surge patients included. Rows with the same pool size share one
+    simulation, and distinct pool sizes run in parallel on n_jobs threads.
+    """
+
+    def __init__(self, severity_mix: Optional[Dict[str, float]] = None,
+                 utilization: float = BASE_UTILIZATION, horizon: float = SIM_HORIZON_MIN,
+                 n_jobs: int = -1, seed: int = DEFAULT_SEED):
+        mix = severity_mix or {severity: 1.0 for severity in SEVERITY_LEVELS}
+        total = sum(mix.get(severity, 0.0) for severity in SEVERITY_LEVELS)
+        self.severity_mix = {severity: mix.get(severity, 0.0) / total for severity in SEVERITY_LEVELS}
+        self.utilization = float(utilization)
+        self.horizon = float(horizon)
+        self.n_jobs = n_jobs
+        self.seed = seed
+
+    @classmethod
+    def from_table(cls, df: pd.DataFrame, **kwargs) -> "EDSimulator":
+        """Simulator with the severity mix of the hospital table's records"""
+        counts = df["severity"].str.lower().value_counts()
+        return cls(severity_mix={s: float(counts.get(s, 0)) for s in SEVERITY_LEVELS}, **kwargs)
+
+    # -- pools ------------------------------------------------------------
+
+    def _pool_classes(self, pool: str):
+        """(severities, arrival share, mean service) of a pool's classes, priority order"""
+        severities = POOL_CLASSES[pool]
+        mix = np.array([self.severity_mix[s] for s in severities])
+        mix = mix / mix.sum() if mix.sum() > 0 else np.full(len(severities), 1.0 / len(severities))
+        means = np.array([VENTILATOR_SERVICE_MEAN_MIN if pool == "ventilators" else SERVICE_MEAN_MIN[s]
+                          for s in severities])
+        return severities, mix, means
+
+    def _surge_counts(self, pool: str, severity: str, scenario: Scenario, rng, reps: int) -> np.ndarray:
+        """Surge patients of one severity reaching this pool, per replication"""
+        count = dict(scenario.surge).get(severity, 0)
+        if pool == "ventilators":
+            return rng.binomial(count, VENTILATED_SHARE, reps)
+        if pool == "icu_beds":
+            return count - rng.binomial(count, VENTILATED_SHARE, reps)
+        return np.full(reps, count)
+
+    def _replications(self, pool: str, servers: int, tag_class: int, scenario: Scenario,
+                      reps: int, rng: np.random.Generator):
+        """Initial server state, per-class arrivals / services and tagged position for one pool size"""
+        severities, mix, means = self._pool_classes(pool)
+        mean_service = float(mix @ means)
+        rate = self.utilization * servers / mean_service
+        a = scenario.arrival_min
+
+        # Busy servers free up after part of a service time
+        u = rng.random((reps, servers), dtype=np.float32)
+        busy = u < self.utilization
+        # Given busy, u / utilization is again uniform: the elapsed share of the service
+        free = np.where(busy, (1 - u / self.utilization) * lognormal(rng, mean_service, SERVICE_CV, (reps, servers)), 0)
+
+        arrivals, services, tag_pos = [], [], None
+        for k, severity in enumerate(severities):
+            # Higher classes count until the tagged patient is served; the rest only before it
+            span = a + self.horizon if k < tag_class else a
+            base = rng.poisson(rate * mix[k] * span, reps)
+            surge = self._surge_counts(pool, severity, scenario, rng, reps)
+            total = base + surge
+            width = int(total.max()) + 2
+            slots = np.arange(width)
+            times = rng.random((reps, width), dtype=np.float32)
+            times *= np.where(slots < base[:, None], span, scenario.surge_window_min).astype(np.float32)
+            times[slots >= total[:, None]] = np.inf
+            # Surge patients arriving after the span do not reach the tagged patient either
+            times[times > span] = np.inf
+            times.sort(axis=1)
+            if k == tag_class:
+                tag_pos = (times < np.inf).sum(axis=1)
+                times[np.arange(reps), tag_pos] = a
+            arrivals.append(times)
+            services.append(lognormal(rng, means[k], SERVICE_CV, (reps, width)))
+        return free, arrivals, services, tag_pos
+
+    def _simulate_chunk(self, pool: str, sizes: Sequence[int], tag_class: int, scenario: Scenario,
+                        reps: int, seed: int, severity_id: int) -> np.ndarray:
+        """(len(sizes), reps) tagged waits; every pool size has its own random stream"""
+        batches = []
+        for servers in sizes:
+            rng = np.random.default_rng([seed, list(POOL_CLASSES).index(pool), severity_id, int(servers)])
+            batches.append(self._replications(pool, max(int(servers), 1), tag_class, scenario, reps, rng))
+            if servers <= 0:
+                # No such beds: nothing frees up within the horizon
+                batches[-1][0][:] = np.inf
+
+        # Stack the pool sizes into one batch, padding servers and arrivals with inf
+        def stack(arrays, fill):
+            out = np.full((len(arrays) * reps, max(a.shape[1] for a in arrays)), fill, dtype=np.float32)
+            for i, a in enumerate(arrays):
+                out[i * reps:(i + 1) * reps, :a.shape[1]] = a
+            return out
+
+        free = stack([b[0] for b in batches], np.inf)
+        arrivals = [stack([b[1][k] for b in batches], np.inf) for k in range(len(batches[0][1]))]
+        services = [stack([b[2][k] for b in batches], 0) for k in range(len(batches[0][2]))]
+        tag_pos = np.concatenate([b[3] for b in batches])
+        waits = run_queue(free, arrivals, services, tag_class, tag_pos, scenario.arrival_min, self.horizon)
+        return waits.reshape(len(sizes), reps)
+
+    def _pool_waits(self, pool: str, sizes: np.ndarray, severity: str, scenario: Scenario,
+                    reps: int, seed: int) -> Dict[int, np.ndarray]:
+        """Tagged waits per distinct pool size, chunks run in parallel"""
+        severities, mix, means = self._pool_classes(pool)
+        tag_class = severities.index(severity)
+        sizes = np.unique(sizes)
+
+        # Chunks of similar sizes (little padding) within the cell budget, at least one per job
+        n_jobs = max(1, min(effective_n_jobs(self.n_jobs), len(sizes)))
+        arrivals = self.utilization * sizes / float(mix @ means) * (scenario.arrival_min + self.horizon)
+        per_size = reps * (sizes + arrivals + 2)
+        budget = min(CHUNK_CELLS, per_size.sum() / n_jobs + 1)
+        chunks, current, cells = [], [], 0.0
+        for size, cost in zip(sizes, per_size):
+            if current and cells + cost > budget:
+                chunks.append(current)
+                current, cells = [], 0.0
+            current.append(int(size))
+            cells += cost
+        chunks.append(current)
+
+        args = (tag_class, scenario, reps, seed, SEVERITY_LEVELS.index(severity))
+        if n_jobs <= 1 or len(chunks) == 1:
+            results = [self._simulate_chunk(pool, chunk, *args) for chunk in chunks]
+        else:
+            results = Parallel(n_jobs=n_jobs, prefer="threads")(
+                delayed(self._simulate_chunk)(pool, chunk, *args) for chunk in chunks
+            )
+        return {size: waits for chunk, block in zip(chunks, results) for size, waits in zip(chunk, block)}
+
+    # -- waits ------------------------------------------------------------
+
+    def wait_samples(self, capacity: Dict[str, np.ndarray], severity: str, scenario: Scenario = BASELINE_SCENARIO,
+                     reps: int = DEFAULT_REPLICATIONS, seed: Optional[int] = None) -> np.ndarray:
+        """(rows, reps) simulated waits (minutes) of a patient of this severity at each row's pools"""
+        seed = self.seed if seed is None else seed
+        if severity not in SEVERITY_LEVELS:
+            raise ValueError(f"Unknown severity '{severity}'")
+        if severity != "severe":
+            sizes = np.asarray(capacity["general_beds"], dtype=int)
+            by_size = self._pool_waits("general_beds", sizes, severity, scenario, reps, seed)
+            return np.stack([by_size[s] for s in sizes]) if len(sizes) else np.empty((0, reps))
+
+        icu = np.asarray(capacity["icu_beds"], dtype=int)
+        vent = np.asarray(capacity["ventilators"], dtype=int)
+        if not len(icu):
+            return np.empty((0, reps))
+        icu_waits = self._pool_waits("icu_beds", icu, severity, scenario, reps, seed)
+        vent_waits = self._pool_waits("ventilators", vent, severity, scenario, reps, seed)
+        # Same ventilated / not draw per replication at every hospital (common random numbers)
+        ventilated = np.random.default_rng([seed, len(POOL_CLASSES)]).random(reps) < VENTILATED_SHARE
+        return np.stack([np.where(ventilated, vent_waits[v], icu_waits[i]) for i, v in zip(icu, vent)])
+
+    def predict(self, rows: pd.DataFrame, severity: str, scenario: Scenario = BASELINE_SCENARIO,
+                reps: int = PROVIDER_REPLICATIONS) -> np.ndarray:
+        """(3, n) mean / P50 / P90 waits of the rows, like WaitingTimeEstimator.predict"""
+        samples = self.wait_samples({pool: rows[pool].to_numpy() for pool in POOL_CLASSES}, severity, scenario, reps)
+        return sample_wait_stats(samples)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "severity_mix": {s: round(v, 3) for s, v in self.severity_mix.items()},
+            "utilization": self.utilization,
+            "horizon_min": self.horizon,
+            "service_mean_min": {**SERVICE_MEAN_MIN, "ventilated": VENTILATOR_SERVICE_MEAN_MIN},
+            "service_cv": SERVICE_CV,
+            "ventilated_share": VENTILATED_SHARE
+        }
+
+
+def sample_wait_stats(samples: np.ndarray) -> np.ndarray:
+    """(3, rows) mean / P50 / P90 over the replication axis of (rows, reps) waits"""
+    stats = np.empty((len(WAIT_STATS), len(samples)))
+    stats[WAIT_MEAN] = samples.mean(axis=1)
+    stats[[WAIT_P50, WAIT_P90]] = np.quantile(samples, WAIT_QUANTILES, axis=1)
+    return stats
@@ -0,0 +1,97 @@
+# forest_quantiles.py
+"""
+Waiting time estimates with uncertainty for the hospital recommender
+For random-forest models the per-tree predictions are read from one apply() pass and
+flattened leaf-value tables, giving the mean (the model's own prediction) plus P50/P90
+at the cost of a single model call.
+"""
+
+from typing import Any
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+# Rows of the array returned by WaitingTimeEstimator.predict
+WAIT_MEAN, WAIT_P50, WAIT_P90 = 0, 1, 2
+WAIT_STATS = ("mean", "p50", "p90")
+WAIT_QUANTILES = (0.5, 0.9)
+
+# Bagged tree ensembles whose per-tree predictions give the spread
+FOREST_TYPES = (RandomForestRegressor, ExtraTreesRegressor)
+
+
+class WaitingTimeEstimator:
+    """
+    Wraps the trained pipeline; predict(X) returns a (3, n) array of mean / P50 / P90
+
+    Models that are not forests have no per-tree spread, so their P50 and P90 equal the
+    point estimate.
+    """
+
+    def __init__(self, model: Any):
+        self.model = model
+        steps = getattr(model, "steps", None)
+        regressor = steps[-1][1] if steps else model
+        self.preprocess = model[:-1] if steps and len(steps) > 1 else None
+
+        self.forest = regressor if isinstance(regressor, FOREST_TYPES) else None
+        if self.forest is not None:
+            # One flat table of leaf values; tree t's node i lives at offsets[t] + i
+            tables = [tree.tree_.value[:, 0, 0] for tree in self.forest.estimators_]
+            sizes = np.array([len(t) for t in tables])
+            self.leaf_values = np.concatenate(tables)
+            self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+            # Linear interpolation between order statistics (np.percentile's default)
+            n_trees = len(tables)
+            pos = np.array(WAIT_QUANTILES) * (n_trees - 1)
+            self.q_lo = np.floor(pos).astype(int)
+            self.q_hi = np.minimum(self.q_lo + 1, n_trees - 1)
+            self.q_frac = pos - self.q_lo
+
+    @property
+    def has_quantiles(self) -> bool:
+        return self.forest is not None
+
+    def predict(self, X) -> np.ndarray:
+        if self.forest is None:
+            point = np.asarray(self.model.predict(X), dtype=float)
+            return np.vstack([point, point, point])
+
+        Xt = self.preprocess.transform(X) if self.preprocess is not None else X
+        leaves = self.apply(np.asarray(Xt, dtype=np.float32))
+        per_tree = self.leaf_values[leaves + self.offsets[:, None]]
+
+        stats = np.empty((3, per_tree.shape[1]))
+        stats[WAIT_MEAN] = per_tree.mean(axis=0)
+        # A full sort is vectorized and beats partitioning at several kth values
+        ordered = np.sort(per_tree, axis=0)
+        stats[[WAIT_P50, WAIT_P90]] = (
+            ordered[self.q_lo] * (1 - self.q_frac)[:, None] + ordered[self.q_hi] * self.q_frac[:, None]
+        )
+        return stats
+
+    def apply(self, X32: np.ndarray) -> np.ndarray:
+        """
+        Leaf index per tree x row, written straight into one (n_trees, n) array
+
+        Skips the input validation and result stacking of forest.apply(); trees are split
+        across the forest's n_jobs threads.
+        """
+        trees = self.forest.estimators_
+        leaves = np.empty((len(trees), len(X32)), dtype=np.intp)
+
+        def run(start, stop):
+            for t in range(start, stop):
+                leaves[t] = trees[t].tree_.apply(X32)
+
+        n_jobs = min(effective_n_jobs(self.forest.n_jobs), len(trees))
+        if n_jobs <= 1:
+            run(0, len(trees))
+        else:
+            bounds = np.linspace(0, len(trees), n_jobs + 1).astype(int)
+            Parallel(n_jobs=n_jobs, prefer="threads")(
+                delayed(run)(bounds[i], bounds[i + 1]) for i in range(n_jobs)
+            )
+        return leaves
@@ -0,0 +1,180 @@
+# model_registry.py
+"""
+Versioned model registry with hot reload for the hospital recommender
+Watches the model artifacts, loads and validates new versions in the background and swaps
+them in atomically. Requests keep the version they started with until they finish.
+Each service deploys on its own, so this module is copied in AQI Surge/ (only the log
+prefixes differ); keep the two copies in step.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class ModelVersion:
+    """One loaded, validated set of model artifacts"""
+
+    __slots__ = ("version", "payload", "fingerprint", "loaded_at", "canary")
+
+    def __init__(self, version: int, payload: Any, fingerprint: Tuple, canary: Dict[str, Any]):
+        self.version = version
+        self.payload = payload
+        self.fingerprint = fingerprint
+        self.loaded_at = datetime.utcnow().isoformat() + "Z"
+        self.canary = canary
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "artifacts": [
+                {"path": path, "mtime": mtime, "size": size}
+                for path, mtime, size in self.fingerprint
+            ],
+            "canary": self.canary,
+        }
+
+
+class ModelRegistry:
+    """
+    Keeps the active model version plus a short history for rollback
+
+    loader() returns the payload for the artifacts currently on disk.
+    validator(payload) runs the canary prediction set (which also warms the model) and
+    returns a summary dict; it raises if the new version must not go live.
+    listeners are called with each newly activated version.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        loader: Callable[[], Any],
+        validator: Callable[[Any], Dict[str, Any]],
+        listeners: Optional[List[Callable[[ModelVersion], None]]] = None,
+        history: int = 3,
+    ):
+        self.paths = paths
+        self.loader = loader
+        self.validator = validator
+        self.listeners = listeners or []
+        self._versions = deque(maxlen=history)
+        self._active = None
+        self._loaded_fingerprint = None
+        self._next_version = 1
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.last_error = None
+
+    @property
+    def active(self) -> Optional[ModelVersion]:
+        """Current version; grab it once per request and use it throughout"""
+        return self._active
+
+    def versions(self) -> List[Dict[str, Any]]:
+        return [v.describe() for v in self._versions]
+
+    def fingerprint(self) -> Tuple:
+        """Identity of the artifacts on disk"""
+        result = []
+        for path in self.paths:
+            stat = os.stat(path)
+            result.append((os.path.abspath(path), stat.st_mtime, stat.st_size))
+        return tuple(result)
+
+    # ============================================
+    # LOAD / SWAP
+    # ============================================
+
+    def load(self) -> ModelVersion:
+        """Load, warm and validate the artifacts on disk, then make them active"""
+        with self._lock:
+            fingerprint = self.fingerprint()
+            payload = self.loader()
+            canary = self.validator(payload)
+            self._loaded_fingerprint = fingerprint
+
+            version = ModelVersion(self._next_version, payload, fingerprint, canary)
+            self._next_version += 1
+            self._versions.append(version)
+            self._activate(version)
+            return version
+
+    def rollback(self, version: Optional[int] = None) -> ModelVersion:
+        """Re-activate a retained version (default: the one before the active version)"""
+        with self._lock:
+            if version is None:
+                older = [v for v in self._versions if self._active and v.version < self._active.version]
+                if not older:
+                    raise LookupError("No previous version to roll back to")
+                target = older[-1]
+            else:
+                matches = [v for v in self._versions if v.version == version]
+                if not matches:
+                    raise LookupError(f"Version {version} is not retained")
+                target = matches[0]
+
+            self._activate(target)
+            return target
+
+    def _activate(self, version: ModelVersion):
+        self._active = version
+        for listener in self.listeners:
+            listener(version)
+
+    # ============================================
+    # WATCHER
+    # ============================================
+
+    def start_watching(self, interval: float = 10.0):
+        """Poll the artifacts and hot-load new versions in a background thread"""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._stop.clear()
+
+    def _watch(self, interval: float):
+        pending = None
+        failed = None
+        while not self._stop.wait(interval):
+            try:
+                fingerprint = self.fingerprint()
+            except OSError:
+                # Artifact being replaced; try again next tick
+                continue
+
+            # Compare with the last artifacts loaded, not the active version, so a
+            # rollback is not undone by re-loading the same files
+            if fingerprint == self._loaded_fingerprint:
+                pending = None
+                continue
+            if fingerprint == failed:
+                continue
+            if fingerprint != pending:
+                # Wait one more tick so half-written files settle
+                pending = fingerprint
+                continue
+
+            try:
+                print("[INFO] New model artifacts detected, loading in background...")
+                started = time.perf_counter()
+                version = self.load()
+                print(f"[SUCCESS] Model version {version.version} active "
+                      f"(loaded in {time.perf_counter() - started:.2f}s)")
+                self.last_error = None
+            except Exception as e:
+                failed = fingerprint
+                self.last_error = str(e)
+                print(f"[ERROR] Rejected new model artifacts: {str(e)}")
+            pending = None
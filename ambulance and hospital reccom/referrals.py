@@ -0,0 +1,87 @@
+# referrals.py
+"""
+Recent-referral ledger for the hospital recommender
+Counts the referrals the service has just made to each hospital, decaying them over
+time, so scoring can spread simultaneous incidents across facilities.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# A referral counts half as much after this many minutes
+REFERRAL_HALF_LIFE_MIN = 30.0
+
+# Loads below this are reported as zero
+MIN_TRACKED_LOAD = 0.01
+
+
+class ReferralLedger:
+    """
+    Time-decayed referral count per hospital
+
+    Loads are stored as (value, timestamp) pairs and decayed lazily when read. Writers
+    swap in new arrays under a lock; readers take the current pair without locking.
+    """
+
+    def __init__(
+        self,
+        row_names: np.ndarray,
+        half_life_min: float = REFERRAL_HALF_LIFE_MIN,
+        previous: Optional["ReferralLedger"] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        names, row_ids = np.unique(np.asarray(row_names), return_inverse=True)
+        self.names = names
+        self.row_ids = row_ids
+        self._ids = {name: i for i, name in enumerate(names)}
+        self.half_life_s = half_life_min * 60.0
+        self.clock = clock
+        self._lock = threading.Lock()
+
+        values = np.zeros(len(names))
+        stamps = np.full(len(names), clock())
+        if previous is not None:
+            # Carry loads over to a new hospital table by name
+            for name, load in previous.loads_by_name().items():
+                if name in self._ids:
+                    values[self._ids[name]] = load
+        self._state = (values, stamps)
+
+    def _decayed(self, state, now: float) -> np.ndarray:
+        values, stamps = state
+        return values * np.exp2(-(now - stamps) / self.half_life_s)
+
+    def record(self, hospital_name: str, count: float = 1.0) -> float:
+        """Add referrals to a hospital; returns its new load. KeyError if unknown."""
+        i = self._ids[hospital_name]
+        with self._lock:
+            now = self.clock()
+            values, stamps = self._state
+            values, stamps = values.copy(), stamps.copy()
+            values[i] = values[i] * np.exp2(-(now - stamps[i]) / self.half_life_s) + count
+            stamps[i] = now
+            self._state = (values, stamps)
+            return float(values[i])
+
+    def row_loads(self, positions: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        """Current load for hospital rows at positions"""
+        values, stamps = self._state
+        if not values.any():
+            return np.zeros(len(positions))
+
+        ids = self.row_ids[positions]
+        now = self.clock() if now is None else now
+        loads = values[ids] * np.exp2(-(now - stamps[ids]) / self.half_life_s)
+        loads[loads < MIN_TRACKED_LOAD] = 0.0
+        return loads
+
+    def loads_by_name(self) -> Dict[str, float]:
+        """Hospitals with a non-negligible load"""
+        loads = self._decayed(self._state, self.clock())
+        return {
+            str(self.names[i]): round(float(loads[i]), 3)
+            for i in np.flatnonzero(loads >= MIN_TRACKED_LOAD)
+        }
@@ -0,0 +1,239 @@
+# symptom_resolver.py
+"""
+Symptom normalization for the hospital recommender
+Maps free-text symptoms ("chest pains", "breathless", "siezure") onto the symptoms the
+model was trained on, using the metadata maps, a synonym file and a trigram index with
+bounded edit distance.
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+# Matches scoring below this are treated as unknown symptoms
+MIN_CONFIDENCE = 0.6
+
+# Confidence multiplier for a symptom found inside a longer phrase
+PHRASE_FACTOR = 0.9
+
+# Longest token window tried inside free text, and tokens looked at per request
+MAX_WINDOW_TOKENS = 3
+MAX_TEXT_TOKENS = 16
+
+# Resolved free-text strings kept per resolver
+RESOLVE_CACHE_SIZE = 4096
+
+Resolution = namedtuple("Resolution", ["symptom", "confidence", "method", "matched"])
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def split_text(text: str) -> List[str]:
+    """Lowercase tokens with punctuation dropped"""
+    return _NON_WORD.sub(" ", str(text).lower()).split()
+
+
+def stem(token: str) -> str:
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and plural 's' so variants share one key"""
+    return " ".join(stem(t) for t in split_text(text))
+
+
+def trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Edit distance with adjacent transpositions, or limit + 1 once it must exceed limit
+
+    Only the diagonal band of width 2 * limit + 1 is filled, so the cost is
+    O(len * limit) rather than O(len^2).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+
+    over = limit + 1
+    n = len(b)
+    prev2 = None
+    prev = [j if j <= limit else over for j in range(n + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - limit)
+        hi = min(n, i + limit)
+        cur = [over] * (n + 1)
+        cur[0] = i if i <= limit else over
+        row_min = cur[0]
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            d = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < d:
+                d = prev[j] + 1
+            if cur[j - 1] + 1 < d:
+                d = cur[j - 1] + 1
+            if prev2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1] \
+                    and prev2[j - 2] + 1 < d:
+                d = prev2[j - 2] + 1
+            cur[j] = d if d < over else over
+            if d < row_min:
+                row_min = d
+        if row_min > limit:
+            return over
+        prev2, prev = prev, cur
+    return prev[n]
+
+
+def edit_limit(key: str) -> int:
+    """Edits tolerated for a key of this length (none under 5 characters, at most 3)"""
+    return min(3, len(key) // 5)
+
+
+def load_synonyms(path: str) -> Dict[str, List[str]]:
+    """Synonym file: {"canonical symptom": ["alias", ...]}; empty if missing"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SymptomResolver:
+    """
+    Resolves free text to a known symptom with a confidence score
+
+    Lookup order: exact symptom or synonym (1.0), a known symptom inside a longer
+    phrase, then the closest key by edit distance among keys sharing enough trigrams.
+    Fuzzy matching tries the query with and without plural stripping, so a misspelt
+    "...ss" word ("dizzines") is not pushed out of its edit budget by the stemmer.
+    resolve() is memoized per resolver, so repeated strings cost one dict lookup.
+    """
+
+    def __init__(
+        self,
+        symptoms: Iterable[str],
+        synonyms: Optional[Dict[str, List[str]]] = None,
+        cache_size: int = RESOLVE_CACHE_SIZE,
+    ):
+        self.symptoms = sorted(set(symptoms))
+        known = set(self.symptoms)
+
+        # Normalized key -> (canonical symptom, is synonym)
+        self.keys = {}
+        for symptom in self.symptoms:
+            self.keys[normalize_text(symptom)] = (symptom, False)
+        for symptom, aliases in (synonyms or {}).items():
+            if symptom not in known:
+                continue
+            for alias in aliases:
+                self.keys.setdefault(normalize_text(alias), (symptom, True))
+
+        self.key_list = list(self.keys)
+        self.key_grams = [len(trigrams(key)) for key in self.key_list]
+        self.key_limits = [edit_limit(key) for key in self.key_list]
+        self.max_key_len = max((len(key) for key in self.key_list), default=0)
+        self.index = {}
+        for key_id, key in enumerate(self.key_list):
+            for gram in set(trigrams(key)):
+                self.index.setdefault(gram, []).append(key_id)
+
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, text: str) -> Optional[Resolution]:
+        raw_tokens = split_text(text)
+        tokens = [stem(t) for t in raw_tokens]
+        query = " ".join(tokens)
+        if not query:
+            return None
+
+        hit = self.keys.get(query)
+        if hit is not None:
+            return Resolution(hit[0], 1.0, "synonym" if hit[1] else "exact", query)
+
+        best = self._fuzzy_either(query, " ".join(raw_tokens))
+        tokens = tokens[:MAX_TEXT_TOKENS]
+        raw_tokens = raw_tokens[:MAX_TEXT_TOKENS]
+        if len(tokens) > 1 and (best is None or best.confidence < PHRASE_FACTOR):
+            best = self._search_phrase(tokens, raw_tokens, best)
+
+        if best is None or best.confidence < MIN_CONFIDENCE:
+            return None
+        return best
+
+    def _search_phrase(
+        self, tokens: List[str], raw_tokens: List[str], best: Optional[Resolution]
+    ) -> Optional[Resolution]:
+        """A known symptom (or close misspelling) inside a longer phrase, longest first"""
+        spans = [
+            (start, start + size)
+            for size in range(min(MAX_WINDOW_TOKENS, len(tokens) - 1), 0, -1)
+            for start in range(len(tokens) - size + 1)
+        ]
+        windows = [" ".join(tokens[lo:hi]) for lo, hi in spans]
+        for window in windows:
+            hit = self.keys.get(window)
+            if hit is not None:
+                # Nothing found inside the phrase can score higher
+                return Resolution(hit[0], PHRASE_FACTOR, "phrase", window)
+        for window, (lo, hi) in zip(windows, spans):
+            match = self._fuzzy_either(window, " ".join(raw_tokens[lo:hi]), PHRASE_FACTOR)
+            if match is not None and (best is None or match.confidence > best.confidence):
+                best = match
+        return best
+
+    def _fuzzy_either(self, query: str, raw: str, factor: float = 1.0) -> Optional[Resolution]:
+        """Better fuzzy match of the stemmed query and, when it differs, the unstemmed one"""
+        best = self._fuzzy(query, factor)
+        if raw != query:
+            match = self._fuzzy(raw, factor)
+            if match is not None and (best is None or match.confidence > best.confidence):
+                best = match
+        return best
+
+    def _fuzzy(self, query: str, factor: float = 1.0) -> Optional[Resolution]:
+        """Closest key within its edit budget, pre-filtered by shared trigrams"""
+        if len(query) > self.max_key_len + 3:
+            return None
+        shared = {}
+        for gram in set(trigrams(query)):
+            for key_id in self.index.get(gram, ()):
+                shared[key_id] = shared.get(key_id, 0) + 1
+
+        best = None
+        best_distance = None
+        for key_id, count in shared.items():
+            key = self.key_list[key_id]
+            limit = self.key_limits[key_id]
+            if limit == 0 or abs(len(query) - len(key)) > limit:
+                continue
+            # Each edit breaks at most 4 of the key's trigrams (a transposition spans 4)
+            if count < self.key_grams[key_id] - 4 * limit:
+                continue
+            distance = bounded_edit_distance(query, key, limit)
+            if distance > limit:
+                continue
+            if best_distance is None or distance < best_distance or (
+                    distance == best_distance and len(key) > len(best)):
+                best, best_distance = key, distance
+
+        if best is None:
+            return None
+        confidence = factor * (1.0 - best_distance / max(len(query), len(best)))
+        return Resolution(self.keys[best][0], round(confidence, 3), "fuzzy", best)
+
+    def stats(self) -> Dict:
+        info = self.resolve.cache_info()
+        return {
+            "symptoms": len(self.symptoms),
+            "keys": len(self.keys),
+            "trigrams": len(self.index),
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_size": info.currsize,
+        }
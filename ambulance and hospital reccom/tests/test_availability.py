@@ -0,0 +1,140 @@
+# test_availability.py
+"""
+Incremental availability snapshots against a store rebuilt from the updated table
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from availability import CAPACITY_COLUMNS, AvailabilityStore
+
+DERIVED = ["capacity_score", "icu_ratio"]
+KEYS = [("chest pain", 1.0), ("fever", 0.5)]
+
+
+def hospital_table(seed=5, records=40, hospitals=15):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "hospital_name": [f"H{i % hospitals:02d}" for i in range(records)],
+        "speciality": rng.choice(["Cardiology", "General", "Neurology"], records),
+        "general_beds": rng.integers(0, 80, records),
+        "icu_beds": rng.integers(0, 12, records),
+        "ventilators": rng.integers(0, 6, records),
+    })
+
+
+def engineer(rows):
+    return rows.assign(
+        capacity_score=rows["general_beds"] + 2 * rows["icu_beds"] + 3 * rows["ventilators"],
+        icu_ratio=rows["icu_beds"] / (rows["general_beds"] + 1),
+    )
+
+
+def predict(rows, key):
+    """(3, n) mean / P50 / P90, like the waiting time estimator"""
+    base = 60 - key[1] * rows["capacity_score"].to_numpy(dtype=float) / 10
+    return np.stack([base, base * 0.9, base * 1.4])
+
+
+def make_store(df, listeners=None):
+    store = AvailabilityStore(df, engineer_fn=engineer, predict_fn=predict,
+                              derived_columns=DERIVED, listeners=listeners)
+    store.predicted_waits(store.snapshot, KEYS)
+    return store
+
+
+def random_updates(rng, hospitals):
+    updates = []
+    for name in rng.choice(hospitals, int(rng.integers(1, 4)), replace=False):
+        update = {"hospital_name": str(name), "mode": str(rng.choice(["set", "delta"]))}
+        for col in rng.choice(CAPACITY_COLUMNS, int(rng.integers(1, 4)), replace=False):
+            update[str(col)] = int(rng.integers(0, 20)) if update["mode"] == "set" else int(rng.integers(-15, 15))
+        updates.append(update)
+    return updates
+
+
+def test_updates_match_rebuilt_store():
+    rng = np.random.default_rng(9)
+    df = hospital_table()
+    store = make_store(df)
+    hospitals = df["hospital_name"].unique()
+
+    for step in range(25):
+        store.apply_updates(random_updates(rng, hospitals))
+        snapshot = store.snapshot
+        assert snapshot.version == step + 1
+
+        rebuilt = make_store(snapshot.df[df.columns])
+        expected = rebuilt.snapshot
+        pd.testing.assert_frame_equal(snapshot.df, expected.df, check_dtype=False)
+        for col in CAPACITY_COLUMNS + DERIVED:
+            np.testing.assert_array_equal(snapshot.columns[col], expected.columns[col])
+        for key in KEYS:
+            np.testing.assert_allclose(snapshot.predictions[key], expected.predictions[key])
+        assert (snapshot.df[CAPACITY_COLUMNS] >= 0).all().all()
+
+
+def test_only_touched_rows_are_marked_changed():
+    store = make_store(hospital_table())
+    rows = store.snapshot.name_index["H03"]
+    store.apply_updates([{"hospital_name": "H03", "icu_beds": 4}])
+    store.apply_updates([{"hospital_name": "H07", "mode": "delta", "ventilators": 1}])
+
+    np.testing.assert_array_equal(
+        store.snapshot.rows_changed_since(0),
+        np.union1d(rows, store.snapshot.name_index["H07"])
+    )
+    np.testing.assert_array_equal(store.snapshot.rows_changed_since(1), store.snapshot.name_index["H07"])
+    assert (store.snapshot.columns["icu_beds"][rows] == 4).all()
+
+
+def test_old_snapshot_is_unchanged():
+    store = make_store(hospital_table())
+    old = store.snapshot
+    icu_before = old.columns["icu_beds"].copy()
+    waits_before = old.predictions[KEYS[0]].copy()
+
+    store.apply_updates([{"hospital_name": name, "icu_beds": 0} for name in old.name_index])
+    np.testing.assert_array_equal(old.columns["icu_beds"], icu_before)
+    np.testing.assert_array_equal(old.predictions[KEYS[0]], waits_before)
+    assert not old.predictions[KEYS[0]].flags.writeable
+
+
+@pytest.mark.parametrize("updates, error", [
+    ([{"hospital_name": "H01", "icu_beds": 3}, {"hospital_name": "Nowhere", "icu_beds": 1}], KeyError),
+    ([{"hospital_name": "H01", "icu_beds": -1}], ValueError),
+    ([{"hospital_name": "H01", "beds": 1}], ValueError),
+])
+def test_failed_batch_swaps_nothing(updates, error):
+    seen = []
+    store = make_store(hospital_table(), listeners=[seen.append])
+    before = store.snapshot
+    with pytest.raises(error):
+        store.apply_updates(updates)
+    assert store.snapshot is before
+    assert len(seen) == 1
+
+
+
+def test_deferred_keys_catch_up_outside_updates():
+    df = hospital_table()
+    store = AvailabilityStore(df, engineer_fn=engineer, predict_fn=predict, derived_columns=DERIVED,
+                              deferred_fn=lambda key: key[0] == "slow")
+    slow, fast = ("slow", 0.8), KEYS[0]
+    store.predicted_waits(store.snapshot, [fast])
+    stale = store.snapshot
+    computed = predict(stale.df, slow)
+
+    # Computed off the request path while an update lands
+    store.apply_updates([{"hospital_name": "H04", "icu_beds": 9}])
+    store.cache_prediction(stale, slow, computed)
+    store.apply_updates([{"hospital_name": "H09", "mode": "delta", "general_beds": 7}])
+    current = store.snapshot
+    np.testing.assert_allclose(current.predictions[fast], predict(current.df, fast))
+    np.testing.assert_array_equal(current.predictions[slow], computed)
+    assert store.stale_keys() == [slow]
+
+    store.refresh_deferred(slow)
+    np.testing.assert_allclose(store.snapshot.predictions[slow], predict(current.df, slow))
+    assert store.stale_keys() == []
@@ -0,0 +1,45 @@
+# test_model_tiers.py
+"""
+Default model tier per emergency level against the tiers' holdout metrics
+"""
+
+import os
+
+import pytest
+
+os.environ.setdefault("MODEL_LOAD_ON_IMPORT", "0")
+
+from app import FULL_TIER, select_model_tier
+
+
+def bundle(**coverage):
+    """Tiers fastest first, as the metadata lists them"""
+    return {"tiers": {
+        name: {"info": {"p90_coverage": value, "mae": 30.0, "latency_ms": ms}}
+        for (name, value), ms in zip(coverage.items(), [10.0, 17.0, 57.0])
+    }}
+
+
+SHIPPED = bundle(fast=0.645, balanced=0.765, full=0.8475)
+
+
+def test_critical_default_needs_p90_coverage():
+    assert select_model_tier(SHIPPED, "critical") == FULL_TIER
+    # The fastest tier that covers enough answers
+    assert select_model_tier(bundle(fast=0.7, balanced=0.82, full=0.85), "critical") == "balanced"
+    assert select_model_tier(bundle(fast=0.83, balanced=0.84, full=0.85), "critical") == "fast"
+
+
+@pytest.mark.parametrize("level, tier", [("moderate", "balanced"), ("mild", FULL_TIER)])
+def test_other_levels_keep_their_default(level, tier):
+    assert select_model_tier(SHIPPED, level) == tier
+
+
+def test_request_overrides_coverage():
+    assert select_model_tier(SHIPPED, "critical", model_tier="fast") == "fast"
+    assert select_model_tier(SHIPPED, "critical", latency_budget_ms=12) == "fast"
+
+
+def test_tiers_without_metrics_fall_back_to_full():
+    tiers = {"tiers": {"fast": {"info": {}}, FULL_TIER: {"info": {}}}}
+    assert select_model_tier(tiers, "critical") == FULL_TIER
@@ -0,0 +1,27 @@
+# test_travel_time.py
+"""
+Road graph parsing from OSM XML
+"""
+
+from travel_time import RoadNetwork
+
+OSM = """<?xml version="1.0"?>
+<osm>
+  <node id="1" lat="19.00" lon="72.80"><tag k="highway" v="traffic_signals"/></node>
+  <node id="2" lat="19.01" lon="72.80"><tag k="highway" v="motorway"/><tag k="oneway" v="yes"/></node>
+  <node id="3" lat="19.02" lon="72.80"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/></way>
+  <way id="11"><nd ref="1"/><nd ref="3"/><tag k="highway" v="residential"/></way>
+</osm>
+"""
+
+
+def test_node_tags_do_not_leak_into_ways(tmp_path):
+    path = tmp_path / "roads.osm"
+    path.write_text(OSM)
+    network = RoadNetwork.from_osm(str(path))
+
+    # Only the tagged residential way is drivable, in both directions; node 2 is on no road
+    assert len(network.lat) == 2
+    assert network.graph.nnz == 2
+    assert network.graph[0, 1] == network.graph[1, 0] > 0
@@ -0,0 +1,273 @@
+# tiles.py
+"""
+Precomputed recommendation tiles for the hospital recommender
+The service area is cut into the travel engine's origin grid cells. For every
+cell x speciality x emergency level the index keeps a short list of candidate rows,
+so an online request only re-scores a few dozen hospitals with its exact coordinates.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SEVERITIES = ["mild", "moderate", "severe"]
+
+# Candidates kept per symptom/severity in each tile; larger top_k uses the full path
+TILE_SHORTLIST = 20
+
+# Margin around the hospitals' bounding box covered by tiles (degrees)
+TILE_PADDING_DEG = 0.02
+
+# Grid cells processed per batch while building (bounds the travel matrix size)
+TILE_CHUNK_CELLS = 32
+
+
+class Tile:
+    """Short list for one cell x speciality x emergency level"""
+
+    __slots__ = ("rows", "road_min", "travel_lo", "travel_hi", "origin_lat", "origin_lng")
+
+    def __init__(self, rows, road_min, travel_lo, travel_hi, origin_lat, origin_lng):
+        self.rows = rows
+        self.road_min = road_min
+        self.travel_lo = travel_lo
+        self.travel_hi = travel_hi
+        self.origin_lat = origin_lat
+        self.origin_lng = origin_lng
+
+
+class TileIndex:
+    """
+    Compact tile index: CSR-style row lists plus per-tile travel bounds
+
+    Tile id = (speciality * n_levels + level) * n_cells + cell. In road mode the index also
+    stores the road minutes from each cell's origin node to its short-listed rows and the
+    travel-time range over every row of the speciality, so online scoring matches the
+    full path exactly once the caller adds the access leg to the origin node, as long as
+    the waiting times are those of availability_version. After a capacity update the short
+    lists of the affected specialities may miss a row; callers skip those tiles.
+    """
+
+    def __init__(self, info: Dict, arrays: Dict[str, np.ndarray]):
+        self.info = info
+        self.fingerprint = info["fingerprint"]
+        self.cell_size = info["cell_size"]
+        self.cell_lat0 = info["cell_lat0"]
+        self.cell_lng0 = info["cell_lng0"]
+        self.n_lat = info["n_lat"]
+        self.n_lng = info["n_lng"]
+        self.shortlist = info["shortlist"]
+        self.road_mode = info["road_mode"]
+        self.availability_version = info["availability_version"]
+        self.symptoms = set(info["symptoms"])
+        self.speciality_ids = {s: i for i, s in enumerate(info["specialities"])}
+        self.level_ids = {l: i for i, l in enumerate(info["levels"])}
+
+        self.indptr = arrays["indptr"]
+        self.rows = arrays["rows"]
+        self.road_min = arrays["road_min"]
+        self.travel_lo = arrays["travel_lo"]
+        self.travel_hi = arrays["travel_hi"]
+        self.origin_lat = arrays["origin_lat"]
+        self.origin_lng = arrays["origin_lng"]
+
+    @property
+    def n_cells(self) -> int:
+        return self.n_lat * self.n_lng
+
+    def lookup(self, lat: float, lng: float, speciality: str, level: str) -> Optional[Tile]:
+        """Tile covering a point, or None outside the grid / for unknown keys"""
+        s = self.speciality_ids.get(speciality)
+        l = self.level_ids.get(level)
+        if s is None or l is None:
+            return None
+
+        i = int(np.floor(lat / self.cell_size)) - self.cell_lat0
+        j = int(np.floor(lng / self.cell_size)) - self.cell_lng0
+        if not (0 <= i < self.n_lat and 0 <= j < self.n_lng):
+            return None
+
+        cell = i * self.n_lng + j
+        tile = (s * len(self.level_ids) + l) * self.n_cells + cell
+        start, end = self.indptr[tile], self.indptr[tile + 1]
+        if self.road_mode:
+            return Tile(self.rows[start:end], self.road_min[start:end],
+                        self.travel_lo[tile], self.travel_hi[tile],
+                        self.origin_lat[cell], self.origin_lng[cell])
+        return Tile(self.rows[start:end], None, None, None, None, None)
+
+    def describe(self) -> Dict:
+        return {
+            **{k: v for k, v in self.info.items() if k not in ("symptoms", "specialities")},
+            "cells": self.n_cells,
+            "tiles": len(self.indptr) - 1,
+            "candidates": len(self.rows),
+            "specialities": len(self.speciality_ids),
+            "symptoms": len(self.symptoms),
+        }
+
+    # ============================================
+    # ON-DISK FORMAT
+    # ============================================
+
+    def save(self, path: str):
+        """Write the index as one compressed .npz (atomic replace)"""
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            info=np.array(json.dumps(self.info)),
+            indptr=self.indptr, rows=self.rows, road_min=self.road_min,
+            travel_lo=self.travel_lo, travel_hi=self.travel_hi,
+            origin_lat=self.origin_lat, origin_lng=self.origin_lng,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TileIndex":
+        with np.load(path, allow_pickle=False) as data:
+            info = json.loads(str(data["info"]))
+            arrays = {k: data[k] for k in data.files if k != "info"}
+        return cls(info, arrays)
+
+
+# ============================================
+# BUILD
+# ============================================
+
+def normalize_rows(a: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Row-wise 0-1 normalization with the same equal-range rule as the online path"""
+    span = hi - lo
+    flat = span == 0
+    out = (a - lo[:, None]) / np.where(flat, 1.0, span)[:, None]
+    out[flat] = 0.5
+    return out
+
+
+def build_tile_index(
+    travel,
+    hospital_lat: np.ndarray,
+    hospital_lng: np.ndarray,
+    speciality_rows: Dict[str, np.ndarray],
+    symptoms_by_speciality: Dict[str, List[str]],
+    level_weights: Dict[str, Tuple[float, float]],
+    wait_fn: Callable[[str, str, str], np.ndarray],
+    fingerprint: str,
+    availability_version: int,
+    shortlist: int = TILE_SHORTLIST,
+) -> TileIndex:
+    """
+    Build the tile index over the hospitals' bounding box
+
+    travel is the TravelTimeEngine (its cell grid is reused so tiles and the travel cache
+    agree). speciality_rows gives the candidate rows per speciality, wait_fn(symptom,
+    severity, level) the waiting time every row is ranked on at that emergency level. Each
+    tile keeps the union of the top `shortlist` rows over every symptom of the speciality
+    at every severity.
+    """
+    started = time.perf_counter()
+    cell_size = travel.cell_size
+    lat_cells = np.floor((np.array([hospital_lat.min(), hospital_lat.max()]) +
+                          [-TILE_PADDING_DEG, TILE_PADDING_DEG]) / cell_size).astype(int)
+    lng_cells = np.floor((np.array([hospital_lng.min(), hospital_lng.max()]) +
+                          [-TILE_PADDING_DEG, TILE_PADDING_DEG]) / cell_size).astype(int)
+    n_lat = int(lat_cells[1] - lat_cells[0] + 1)
+    n_lng = int(lng_cells[1] - lng_cells[0] + 1)
+
+    ii, jj = np.meshgrid(np.arange(n_lat) + lat_cells[0], np.arange(n_lng) + lng_cells[0], indexing="ij")
+    cells = np.column_stack([ii.ravel(), jj.ravel()])
+
+    specialities = sorted(s for s in speciality_rows if symptoms_by_speciality.get(s))
+    levels = list(level_weights)
+
+    # Normalized waiting time per speciality and level for every symptom x severity
+    waits = {}
+    for spec in specialities:
+        rows = speciality_rows[spec]
+        for level in levels:
+            stacked = np.array([
+                np.asarray(wait_fn(symptom, severity, level), dtype=float)[rows]
+                for symptom in symptoms_by_speciality[spec]
+                for severity in SEVERITIES
+            ])
+            waits[(spec, level)] = normalize_rows(stacked, stacked.min(axis=1), stacked.max(axis=1))
+
+    # Pieces per (speciality, level), one per cell chunk, assembled in tile-id order
+    counts = {key: [] for key in ((s, l) for s in specialities for l in levels)}
+    rows_out = {key: [] for key in counts}
+    road_out = {key: [] for key in counts}
+    lo_out = {key: [] for key in counts}
+    hi_out = {key: [] for key in counts}
+    origin_lat, origin_lng = [], []
+
+    for start in range(0, len(cells), TILE_CHUNK_CELLS):
+        chunk = cells[start:start + TILE_CHUNK_CELLS]
+        o_lat, o_lng, matrix = travel.cell_travel_matrix(chunk)
+        origin_lat.append(o_lat)
+        origin_lng.append(o_lng)
+        n = len(chunk)
+
+        for spec in specialities:
+            rows = speciality_rows[spec]
+            spec_travel = matrix[:, rows]
+            lo = spec_travel.min(axis=1)
+            hi = spec_travel.max(axis=1)
+            travel_norm = normalize_rows(spec_travel, lo, hi)
+            m = min(shortlist, len(rows))
+
+            for level in levels:
+                alpha_travel, alpha_wait = level_weights[level]
+                keep = np.zeros((n, len(rows)), dtype=bool)
+                for wait_norm in waits[(spec, level)]:
+                    scores = alpha_travel * travel_norm + alpha_wait * wait_norm
+                    if m < len(rows):
+                        best = np.argpartition(scores, m - 1, axis=1)[:, :m]
+                        keep[np.arange(n)[:, None], best] = True
+                    else:
+                        keep[:] = True
+
+                cell_idx, col = np.nonzero(keep)
+                counts[(spec, level)].append(np.bincount(cell_idx, minlength=n))
+                rows_out[(spec, level)].append(rows[col])
+                road_out[(spec, level)].append(spec_travel[cell_idx, col])
+                lo_out[(spec, level)].append(lo)
+                hi_out[(spec, level)].append(hi)
+
+    order = list(counts)
+    tile_counts = np.concatenate([c for key in order for c in counts[key]])
+    indptr = np.zeros(len(tile_counts) + 1, dtype=np.int64)
+    np.cumsum(tile_counts, out=indptr[1:])
+
+    road_mode = bool(travel.road_mode)
+    empty = np.empty(0)
+    arrays = {
+        "indptr": indptr,
+        "rows": np.concatenate([r for key in order for r in rows_out[key]]).astype(np.int32),
+        "road_min": (np.concatenate([r for key in order for r in road_out[key]]).astype(np.float32)
+                     if road_mode else empty),
+        "travel_lo": np.concatenate([r for key in order for r in lo_out[key]]) if road_mode else empty,
+        "travel_hi": np.concatenate([r for key in order for r in hi_out[key]]) if road_mode else empty,
+        "origin_lat": np.concatenate(origin_lat) if road_mode else empty,
+        "origin_lng": np.concatenate(origin_lng) if road_mode else empty,
+    }
+
+    info = {
+        "fingerprint": fingerprint,
+        "cell_size": cell_size,
+        "cell_lat0": int(lat_cells[0]),
+        "cell_lng0": int(lng_cells[0]),
+        "n_lat": n_lat,
+        "n_lng": n_lng,
+        "shortlist": shortlist,
+        "road_mode": road_mode,
+        "availability_version": availability_version,
+        "specialities": specialities,
+        "levels": levels,
+        "symptoms": sorted({s for spec in specialities for s in symptoms_by_speciality[spec]}),
+        "built_at": datetime.utcnow().isoformat() + "Z",
+        "build_seconds": round(time.perf_counter() - started, 2),
+    }
+    return TileIndex(info, arrays)
@@ -0,0 +1,353 @@
+# travel_time.py
+"""
+Road-network travel times for the hospital recommender
+Loads a local OSM extract into a sparse road graph and answers one-to-many queries with a
+single Dijkstra pass from the user's origin. Results are cached per origin grid cell.
+Without a road file it falls back to straight-line distance at the hospital's traffic speed.
+"""
+
+import gzip
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+
+# Average ambulance speed by traffic level (km/h), used for the straight-line fallback
+TRAFFIC_SPEEDS_KMH = {"Low": 35.0, "Moderate": 26.0, "High": 17.0}
+DEFAULT_SPEED_KMH = TRAFFIC_SPEEDS_KMH["Moderate"]
+
+# Free-flow speed by OSM highway class (km/h); *_link roads use their parent class
+ROAD_SPEEDS_KMH = {
+    "motorway": 60.0,
+    "trunk": 50.0,
+    "primary": 40.0,
+    "secondary": 35.0,
+    "tertiary": 30.0,
+    "unclassified": 25.0,
+    "residential": 20.0,
+    "living_street": 10.0,
+    "service": 15.0,
+}
+
+# Speed for the legs between the exact coordinates and the nearest road node
+ACCESS_SPEED_KMH = 15.0
+
+# Origin grid cell size in degrees (~550 m in Mumbai) and number of cells kept
+CELL_SIZE_DEG = 0.005
+MAX_CACHED_CELLS = 2048
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Haversine distance; works on scalars and numpy arrays"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lon2) - np.radians(lon1)
+
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def traffic_speeds(traffic_levels: np.ndarray) -> np.ndarray:
+    """Average speed for each traffic level label"""
+    return np.array([TRAFFIC_SPEEDS_KMH.get(t, DEFAULT_SPEED_KMH) for t in traffic_levels])
+
+
+# ============================================
+# ROAD GRAPH
+# ============================================
+
+class RoadNetwork:
+    """Directed road graph with edge weights in free-flow minutes"""
+
+    def __init__(self, lat: np.ndarray, lng: np.ndarray, graph: csr_matrix):
+        self.lat = lat
+        self.lng = lng
+        self.graph = graph
+        self._cos_lat = np.cos(np.radians(lat.mean())) if len(lat) else 1.0
+        self._tree = cKDTree(self._project(lat, lng))
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.lat)
+
+    @property
+    def n_edges(self) -> int:
+        return self.graph.nnz
+
+    def _project(self, lat, lng) -> np.ndarray:
+        """Equirectangular projection, good enough for snapping inside one city"""
+        return np.column_stack([np.asarray(lat, dtype=float),
+                                np.asarray(lng, dtype=float) * self._cos_lat])
+
+    def snap(self, lat, lng) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest road node for each point and the distance to it in km"""
+        _, nodes = self._tree.query(self._project(np.atleast_1d(lat), np.atleast_1d(lng)))
+        snap_km = haversine_km(np.atleast_1d(lat), np.atleast_1d(lng), self.lat[nodes], self.lng[nodes])
+        return nodes, snap_km
+
+    def travel_minutes_from(self, origins) -> np.ndarray:
+        """Free-flow minutes from one node (or an array of nodes) to every node, inf where unreachable"""
+        return dijkstra(self.graph, directed=True, indices=origins)
+
+    @classmethod
+    def from_osm(cls, path: str) -> "RoadNetwork":
+        """Build the drivable road graph from an OSM XML extract (.osm or .osm.gz)"""
+        opener = gzip.open if path.endswith(".gz") else open
+
+        node_coords: Dict[str, Tuple[float, float]] = {}
+        ways = []
+        with opener(path, "rb") as f:
+            way_nodes, way_tags = [], {}
+            for _, elem in ET.iterparse(f, events=("end",)):
+                if elem.tag == "node":
+                    node_coords[elem.get("id")] = (float(elem.get("lat")), float(elem.get("lon")))
+                    # A node's own tags (traffic signals, names, ...) must not reach the next way
+                    way_nodes, way_tags = [], {}
+                    elem.clear()
+                elif elem.tag == "nd":
+                    way_nodes.append(elem.get("ref"))
+                elif elem.tag == "tag":
+                    way_tags[elem.get("k")] = elem.get("v")
+                elif elem.tag == "way":
+                    speed = way_speed_kmh(way_tags)
+                    if speed is not None and len(way_nodes) > 1:
+                        ways.append((way_nodes, speed, oneway_direction(way_tags)))
+                    way_nodes, way_tags = [], {}
+                    elem.clear()
+                elif elem.tag == "relation":
+                    way_nodes, way_tags = [], {}
+                    elem.clear()
+
+        # Keep only nodes that lie on a drivable way
+        index: Dict[str, int] = {}
+        for nodes, _, _ in ways:
+            for ref in nodes:
+                if ref not in index and ref in node_coords:
+                    index[ref] = len(index)
+
+        coords = np.empty((len(index), 2))
+        for ref, i in index.items():
+            coords[i] = node_coords[ref]
+        del node_coords
+
+        src, dst, speeds = [], [], []
+        for nodes, speed, direction in ways:
+            ids = [index[ref] for ref in nodes if ref in index]
+            pairs = list(zip(ids[:-1], ids[1:]))
+            if direction < 0:
+                pairs = [(b, a) for a, b in pairs]
+            elif direction == 0:
+                pairs += [(b, a) for a, b in pairs]
+            for a, b in pairs:
+                src.append(a)
+                dst.append(b)
+                speeds.append(speed)
+
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        km = haversine_km(coords[src, 0], coords[src, 1], coords[dst, 0], coords[dst, 1])
+        # Zero weights mean "no edge" in csgraph, so keep a tiny floor
+        minutes = np.maximum(km / np.asarray(speeds, dtype=float) * 60.0, 1e-6)
+
+        # csr_matrix sums parallel edges; keep only the fastest one per node pair
+        order = np.lexsort((minutes, dst, src))
+        src, dst, minutes = src[order], dst[order], minutes[order]
+        first = np.ones(len(src), dtype=bool)
+        first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+
+        n = len(index)
+        graph = csr_matrix((minutes[first], (src[first], dst[first])), shape=(n, n))
+
+        return cls(coords[:, 0], coords[:, 1], graph)
+
+
+def way_speed_kmh(tags: Dict[str, str]) -> Optional[float]:
+    """Free-flow speed for a way, or None if it is not drivable"""
+    highway = tags.get("highway")
+    if highway is None:
+        return None
+    speed = ROAD_SPEEDS_KMH.get(highway.replace("_link", ""))
+    if speed is None:
+        return None
+
+    maxspeed = tags.get("maxspeed", "").split(" ")[0]
+    try:
+        return min(speed, float(maxspeed)) if maxspeed else speed
+    except ValueError:
+        return speed
+
+
+def oneway_direction(tags: Dict[str, str]) -> int:
+    """1 = forward only, -1 = reverse only, 0 = both directions"""
+    oneway = tags.get("oneway", "no")
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway == "-1":
+        return -1
+    if tags.get("highway") == "motorway" and oneway != "no":
+        return 1
+    return 0
+
+
+# ============================================
+# TRAVEL-TIME ENGINE
+# ============================================
+
+class TravelTimeEngine:
+    """
+    Travel time from a user location to every hospital row
+
+    set_targets() snaps the hospital coordinates once. Queries snap the user's origin
+    grid cell to the road graph, run one Dijkstra pass to every hospital and cache the
+    result for the cell, so requests from the same neighbourhood skip the graph search.
+    Road times are scaled by each hospital's traffic level relative to free flow.
+    """
+
+    def __init__(self, network: Optional[RoadNetwork] = None,
+                 cell_size: float = CELL_SIZE_DEG, max_cells: int = MAX_CACHED_CELLS):
+        self.network = network
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._targets = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "TravelTimeEngine":
+        """Engine over an OSM extract; falls back to straight-line estimates if unusable"""
+        if not path:
+            return cls()
+        try:
+            network = RoadNetwork.from_osm(path)
+            print(f"[SUCCESS] Road network loaded: {network.n_nodes} nodes, {network.n_edges} edges")
+            return cls(network)
+        except FileNotFoundError:
+            print(f"[INFO] No road network at {path}, using straight-line travel estimates")
+        except Exception as e:
+            print(f"[ERROR] Failed to load road network: {str(e)}")
+        return cls()
+
+    def set_targets(self, lat: np.ndarray, lng: np.ndarray, traffic_levels: np.ndarray):
+        """Install the hospital rows travel times are computed to"""
+        lat = np.asarray(lat, dtype=float)
+        lng = np.asarray(lng, dtype=float)
+        speeds = traffic_speeds(traffic_levels)
+
+        targets = {"lat": lat, "lng": lng, "speed": speeds}
+        if self.road_mode:
+            nodes, snap_km = self.network.snap(lat, lng)
+            targets["nodes"] = nodes
+            targets["access_min"] = snap_km / ACCESS_SPEED_KMH * 60.0
+            # Free-flow road time is scaled up by how congested each hospital's area is
+            targets["congestion"] = TRAFFIC_SPEEDS_KMH["Low"] / speeds
+
+        with self._lock:
+            self._targets = targets
+            self._cache.clear()
+
+    @property
+    def road_mode(self) -> bool:
+        return self.network is not None and self.network.n_nodes > 0
+
+    def cell_of(self, lat: float, lng: float) -> Tuple[int, int]:
+        """Origin grid cell containing a point"""
+        return int(np.floor(lat / self.cell_size)), int(np.floor(lng / self.cell_size))
+
+    def access_minutes(self, lat, lng, origin_lat, origin_lng):
+        """Leg from an exact position to a cell's origin node"""
+        return haversine_km(lat, lng, origin_lat, origin_lng) / ACCESS_SPEED_KMH * 60.0
+
+    def travel_minutes(self, user_lat: float, user_lng: float,
+                       positions: np.ndarray) -> np.ndarray:
+        """Estimated travel minutes from the user to the hospital rows at positions"""
+        targets = self._targets
+        if not self.road_mode:
+            distances = haversine_km(user_lat, user_lng, targets["lat"][positions], targets["lng"][positions])
+            return distances / targets["speed"][positions] * 60.0
+
+        origin, road_min = self._cell_times(self.cell_of(user_lat, user_lng), targets)
+        access_min = self.access_minutes(user_lat, user_lng,
+                                         self.network.lat[origin], self.network.lng[origin])
+        return access_min + road_min[positions]
+
+    def cell_travel_matrix(self, cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Travel minutes from a batch of grid cells to every target row
+
+        Returns the origin coordinates of each cell and a (cells x rows) matrix. In road mode
+        the matrix starts at the cell's origin node (add access_minutes for the exact
+        position); otherwise it is the straight-line estimate from the cell center.
+        """
+        targets = self._targets
+        center_lat = (cells[:, 0] + 0.5) * self.cell_size
+        center_lng = (cells[:, 1] + 0.5) * self.cell_size
+
+        if not self.road_mode:
+            distances = haversine_km(center_lat[:, None], center_lng[:, None],
+                                     targets["lat"][None, :], targets["lng"][None, :])
+            return center_lat, center_lng, distances / targets["speed"][None, :] * 60.0
+
+        origins = self.network.snap(center_lat, center_lng)[0]
+        minutes = self._road_minutes(origins, targets)
+        return self.network.lat[origins], self.network.lng[origins], minutes
+
+    def _road_minutes(self, origins: np.ndarray, targets: Dict[str, np.ndarray]) -> np.ndarray:
+        """Road minutes from origin nodes to every target row, one Dijkstra pass per origin"""
+        road_min = self.network.travel_minutes_from(origins)[..., targets["nodes"]]
+        road_min = road_min * targets["congestion"] + targets["access_min"]
+
+        unreachable = ~np.isfinite(road_min)
+        if unreachable.any():
+            # Disconnected pieces of the extract: straight-line estimate from the origin node
+            origin_lat = np.broadcast_to(np.atleast_1d(self.network.lat[origins])[..., None], road_min.shape)
+            origin_lng = np.broadcast_to(np.atleast_1d(self.network.lng[origins])[..., None], road_min.shape)
+            rows = np.nonzero(unreachable)[-1]
+            distances = haversine_km(origin_lat[unreachable], origin_lng[unreachable],
+                                     targets["lat"][rows], targets["lng"][rows])
+            road_min[unreachable] = distances / targets["speed"][rows] * 60.0
+        return road_min
+
+    def _cell_times(self, cell: Tuple[int, int], targets: Dict[str, np.ndarray]) -> Tuple[int, np.ndarray]:
+        """Origin node and road minutes to every target row for one grid cell (cached)"""
+        with self._lock:
+            cached = self._cache.get(cell)
+            if cached is not None and cached[0] is targets:
+                self._cache.move_to_end(cell)
+                self.hits += 1
+                return cached[1], cached[2]
+            self.misses += 1
+
+        center_lat = (cell[0] + 0.5) * self.cell_size
+        center_lng = (cell[1] + 0.5) * self.cell_size
+        origin = int(self.network.snap(center_lat, center_lng)[0][0])
+
+        # One pass to every node, then read off the hospital nodes
+        road_min = self._road_minutes(origin, targets)
+        road_min.flags.writeable = False
+
+        with self._lock:
+            if self._targets is targets:
+                self._cache[cell] = (targets, origin, road_min)
+                self._cache.move_to_end(cell)
+                while len(self._cache) > self.max_cells:
+                    self._cache.popitem(last=False)
+        return origin, road_min
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "road_network_loaded": self.network is not None,
+            "nodes": self.network.n_nodes if self.network is not None else 0,
+            "cached_cells": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+        }
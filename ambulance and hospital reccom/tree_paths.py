@@ -0,0 +1,176 @@
+# tree_paths.py
+"""
+Per-prediction feature attributions for the waiting time model
+Follows each row's decision path through every tree and credits the change in node value
+at each split to the split's input feature (tree-path / Saabas attribution, the path-wise
+form of TreeSHAP). One-hot columns are credited to the feature they encode, and the base
+value plus the contributions equals the model output exactly.
+Each service deploys on its own, so this module is copied in AQI Surge/; keep the two
+copies in step.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+# Explanations kept per model version (least recently used are dropped first)
+EXPLANATION_CACHE_SIZE = 4096
+
+# Trees x rows x features gathered per step when explaining a batch
+EXPLAIN_CHUNK_CELLS = 4_000_000
+
+
+def column_features(preprocess: Any, n_columns: int, input_names: Optional[Sequence[str]] = None) -> List[str]:
+    """Input feature behind every model input column; one-hot columns map to their feature"""
+    transformer = preprocess
+    if isinstance(transformer, Pipeline):
+        transformer = next((step for _, step in transformer.steps if isinstance(step, ColumnTransformer)), None)
+
+    if isinstance(transformer, ColumnTransformer):
+        names = [None] * n_columns
+        for name, step, cols in transformer.transformers_:
+            out = transformer.output_indices_.get(name)
+            if step == "drop" or out is None or out.stop == out.start:
+                continue
+            cols = [cols] if isinstance(cols, str) else [str(c) for c in cols]
+            if isinstance(step, OneHotEncoder):
+                dropped = step.drop_idx_ if step.drop_idx_ is not None else [None] * len(cols)
+                sizes = [len(c) - (d is not None) for c, d in zip(step.categories_, dropped)]
+                per_column = np.repeat(cols, sizes).tolist()
+            else:
+                per_column = cols
+            if len(per_column) == out.stop - out.start:
+                names[out] = per_column
+        if None not in names:
+            return names
+
+    if input_names is not None and len(input_names) == n_columns:
+        return [str(n) for n in input_names]
+    return [f"feature_{j}" for j in range(n_columns)]
+
+
+class TreePathExplainer:
+    """
+    Tree-path attributions of a fitted RandomForest / GradientBoosting regressor
+
+    Every tree node's path contribution (per input feature, from the root down) is
+    tabulated once, on first use. A row's attribution is then one apply() per tree and
+    a gather from that table, so a batch costs about as much as a prediction. Results
+    are memoized by the caller's key.
+    """
+
+    def __init__(self, regressor: Any, features: Sequence[str], preprocess: Any = None,
+                 cache_size: int = EXPLANATION_CACHE_SIZE):
+        if isinstance(regressor, GradientBoostingRegressor):
+            self.trees = list(regressor.estimators_[:, 0])
+            self.scale = float(regressor.learning_rate)
+            init = regressor.init_
+            self.init = 0.0 if init == "zero" else float(np.ravel(init.predict(np.zeros((1, regressor.n_features_in_))))[0])
+        else:
+            self.trees = list(regressor.estimators_)
+            self.scale = 1.0 / len(self.trees)
+            self.init = 0.0
+        self.preprocess = preprocess
+        self.features = list(dict.fromkeys(features))
+        self.column_feature = np.array([self.features.index(f) for f in features], dtype=np.intp)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._table = None
+
+    @classmethod
+    def from_model(cls, model: Any) -> Optional["TreePathExplainer"]:
+        """Explainer of a fitted pipeline or bare regressor; None for unsupported models"""
+        steps = getattr(model, "steps", None)
+        regressor = steps[-1][1] if steps else model
+        if not isinstance(regressor, (RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor)):
+            return None
+        preprocess = model[:-1] if steps and len(steps) > 1 else None
+        input_names = getattr(regressor if preprocess is None else model, "feature_names_in_", None)
+        features = column_features(preprocess, regressor.n_features_in_, input_names)
+        return cls(regressor, features, preprocess)
+
+    # -- tables -----------------------------------------------------------
+
+    def _build_table(self):
+        """Per-node path contributions of every tree in one flat (nodes, features) table"""
+        trees = [tree.tree_ for tree in self.trees]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        left = np.concatenate([np.where(t.children_left >= 0, t.children_left + o, -1) for t, o in zip(trees, offsets)])
+        right = np.concatenate([np.where(t.children_right >= 0, t.children_right + o, -1) for t, o in zip(trees, offsets)])
+        feature = np.concatenate([t.feature for t in trees])
+        value = np.concatenate([t.value[:, 0, 0] for t in trees])
+
+        # Top down one depth level at a time: child = parent + (value change at the split)
+        table = np.zeros((len(value), len(self.features)))
+        parents = offsets[left[offsets] >= 0]
+        while len(parents):
+            children = np.concatenate([left[parents], right[parents]])
+            parents = np.concatenate([parents, parents])
+            table[children] = table[parents]
+            table[children, self.column_feature[feature[parents]]] += value[children] - value[parents]
+            parents = children[left[children] >= 0]
+
+        self.offsets = offsets
+        self.expected_value = self.init + self.scale * float(value[offsets].sum())
+        self._table = table
+
+    def contributions(self, X32: np.ndarray) -> np.ndarray:
+        """(n, features) contributions for float32 model input rows"""
+        with self._lock:
+            if self._table is None:
+                self._build_table()
+        n_trees = len(self.trees)
+        result = np.empty((len(X32), len(self.features)))
+        step = max(1, EXPLAIN_CHUNK_CELLS // (n_trees * len(self.features)))
+        for start in range(0, len(X32), step):
+            rows = X32[start:start + step]
+            leaves = np.stack([tree.tree_.apply(rows) for tree in self.trees])
+            result[start:start + step] = self._table[leaves + self.offsets[:, None]].sum(axis=0)
+        return result * self.scale
+
+    # -- explanations -----------------------------------------------------
+
+    def explain(self, X: Any, keys: Sequence[Hashable], preprocessed: bool = False) -> List[Dict[str, Any]]:
+        """
+        Explanation of every row of X (model input, or its preprocessed array)
+
+        Rows whose key was explained before are served from the cache; the rest are
+        computed in one batch. Each explanation holds the base value, the model output
+        and the contribution of every input feature, largest magnitude first.
+        """
+        with self._lock:
+            found = [self._cache.get(key) for key in keys]
+            for key, hit in zip(keys, found):
+                if hit is not None:
+                    self._cache.move_to_end(key)
+
+        missing = [i for i, hit in enumerate(found) if hit is None]
+        if missing:
+            rows = X.iloc[missing] if hasattr(X, "iloc") else np.asarray(X)[missing]
+            if not preprocessed and self.preprocess is not None:
+                rows = self.preprocess.transform(rows)
+            contributions = self.contributions(np.ascontiguousarray(rows, dtype=np.float32))
+
+            with self._lock:
+                for i, values in zip(missing, contributions):
+                    order = np.argsort(-np.abs(values), kind="stable")
+                    found[i] = {
+                        "base_value": round(self.expected_value, 3),
+                        "model_output": round(self.expected_value + float(values.sum()), 3),
+                        "contributions": [
+                            {"feature": self.features[j], "contribution": round(float(values[j]), 3)}
+                            for j in order
+                        ]
+                    }
+                    self._cache[keys[i]] = found[i]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return found
@@ -0,0 +1,308 @@
+# bench_recommender.py
+"""
+Benchmark for the Smart Emergency Hospital Recommender
+Drives recommend_hospitals and /api/predict-waiting-time against synthetic hospital tables
+at several scales, in-process and over HTTP (plus uncached predictions per model tier), ambulance dispatch against synthetic fleets
+and the emergency queue simulation at several replication counts
+
+Usage:
+    python benchmarks/bench_recommender.py --scales 100 2000 20000 --fleet-sizes 1000 5000 --replications 500 2000 --output reco.json
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import (
+    LiveServer,
+    check_regressions,
+    http_json,
+    import_service,
+    measure_startup,
+    peak_rss_mb,
+    time_calls,
+    write_report,
+)
+
+SERVICE_DIR = "ambulance and hospital reccom"
+
+SPECIALITIES = [
+    "Trauma", "Pediatrics", "Pulmonology", "Orthopedics", "Gynecology",
+    "General Medicine", "Cardiology", "Burns", "Neurology",
+]
+AMBULANCE_TYPES = ["BLS", "ALS", "ICU"]
+SEVERITIES = ["mild", "moderate", "severe"]
+
+# Incidents per batch in the dispatch benchmark
+DISPATCH_BATCH = 10
+TRAFFIC_LEVELS = ["Low", "Moderate", "High"]
+
+# Hospital rows and runs per replication count in the queue simulation benchmark
+SIMULATION_ROWS = 2000
+SIMULATION_RUNS = 3
+SIMULATION_SURGE = {"moderate": 40, "severe": 40}
+
+# Mumbai bounding box used by the training data
+LAT_RANGE = (18.88, 19.30)
+LNG_RANGE = (72.78, 72.98)
+
+
+# ============================================
+# SYNTHETIC DATA
+# ============================================
+
+def generate_hospital_table(n_rows: int, symptoms, seed: int = 0) -> pd.DataFrame:
+    """Synthetic hospital table with the same columns as the training CSV"""
+    rng = np.random.default_rng(seed)
+    n_names = max(1, n_rows // 20)
+    severities = np.array(["mild", "moderate", "severe"])
+
+    return pd.DataFrame({
+        "entry_id": np.arange(1, n_rows + 1),
+        "hospital_name": [f"Synthetic Hospital {i}" for i in rng.integers(0, n_names, n_rows)],
+        "hospital_lat": rng.uniform(*LAT_RANGE, n_rows),
+        "hospital_lng": rng.uniform(*LNG_RANGE, n_rows),
+        "speciality": rng.choice(SPECIALITIES, n_rows),
+        "general_beds": rng.integers(10, 200, n_rows),
+        "icu_beds": rng.integers(0, 40, n_rows),
+        "ventilators": rng.integers(0, 21, n_rows),
+        "ambulance_type_needed": rng.choice(AMBULANCE_TYPES, n_rows),
+        "symptom": rng.choice(symptoms, n_rows),
+        "severity": rng.choice(severities, n_rows),
+        "traffic_level": rng.choice(TRAFFIC_LEVELS, n_rows),
+        "waiting_time_min": rng.integers(5, 121, n_rows),
+    })
+
+
+def generate_queries(n_queries: int, symptoms, seed: int = 1):
+    """Synthetic /api/recommend payloads spread over the city"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "user_lat": float(rng.uniform(*LAT_RANGE)),
+            "user_lng": float(rng.uniform(*LNG_RANGE)),
+            "symptom": str(rng.choice(symptoms)),
+            "top_k": 5,
+            # Keep every request scoring against the same (empty) referral ledger
+            "record_referral": False,
+        }
+        for _ in range(n_queries)
+    ]
+
+
+def generate_wait_queries(n_queries: int, hospitals_df: pd.DataFrame, symptoms, seed: int = 2):
+    """Synthetic /api/predict-waiting-time payloads for hospitals in the table"""
+    rng = np.random.default_rng(seed)
+    names = hospitals_df["hospital_name"].unique()
+    return [
+        {
+            "hospital_name": str(rng.choice(names)),
+            "symptom": str(rng.choice(symptoms)),
+            "traffic_level": str(rng.choice(TRAFFIC_LEVELS)),
+        }
+        for _ in range(n_queries)
+    ]
+
+
+def generate_fleet(n_units: int, seed: int = 3):
+    """Synthetic ambulance position feed spread over the city"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "unit_id": f"AMB-{i}",
+            "unit_type": str(rng.choice(AMBULANCE_TYPES)),
+            "lat": float(rng.uniform(*LAT_RANGE)),
+            "lng": float(rng.uniform(*LNG_RANGE)),
+        }
+        for i in range(n_units)
+    ]
+
+
+def generate_incidents(n_incidents: int, seed: int = 4):
+    """Synthetic incidents with mixed severities"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "incident_id": f"INC-{i}",
+            "lat": float(rng.uniform(*LAT_RANGE)),
+            "lng": float(rng.uniform(*LNG_RANGE)),
+            "severity": str(rng.choice(SEVERITIES)),
+        }
+        for i in range(n_incidents)
+    ]
+
+
+# ============================================
+# BENCHMARKS
+# ============================================
+
+def bench_scale(app, n_rows: int, n_queries: int, http: bool):
+    """Run every recommender benchmark against one synthetic table size"""
+    symptoms = list(app.metadata["symptom_to_severity"].keys())
+    app.set_hospital_data(generate_hospital_table(n_rows, symptoms))
+    # The no-surge simulations warm in the background; keep them out of the timings
+    while app.pending_simulations:
+        time.sleep(0.05)
+
+    queries = generate_queries(n_queries, symptoms)
+    wait_queries = generate_wait_queries(n_queries, app.hospitals_df, symptoms)
+    client = app.app.test_client()
+
+    def check(response):
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)}")
+
+    results = {
+        "in_process": {
+            "recommend_hospitals": time_calls(
+                lambda q: app.recommend_hospitals(q["user_lat"], q["user_lng"], q["symptom"], top_k=q["top_k"]),
+                queries
+            ),
+            "api_recommend": time_calls(
+                lambda q: check(client.post("/api/recommend", json=q)), queries
+            ),
+            "api_predict_waiting_time": time_calls(
+                lambda q: check(client.post("/api/predict-waiting-time", json=q)), wait_queries
+            ),
+            "api_predict_waiting_time_explain": time_calls(
+                lambda q: check(client.post("/api/predict-waiting-time", json={**q, "explain": True})), wait_queries
+            ),
+        }
+    }
+
+    # Uncached waiting time prediction of the whole table, per model tier
+    active = app.registry.active
+    snapshot = app.availability.snapshot
+    for tier in active.payload["tiers"]:
+        results["in_process"][f"predict_wait_{tier}"] = time_calls(
+            lambda symptom: app.predict_wait_for_rows(
+                snapshot.df, (active, symptom, app.infer_severity(symptom), tier)),
+            symptoms
+        )
+
+    if http:
+        with LiveServer(app.app) as server:
+            results["http"] = {
+                "api_recommend": time_calls(
+                    lambda q: http_json(server.base_url + "/api/recommend", q), queries
+                ),
+                "api_predict_waiting_time": time_calls(
+                    lambda q: http_json(server.base_url + "/api/predict-waiting-time", q), wait_queries
+                ),
+            }
+
+    return results
+
+
+def bench_dispatch(app, n_units: int, n_queries: int):
+    """Dispatch decision latency against one synthetic fleet size"""
+    fleet = app.AmbulanceFleet()
+    fleet.upsert(generate_fleet(n_units))
+    incidents = generate_incidents(n_queries)
+    batches = [incidents[i:i + DISPATCH_BATCH] for i in range(0, len(incidents), DISPATCH_BATCH)]
+
+    def assign_and_release(batch):
+        # Release straight away so every call sees the same fleet
+        for assignment in fleet.assign(batch):
+            if assignment["unit"] is not None:
+                fleet.release(assignment["unit"]["unit_id"])
+
+    return {
+        "dispatch_single": time_calls(lambda incident: assign_and_release([incident]), incidents),
+        f"dispatch_batch_{DISPATCH_BATCH}": time_calls(assign_and_release, batches, warmup=1),
+    }
+
+
+def bench_simulation(app, replications: int):
+    """Uncached queue simulations of every table row, per severity, baseline and under a surge"""
+    symptoms = list(app.metadata["symptom_to_severity"].keys())
+    table = generate_hospital_table(SIMULATION_ROWS, symptoms)
+    simulator = app.EDSimulator.from_table(table)
+    capacity = {col: table[col].to_numpy() for col in ["general_beds", "icu_beds", "ventilators"]}
+    scenarios = {"baseline": app.BASELINE_SCENARIO, "surge": app.make_scenario(SIMULATION_SURGE)}
+
+    results = {}
+    for name, scenario in scenarios.items():
+        for severity in SEVERITIES:
+            results[f"simulate_{severity}_{name}"] = time_calls(
+                lambda seed: simulator.wait_samples(capacity, severity, scenario, replications, seed),
+                list(range(SIMULATION_RUNS)), warmup=1
+            )
+    return results
+
+
+def run(args):
+    """Measure startup, then every scale; returns the report or None if the model is missing"""
+    service_dir = import_service(SERVICE_DIR, args.workdir)
+    workdir = args.workdir or service_dir
+
+    startup = measure_startup(service_dir, workdir, "app.load_model_and_data()")
+
+    import app
+    if not app.load_model_and_data():
+        print("[ERROR] Model artifacts not found. Train the model first.")
+        return None
+
+    report = {
+        "service": "hospital_recommender",
+        "model_name": app.metadata.get("model_name"),
+        "trained_date": app.metadata.get("trained_date"),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "startup": startup,
+        "scales": {},
+    }
+
+    for n_rows in args.scales:
+        print(f"[INFO] Benchmarking {n_rows} hospital rows...")
+        report["scales"][str(n_rows)] = bench_scale(app, n_rows, args.queries, not args.no_http)
+
+    report["dispatch"] = {}
+    for n_units in args.fleet_sizes:
+        print(f"[INFO] Benchmarking dispatch with {n_units} ambulances...")
+        report["dispatch"][str(n_units)] = bench_dispatch(app, n_units, args.queries)
+
+    report["simulation"] = {}
+    for replications in args.replications:
+        print(f"[INFO] Benchmarking queue simulation with {replications} replications...")
+        report["simulation"][str(replications)] = bench_simulation(app, replications)
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hospital recommender")
+    parser.add_argument("--workdir", help="Directory holding the trained model artifacts (default: service dir)")
+    parser.add_argument("--scales", type=int, nargs="+", default=[100, 2000, 20000],
+                        help="Synthetic hospital table sizes")
+    parser.add_argument("--fleet-sizes", type=int, nargs="+", default=[1000, 5000, 20000],
+                        help="Synthetic ambulance fleet sizes")
+    parser.add_argument("--replications", type=int, nargs="+", default=[500, 2000, 10000],
+                        help="Replications per queue simulation")
+    parser.add_argument("--queries", type=int, default=200, help="Requests per benchmark")
+    parser.add_argument("--no-http", action="store_true", help="Skip the over-HTTP benchmarks")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression in p95 latency / throughput")
+    args = parser.parse_args(argv)
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # The service logs to stdout; keep stdout clean for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    if report is None:
+        return 2
+
+    write_report(report, args.output)
+    return check_regressions(report, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
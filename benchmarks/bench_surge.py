@@ -0,0 +1,347 @@
+# bench_surge.py
+"""
+Benchmark for the Patient Surge Prediction API
+Drives predict_surge_and_resources, /api/predict and /api/predict/batch with synthetic
+scenario sets at several scales, in-process and over HTTP, the observed-count surge
+detector against synthetic daily feeds, Monte Carlo demand simulation, inventory
+reorder planning, shift rostering and what-if sensitivity sweeps
+
+Usage:
+    python benchmarks/bench_surge.py --scales 10 100 500 --series-sizes 1000 5000 --sample-sizes 5000 --hospital-sizes 500 --staff-sizes 500 --sweep-steps 100 --output surge.json
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+import numpy as np
+
+from common import (
+    LiveServer,
+    check_regressions,
+    http_json,
+    import_service,
+    measure_startup,
+    peak_rss_mb,
+    time_calls,
+    write_report,
+)
+
+SERVICE_DIR = "AQI Surge"
+
+CITIES = {
+    "Delhi": 2000000, "Mumbai": 2500000, "Chennai": 1200000,
+    "Kolkata": 1500000, "Bengaluru": 1300000, "Hyderabad": 1000000,
+}
+SEASONS = ["Summer", "Monsoon", "Autumn", "Winter", "Spring"]
+FESTIVALS = ["None", "Diwali", "Holi", "Dussehra", "Eid", "Christmas", "New_Year"]
+DAY_TYPES = ["Weekday", "Saturday", "Sunday", "Holiday"]
+
+# /api/predict/batch accepts at most this many scenarios per request
+BATCH_LIMIT = 10
+
+# Diseases per city in the synthetic observation feeds, and days fed per benchmark
+FEED_DISEASES = ["Asthma", "Influenza", "Dengue", "Malaria", "Typhoid", "Diarrhea"]
+FEED_DAYS = 60
+
+# Day horizons and runs per horizon in the demand simulation benchmark
+SIMULATION_HORIZONS = [7, 30]
+SIMULATION_RUNS = 20
+
+# Stock updates timed per inventory benchmark, and forecast days per city
+INVENTORY_UPDATES = 200
+INVENTORY_FORECAST_DAYS = 7
+
+# Roster horizon, full solves and single-day demand changes timed per roster benchmark
+ROSTER_DAYS = 30
+ROSTER_SOLVES = 5
+ROSTER_DAY_CHANGES = 50
+
+# Sweeps timed per grid size (one base scenario each)
+SWEEP_RUNS = 5
+
+
+# ============================================
+# SYNTHETIC DATA
+# ============================================
+
+def generate_scenarios(n_scenarios: int, seed: int = 0):
+    """Synthetic /api/predict payloads covering every city, season and day type"""
+    rng = np.random.default_rng(seed)
+    cities = list(CITIES)
+    scenarios = []
+    for _ in range(n_scenarios):
+        city = str(rng.choice(cities))
+        aqi = float(rng.uniform(20, 480))
+        scenarios.append({
+            "city": city,
+            "aqi": round(aqi, 1),
+            "pm25": round(aqi * float(rng.uniform(0.4, 0.8)), 1),
+            "pm10": round(aqi * float(rng.uniform(0.8, 1.2)), 1),
+            "temperature": round(float(rng.uniform(5, 42)), 1),
+            "humidity": round(float(rng.uniform(15, 98)), 1),
+            "rainfall": round(float(rng.choice([0.0, rng.uniform(0, 120)])), 1),
+            "season": str(rng.choice(SEASONS)),
+            "festival": str(rng.choice(FESTIVALS)),
+            "day_type": str(rng.choice(DAY_TYPES)),
+            "city_population": CITIES[city],
+        })
+    return scenarios
+
+
+def generate_feed(n_series: int, n_days: int = FEED_DAYS, seed: int = 1):
+    """Daily (cities, diseases, dates, counts) feeds for n_series city x disease series"""
+    rng = np.random.default_rng(seed)
+    cities = [f"City-{i // len(FEED_DISEASES)}" for i in range(n_series)]
+    diseases = [FEED_DISEASES[i % len(FEED_DISEASES)] for i in range(n_series)]
+    rates = rng.uniform(5, 150, n_series)
+    days = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-01") + n_days)
+    return [
+        (cities, diseases, np.full(n_series, day), rng.poisson(rates).astype(float))
+        for day in days
+    ]
+
+
+def chunk(items, size):
+    """Split a list into consecutive chunks of at most size items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# ============================================
+# BENCHMARKS
+# ============================================
+
+def bench_scale(app, n_scenarios: int, http: bool):
+    """Run every surge benchmark against one synthetic scenario set"""
+    scenarios = generate_scenarios(n_scenarios)
+    batches = [{"scenarios": c} for c in chunk(scenarios, BATCH_LIMIT)]
+    client = app.app.test_client()
+
+    def check(response):
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)}")
+
+    results = {
+        "in_process": {
+            "predict_surge_and_resources": time_calls(
+                lambda s: app.engine.predict_surge_and_resources(**s), scenarios
+            ),
+            "api_predict": time_calls(
+                lambda s: check(client.post("/api/predict", json=s)), scenarios
+            ),
+            "api_predict_explain": time_calls(
+                lambda s: check(client.post("/api/predict", json={**s, "explain": True})), scenarios
+            ),
+            "api_predict_batch": time_calls(
+                lambda b: check(client.post("/api/predict/batch", json=b)), batches, warmup=1
+            ),
+        }
+    }
+
+    if http:
+        with LiveServer(app.app) as server:
+            results["http"] = {
+                "api_predict": time_calls(
+                    lambda s: http_json(server.base_url + "/api/predict", s), scenarios
+                ),
+                "api_predict_batch": time_calls(
+                    lambda b: http_json(server.base_url + "/api/predict/batch", b), batches, warmup=1
+                ),
+            }
+
+    return results
+
+
+def bench_detector(app, n_series: int):
+    """Latency of ingesting one day's observed counts for every series"""
+    detector = app.SurgeDetector()
+    return {
+        "detector_ingest_day": time_calls(lambda feed: detector.ingest(*feed), generate_feed(n_series)),
+    }
+
+
+def bench_simulation(app, n_samples: int):
+    """Latency of one Monte Carlo demand run over 7- and 30-day horizons"""
+    results = {}
+    for n_days in SIMULATION_HORIZONS:
+        runs = [generate_scenarios(n_days, seed=run) for run in range(SIMULATION_RUNS)]
+        results[f"simulate_{n_days}_days"] = time_calls(
+            lambda scenarios: app.simulate_demand(app.engine, scenarios, n_samples=n_samples, seed=0),
+            runs, warmup=1
+        )
+    return results
+
+
+def bench_inventory(app, n_hospitals: int):
+    """Latency of recomputing the reorder plan after one stock update"""
+    rng = np.random.default_rng(5)
+    planner = app.InventoryPlanner()
+    cities = list(CITIES)
+    planner.upsert_hospitals([
+        {
+            "hospital_id": f"H-{h}",
+            "city": cities[h % len(cities)],
+            "demand_weight": float(rng.integers(20, 500)),
+            "stock": {item: float(rng.integers(0, 5000)) for item in planner.items},
+            "lead_time_days": {item: float(rng.integers(1, 10)) for item in planner.items},
+        }
+        for h in range(n_hospitals)
+    ])
+    for city in cities:
+        planner.set_demand(city, rng.uniform(0, 500, (INVENTORY_FORECAST_DAYS, len(planner.items))))
+    
+    updates = [
+        [{"hospital_id": f"H-{int(rng.integers(n_hospitals))}",
+          "stock": {str(rng.choice(planner.items)): float(rng.integers(0, 5000))}}]
+        for _ in range(INVENTORY_UPDATES)
+    ]
+    
+    def update_and_plan(update):
+        planner.upsert_hospitals(update)
+        planner.plan()
+    
+    return {
+        "inventory_update_and_plan": time_calls(update_and_plan, updates),
+    }
+
+
+def bench_roster(app, n_staff: int):
+    """Latency of a full roster solve and of re-solving after one day's demand changes"""
+    rng = np.random.default_rng(6)
+    staff = [
+        {
+            "staff_id": f"S-{s}",
+            "role": "Doctor" if s % 10 < 3 else "Nurse",
+            "skills": (["Surgeon"] if s % 10 == 0 else []) + (["ICU"] if s % 10 in (5, 6) else []),
+        }
+        for s in range(n_staff)
+    ]
+    # Demand that keeps about a third of the pool busy on the busiest shift
+    staff_required = rng.uniform(0.25, 0.4, ROSTER_DAYS) * n_staff
+    surgeons_required = staff_required * 0.03
+    roster = app.RosterOptimizer(days=ROSTER_DAYS)
+    
+    def solve(_):
+        roster.set_staff(staff, constraints={"min_coverage": {"ICU": 2}})
+        roster.set_demand(0, staff_required, surgeons_required)
+    
+    changes = [(int(rng.integers(ROSTER_DAYS)), float(rng.uniform(0.25, 0.4) * n_staff))
+               for _ in range(ROSTER_DAY_CHANGES)]
+    results = {"roster_full_solve": time_calls(solve, list(range(ROSTER_SOLVES)), warmup=1)}
+    results["roster_day_change"] = time_calls(
+        lambda change: roster.set_demand(change[0], [change[1]], [change[1] * 0.03]), changes
+    )
+    return results
+
+
+def bench_sweep(app, steps: int):
+    """Latency of one- and two-axis sensitivity sweeps with this many steps per axis"""
+    client = app.app.test_client()
+    aqi = {"input": "aqi", "start": 50, "stop": 500, "steps": steps}
+    rainfall = {"input": "rainfall", "start": 0, "stop": 150, "steps": steps}
+    bases = generate_scenarios(SWEEP_RUNS, seed=7)
+
+    def check(response):
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)}")
+
+    return {
+        "sweep_1d": time_calls(lambda base: check(client.post("/api/predict/sweep", json={**base, "sweep": [aqi]})),
+                               bases, warmup=1),
+        "sweep_2d": time_calls(lambda base: check(client.post("/api/predict/sweep", json={**base, "sweep": [aqi, rainfall]})),
+                               bases, warmup=1),
+    }
+
+
+def run(args):
+    """Measure startup, then every scale; returns the report or None if the model is missing"""
+    service_dir = import_service(SERVICE_DIR, args.workdir)
+    workdir = args.workdir or service_dir
+
+    startup = measure_startup(service_dir, workdir, "app.initialize_model()")
+
+    import app
+    if not app.initialize_model():
+        print("⚠️  Model file not found. Train the model first.")
+        return None
+
+    report = {
+        "service": "surge_prediction",
+        "model_path": os.path.abspath(app.Config.MODEL_SAVE_PATH),
+        "model_mtime": os.path.getmtime(app.Config.MODEL_SAVE_PATH),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "startup": startup,
+        "scales": {},
+    }
+
+    for n_scenarios in args.scales:
+        print(f"📊 Benchmarking {n_scenarios} scenarios...")
+        report["scales"][str(n_scenarios)] = bench_scale(app, n_scenarios, not args.no_http)
+    
+    report["detector"] = {}
+    for n_series in args.series_sizes:
+        print(f"📊 Benchmarking surge detector with {n_series} series...")
+        report["detector"][str(n_series)] = bench_detector(app, n_series)
+
+    report["simulation"] = {}
+    for n_samples in args.sample_sizes:
+        print(f"📊 Benchmarking demand simulation with {n_samples} samples...")
+        report["simulation"][str(n_samples)] = bench_simulation(app, n_samples)
+    
+    report["inventory"] = {}
+    for n_hospitals in args.hospital_sizes:
+        print(f"📊 Benchmarking inventory planning with {n_hospitals} hospitals...")
+        report["inventory"][str(n_hospitals)] = bench_inventory(app, n_hospitals)
+    
+    report["roster"] = {}
+    for n_staff in args.staff_sizes:
+        print(f"📊 Benchmarking roster optimization with {n_staff} staff...")
+        report["roster"][str(n_staff)] = bench_roster(app, n_staff)
+    
+    report["sweep"] = {}
+    for steps in args.sweep_steps:
+        print(f"📊 Benchmarking sensitivity sweeps with {steps} steps per axis...")
+        report["sweep"][str(steps)] = bench_sweep(app, steps)
+    
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the surge prediction API")
+    parser.add_argument("--workdir", help="Directory holding the trained model artifacts (default: service dir)")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 500],
+                        help="Synthetic scenario set sizes")
+    parser.add_argument("--series-sizes", type=int, nargs="+", default=[1000, 5000, 20000],
+                        help="City x disease series in the synthetic observation feeds")
+    parser.add_argument("--sample-sizes", type=int, nargs="+", default=[1000, 5000, 10000],
+                        help="Monte Carlo samples per demand simulation")
+    parser.add_argument("--hospital-sizes", type=int, nargs="+", default=[100, 500, 2000],
+                        help="Hospitals in the synthetic inventory plans")
+    parser.add_argument("--staff-sizes", type=int, nargs="+", default=[100, 500, 2000],
+                        help="Staff in the synthetic roster pools")
+    parser.add_argument("--sweep-steps", type=int, nargs="+", default=[10, 50, 100],
+                        help="Grid steps per axis in the sensitivity sweeps")
+    parser.add_argument("--no-http", action="store_true", help="Skip the over-HTTP benchmarks")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression in p95 latency / throughput")
+    args = parser.parse_args(argv)
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # The service logs to stdout; keep stdout clean for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    if report is None:
+        return 2
+
+    write_report(report, args.output)
+    return check_regressions(report, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
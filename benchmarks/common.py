@@ -0,0 +1,197 @@
+# common.py
+"""
+Shared helpers for the service benchmarks
+Latency statistics, peak RSS, startup timing, a local HTTP server and baseline comparison
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from werkzeug.serving import make_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ============================================
+# SERVICE IMPORT
+# ============================================
+
+def import_service(service_dir: str, workdir: str = None):
+    """Make a service importable and switch to the directory holding its artifacts"""
+    # The benchmarks time the model load themselves instead of paying it on import
+    os.environ.setdefault("MODEL_LOAD_ON_IMPORT", "0")
+    service_dir = os.path.join(REPO_ROOT, service_dir)
+    if service_dir not in sys.path:
+        sys.path.insert(0, service_dir)
+    os.chdir(workdir or service_dir)
+    return service_dir
+
+
+# ============================================
+# MEASUREMENT
+# ============================================
+
+def summarize_latencies(samples_s: List[float], wall_s: float = None) -> Dict[str, Any]:
+    """Turn per-call latencies (seconds) into throughput and percentile stats"""
+    arr = np.asarray(samples_s, dtype=float) * 1000.0
+    wall_s = wall_s if wall_s is not None else float(np.sum(samples_s))
+    return {
+        "calls": int(arr.size),
+        "throughput_per_s": round(arr.size / wall_s, 2) if wall_s > 0 else None,
+        "mean_ms": round(float(arr.mean()), 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+    }
+
+
+def time_calls(fn: Callable[[Any], Any], payloads: List[Any], warmup: int = 3) -> Dict[str, Any]:
+    """Call fn once per payload and report latency statistics"""
+    for payload in payloads[:warmup]:
+        fn(payload)
+
+    samples = []
+    wall_start = time.perf_counter()
+    for payload in payloads:
+        start = time.perf_counter()
+        fn(payload)
+        samples.append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall_start
+
+    return summarize_latencies(samples, wall)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def measure_startup(service_dir: str, workdir: str, load_statement: str, repeats: int = 3) -> Dict[str, Any]:
+    """Time a cold import + model load of a service in a fresh interpreter"""
+    code = (
+        "import sys, time, resource\n"
+        f"sys.path.insert(0, {service_dir!r})\n"
+        "t0 = time.perf_counter()\n"
+        "import app\n"
+        f"ok = {load_statement}\n"
+        "elapsed = time.perf_counter() - t0\n"
+        "rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+        "print('STARTUP', elapsed, rss, bool(ok))\n"
+    )
+
+    timings = []
+    rss_kb = []
+    loaded = True
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=workdir, capture_output=True, text=True, check=True
+        ).stdout
+        line = [l for l in out.splitlines() if l.startswith("STARTUP")][-1]
+        _, elapsed, rss, ok = line.split()
+        timings.append(float(elapsed))
+        rss_kb.append(int(rss))
+        loaded = loaded and ok == "True"
+
+    return {
+        "model_loaded": loaded,
+        "startup_s_min": round(min(timings), 4),
+        "startup_s_median": round(float(np.median(timings)), 4),
+        "startup_peak_rss_mb": round(max(rss_kb) / 1024, 1),
+    }
+
+
+# ============================================
+# HTTP
+# ============================================
+
+class LiveServer:
+    """Run a WSGI app on an ephemeral localhost port for the duration of a with-block"""
+
+    def __init__(self, wsgi_app):
+        self.server = make_server("127.0.0.1", 0, wsgi_app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+
+def http_json(url: str, payload: Dict[str, Any] = None) -> bytes:
+    """GET (no payload) or POST JSON and return the raw body"""
+    data = None
+    headers = {}
+    if payload is not None:
+        data = json.dumps(payload).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(url, data=data, headers=headers)
+    with urllib.request.urlopen(req) as resp:
+        return resp.read()
+
+
+# ============================================
+# BASELINE
+# ============================================
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List benchmarks whose p95 latency or throughput regressed beyond the tolerance"""
+    regressions = []
+
+    def walk(cur, base, path):
+        if not isinstance(cur, dict) or not isinstance(base, dict):
+            return
+        if "p95_ms" in cur and "p95_ms" in base:
+            if base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{path}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+            if base.get("throughput_per_s") and cur.get("throughput_per_s") is not None:
+                if cur["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+                    regressions.append(
+                        f"{path}: throughput {base['throughput_per_s']}/s -> {cur['throughput_per_s']}/s"
+                    )
+            return
+        for key, value in cur.items():
+            if key in base:
+                walk(value, base[key], f"{path}.{key}" if path else key)
+
+    walk(current, baseline, "")
+    return regressions
+
+
+def write_report(report: Dict[str, Any], output: str = None):
+    """Write the report as JSON to a file, or stdout when no path is given"""
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+        print(f"[INFO] Benchmark report written to {output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+def check_regressions(report: Dict[str, Any], baseline_path: str, tolerance: float) -> int:
+    """Compare against a saved baseline; returns a process exit code"""
+    if not baseline_path:
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(report, baseline, tolerance)
+    for line in regressions:
+        print(f"[REGRESSION] {line}", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,67 @@
+# run_all.py
+"""
+Run both service benchmarks and merge them into one baseline file
+Each service runs in its own interpreter because both expose a module named `app`
+
+Usage:
+    python benchmarks/run_all.py --output baseline.json
+    python benchmarks/run_all.py --baseline baseline.json   # exit code 1 on regression
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import check_regressions, write_report
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BENCHMARKS = {
+    "hospital_recommender": "bench_recommender.py",
+    "surge_prediction": "bench_surge.py",
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every ML service")
+    parser.add_argument("--reco-workdir", help="Artifact directory for the recommender")
+    parser.add_argument("--surge-workdir", help="Artifact directory for the surge API")
+    parser.add_argument("--no-http", action="store_true", help="Skip the over-HTTP benchmarks")
+    parser.add_argument("--output", help="Write the merged JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Previous merged report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression in p95 latency / throughput")
+    args = parser.parse_args(argv)
+
+    workdirs = {
+        "hospital_recommender": args.reco_workdir,
+        "surge_prediction": args.surge_workdir,
+    }
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, script in BENCHMARKS.items():
+            out_path = os.path.join(tmp, f"{name}.json")
+            cmd = [sys.executable, os.path.join(BENCH_DIR, script), "--output", out_path]
+            if workdirs[name]:
+                cmd += ["--workdir", os.path.abspath(workdirs[name])]
+            if args.no_http:
+                cmd.append("--no-http")
+
+            code = subprocess.call(cmd)
+            if code != 0:
+                print(f"[ERROR] {script} exited with code {code}", file=sys.stderr)
+                return code
+
+            with open(out_path) as f:
+                report[name] = json.load(f)
+
+    write_report(report, args.output)
+    return check_regressions(report, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())